@@ -0,0 +1,90 @@
+"""
+Keeping stored anomaly scores current with the transactions.
+
+Uploads call refresh_anomalies once their rows are stored and categorized, so
+only the new rows are scored against the stored baselines; the analytics
+endpoints read the stored scores and can force a refresh or a full rescore.
+"""
+from __future__ import annotations
+
+import os
+import sys
+from typing import Dict
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.db_manager import db
+from tools.anomalies import (
+    BASELINE_KINDS,
+    BASELINE_WINDOW,
+    MIN_STORED_SCORE,
+    current_baselines,
+    prepare_expenses,
+    refresh_baselines,
+    score_history,
+    score_new,
+)
+from tools.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+
+def _needs_full_rescore(state: Dict) -> bool:
+    """Whether nothing was scored yet or rows were deleted since the last scoring."""
+    return (
+        state["scored_through_id"] is None
+        or int(state["scored_rewrite_version"]) != state["rewrite_version"]
+    )
+
+
+def anomaly_scoring_status() -> Dict:
+    """Whether the stored scores cover every transaction, and if a full rescore is due."""
+    state = db.get_anomaly_state()
+    full = _needs_full_rescore(state)
+    return {
+        "current": not full and int(state["scored_through_id"]) >= state["max_id"],
+        "full_rescore_needed": full,
+    }
+
+
+def refresh_anomalies(rebuild: bool = False) -> Dict:
+    """Bring stored anomaly scores up to date with the transactions.
+    
+    Rows added since the last scoring are scored against the stored baselines,
+    and only the baselines of their payees and categories are recomputed.
+    Writes that deleted rows (or rebuild) rescore the whole history.
+    Recategorizing existing rows doesn't rescore them until the next full run.
+    """
+    state = db.get_anomaly_state()
+    full = rebuild or _needs_full_rescore(state)
+    if not full and int(state["scored_through_id"]) >= state["max_id"]:
+        return {"mode": "current", "scored": 0}
+    
+    if full:
+        df = db.get_transactions()
+        expenses = prepare_expenses(df)
+        scores = score_history(expenses)
+        baselines = current_baselines(expenses)
+        through_id = int(df['id'].max()) if not df.empty else 0
+    else:
+        df = db.get_transactions_after(int(state["scored_through_id"]))
+        through_id = int(df['id'].max())
+        new = prepare_expenses(df)
+        stored = pd.concat(
+            [db.get_anomaly_baselines(kind, sorted(set(new[column]))) for kind, column in BASELINE_KINDS],
+            ignore_index=True
+        )
+        scores = score_new(new, stored)
+        # Only the window the touched baselines cover needs reading
+        start = (new['date'].min() - pd.Timedelta(BASELINE_WINDOW)).date() if not new.empty else None
+        recent = prepare_expenses(db.get_transactions(start_date=start)) if start else new
+        baselines = refresh_baselines(recent, new)
+    
+    db.save_anomaly_scores(
+        scores[scores['score'] >= MIN_STORED_SCORE], baselines,
+        through_id=through_id, rewrite_version=state["rewrite_version"], replace=full
+    )
+    return {"mode": "full" if full else "incremental", "scored": len(scores)}
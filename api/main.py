@@ -2,59 +2,141 @@
 FastAPI Main Application
 Privacy-first personal finance dashboard API
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import os
+import sqlite3
 import sys
+import time
 
 # Add the project root to Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from api.routers import transactions, categories, analytics, uploads
-from database.db_manager import db
-
-# Create FastAPI app
-app = FastAPI(
-    title="Personal Finance Dashboard API",
-    description="Privacy-first personal finance management - all data stays on your device",
-    version="2.0.0"
-)
-
-# Enable CORS for frontend development
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:8000", 
-        "http://127.0.0.1:8000",
-        "http://localhost:3000", 
-        "http://localhost:8080", 
-        "http://127.0.0.1:3000", 
-        "http://127.0.0.1:8080"
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include API routers
-app.include_router(transactions.router, prefix="/api/transactions", tags=["transactions"])
-app.include_router(categories.router, prefix="/api/categories", tags=["categories"])
-app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
-app.include_router(uploads.router, prefix="/api/uploads", tags=["uploads"])
-
-# Serve static frontend files
-if os.path.exists("frontend"):
-    app.mount("/static", StaticFiles(directory="frontend"), name="static")
-
-@app.get("/")
-async def root():
-    """Root endpoint - serve frontend or API info"""
-    if os.path.exists("frontend/index.html"):
-        return FileResponse("frontend/index.html")
+from api.middleware import LedgerMiddleware, ServerTimingMiddleware
+from api.static_assets import StaticAssets
+from api.routers import transactions, categories, analytics, uploads, events, ledgers as ledgers_router
+from api.upload_jobs import upload_jobs
+from database.db_manager import db, init_db, ledgers
+from database.ledgers import DEFAULT_LEDGER
+
+# Frontend files, fingerprinted and precompressed
+assets = StaticAssets("frontend")
+
+# How often ledgers idle past PFIN_LEDGER_IDLE_SECONDS are closed
+LEDGER_SWEEP_SECONDS = 60
+
+
+async def sweep_ledgers():
+    """Close idle ledgers even while no requests come in to evict them"""
+    while True:
+        await asyncio.sleep(LEDGER_SWEEP_SECONDS)
+        try:
+            await run_in_threadpool(ledgers.sweep)
+        except Exception as e:
+            print(f"⚠️  Ledger sweep failed: {e}")
+
+
+def prepare_ledger(name: str, database):
+    """Warm a ledger's snapshot and resume its upload jobs; runs whenever a ledger is opened"""
+    if database.snapshot is not None:
+        # Maps a current snapshot right away; a stale one is repaired in the background
+        database.snapshot.warm()
+    upload_jobs.resume_interrupted()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the database, map the analytics snapshot and resume upload jobs on startup; stop workers on shutdown"""
+    timings = {}
+    started = time.perf_counter()
+    
+    def phase(name: str, since: float) -> float:
+        now = time.perf_counter()
+        timings[name] = round((now - since) * 1000, 1)
+        return now
+    
+    mark = started
+    database = init_db()
+    mark = phase("database", mark)
+    prepare_ledger(DEFAULT_LEDGER, database)
+    mark = phase("ledger", mark)
+    if os.path.exists("frontend"):
+        assets.load()
+        mark = phase("assets", mark)
+    timings["total"] = round((mark - started) * 1000, 1)
+    # Other ledgers are opened on demand and prepared the same way
+    ledgers.on_open(prepare_ledger)
+    
+    app.state.startup_timings = timings
+    print("⏱️  Startup: " + ", ".join(f"{name} {ms}ms" for name, ms in timings.items()))
+    sweeper = asyncio.create_task(sweep_ledgers())
+    yield
+    sweeper.cancel()
+    upload_jobs.shutdown()
+
+
+def create_app() -> FastAPI:
+    """Build the FastAPI application. Database work happens in the lifespan, not here."""
+    app = FastAPI(
+        title="Personal Finance Dashboard API",
+        description="Privacy-first personal finance management - all data stays on your device",
+        version="2.0.0",
+        lifespan=lifespan
+    )
+    
+    # Include API routers
+    app.include_router(transactions.router, prefix="/api/transactions", tags=["transactions"])
+    app.include_router(categories.router, prefix="/api/categories", tags=["categories"])
+    app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+    app.include_router(uploads.router, prefix="/api/uploads", tags=["uploads"])
+    app.include_router(ledgers_router.router, prefix="/api/ledgers", tags=["ledgers"])
+    app.include_router(events.router, prefix="/api/events", tags=["events"])
+    
+    # Selects the ledger of each request (X-Ledger header or /api/ledgers/{name}/ prefix)
+    app.add_middleware(LedgerMiddleware, registry=ledgers)
+    
+    # Around ledger selection, so it counts too; off by default
+    if os.environ.get("PFIN_SERVER_TIMING", "0") == "1":
+        app.add_middleware(ServerTimingMiddleware)
+    
+    # Enable CORS for frontend development. Added last so it is outermost: the
+    # ledger middleware's 400/404 responses and preflights get CORS headers too
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[
+            "http://localhost:8000", 
+            "http://127.0.0.1:8000",
+            "http://localhost:3000", 
+            "http://localhost:8080", 
+            "http://127.0.0.1:3000", 
+            "http://127.0.0.1:8080"
+        ],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    # Serve static frontend files; fingerprinted URLs are cached for good
+    if os.path.exists("frontend"):
+        app.add_api_route("/static/{path:path}", assets.serve, methods=["GET", "HEAD"], include_in_schema=False)
+    
+    app.add_api_route("/", root, methods=["GET"])
+    app.add_api_route("/favicon.ico", favicon, methods=["GET"])
+    app.add_api_route("/health", health_check, methods=["GET"])
+    return app
+
+
+async def root(request: Request):
+    """Root endpoint - serve frontend (index.html, revalidated after a minute) or API info"""
+    response = await assets.serve_index(request)
+    if response is not None:
+        return response
     return {
         "message": "Personal Finance Dashboard API",
         "version": "2.0.0",
@@ -62,21 +144,29 @@ async def root():
         "privacy": "All data stays on your device"
     }
 
-@app.get("/favicon.ico")
 async def favicon():
     """Return empty response for favicon to prevent 404 errors"""
     return {"status": "ok"}
 
-@app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    stats = db.get_database_stats()
+    """Health check endpoint: one primary-key read, cheap enough for frequent probes.
+    
+    Transaction counts are at /api/transactions/stats/database.
+    """
+    try:
+        db.get_data_version()
+    except sqlite3.Error as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unhealthy", "database": "unavailable", "detail": str(e)}
+        )
     return {
         "status": "healthy",
-        "database": "connected",
-        "transactions": stats["total_transactions"]
+        "database": "connected"
     }
 
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000, reload=True)
+    uvicorn.run(app, host="127.0.0.1", port=8000)
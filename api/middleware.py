@@ -0,0 +1,159 @@
+"""
+ASGI middleware for the API.
+"""
+import asyncio
+import functools
+import re
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from database.ledgers import LedgerNotFound, current_ledger
+from tools.request_timing import RequestTimings, current_timings, measure
+
+
+# Header selecting the ledger of a request
+LEDGER_HEADER = b"x-ledger"
+
+# /api/ledgers/<name>/<rest> is served as /api/<rest> on that ledger
+LEDGER_PATH = re.compile(r"^/api/ledgers/(?P<name>[^/]+)/(?P<rest>.*)$")
+
+
+class LedgerMiddleware:
+    """Select the ledger of each request from its path prefix or the X-Ledger header.
+    
+    Requests without either use the default ledger. The ledger is opened (or
+    found in the registry's LRU) before the request runs, so unknown ledgers
+    get a 404 instead of reaching the endpoint.
+    """
+    
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        name = None
+        match = LEDGER_PATH.match(scope["path"])
+        if match:
+            name = match.group("name")
+            path = f"/api/{match.group('rest')}"
+            scope = dict(scope, path=path, raw_path=path.encode())
+        else:
+            for header, value in scope["headers"]:
+                if header == LEDGER_HEADER:
+                    name = value.decode("latin-1").strip()
+                    break
+        
+        if not name:
+            return await self.app(scope, receive, send)
+        
+        if not self.registry.is_open(name):
+            try:
+                # Opening runs schema setup, keep it off the event loop
+                await run_in_threadpool(self.registry.get, name)
+            except ValueError as e:
+                return await JSONResponse({"detail": str(e)}, status_code=400)(scope, receive, send)
+            except LedgerNotFound:
+                return await JSONResponse(
+                    {"detail": f"Ledger '{name}' not found"}, status_code=404
+                )(scope, receive, send)
+        
+        token = current_ledger.set(name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_ledger.reset(token)
+
+
+class ServerTimingMiddleware:
+    """Report where each request's time went in a Server-Timing header.
+    
+    Phases, in milliseconds: db (inside database connection blocks), endpoint
+    (the endpoint function, db included), serialize (FastAPI's work around the
+    endpoint: parsing the request, validating and rendering the response), cpu
+    (thread CPU time of the route handler, and of the threadpool thread a sync
+    endpoint runs in) and app (everything until the
+    response headers). Bodies streamed after the headers aren't included.
+    Routes record endpoint, serialize and cpu only if they are TimedRoutes.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        timings = RequestTimings()
+        started = time.perf_counter()
+        
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                handler = timings.durations.pop("handler", None)
+                if handler is not None:
+                    timings.add("serialize", max(handler - timings.durations.get("endpoint", 0.0), 0.0))
+                timings.add("app", time.perf_counter() - started)
+                message = dict(message, headers=[
+                    *message.get("headers", []), (b"server-timing", timings.header().encode("latin-1"))
+                ])
+            await send(message)
+        
+        token = current_timings.set(timings)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
+
+
+def _timed_endpoint(endpoint):
+    """Wrap an endpoint so its own run time counts as the endpoint phase."""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            with measure("endpoint"):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            timings = current_timings.get()
+            if timings is None:
+                return endpoint(*args, **kwargs)
+            # Runs in the threadpool, whose CPU time the handler's thread doesn't see
+            cpu_started = time.thread_time()
+            try:
+                with measure("endpoint"):
+                    return endpoint(*args, **kwargs)
+            finally:
+                timings.add("cpu", time.thread_time() - cpu_started)
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """Route that times its endpoint and whole handler for ServerTimingMiddleware.
+    
+    Without the middleware this costs a context variable lookup per request.
+    """
+    
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+    
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        
+        async def timed_handler(request):
+            timings = current_timings.get()
+            if timings is None:
+                return await handler(request)
+            started, cpu_started = time.perf_counter(), time.thread_time()
+            try:
+                return await handler(request)
+            finally:
+                timings.add("handler", time.perf_counter() - started)
+                timings.add("cpu", time.thread_time() - cpu_started)
+        
+        return timed_handler
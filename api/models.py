@@ -2,8 +2,8 @@
 Pydantic models for API requests and responses
 """
 from pydantic import BaseModel, Field
-from datetime import datetime
-from typing import Optional, List, Dict, Union
+from datetime import datetime, date
+from typing import Optional, List, Dict, Union, Literal
 from decimal import Decimal
 
 
@@ -30,6 +30,46 @@ class TransactionUpdate(BaseModel):
     payee: Optional[str] = None
 
 
+class CategoryAssignment(BaseModel):
+    """Model for a single transaction category assignment"""
+    id: int
+    category: str
+
+
+class TransactionFilter(BaseModel):
+    """Model for selecting transactions by attributes instead of ids"""
+    account: Optional[str] = None
+    payee: Optional[str] = None
+    category: Optional[str] = None
+    description_contains: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    uncategorized_only: bool = False
+
+
+class BulkCategorizeRequest(BaseModel):
+    """Model for bulk recategorization - either explicit assignments or a filter plus a category"""
+    updates: Optional[List[CategoryAssignment]] = None
+    filter: Optional[TransactionFilter] = None
+    category: Optional[str] = None
+    save_mappings: bool = True
+
+
+class BulkItemStatus(BaseModel):
+    """Model for the outcome of one item in a bulk operation"""
+    id: int
+    status: str
+    detail: Optional[str] = None
+
+
+class BulkCategorizeResponse(BaseModel):
+    """Model for bulk recategorization results"""
+    updated_count: int
+    mappings_saved: int
+    mappings_applied: int = 0
+    results: List[BulkItemStatus]
+
+
 class TransactionResponse(TransactionBase):
     """Model for transaction response"""
     id: int
@@ -41,6 +81,66 @@ class TransactionResponse(TransactionBase):
         from_attributes = True
 
 
+class TransactionSearchHit(TransactionResponse):
+    """Model for a search result; with sort=relevance a lower rank is a better match"""
+    rank: float
+
+
+class TransactionChangesResponse(BaseModel):
+    """Model for the transactions changed since a change sequence number"""
+    instance_id: str
+    seq: int
+    reset: bool
+    transactions: List[TransactionResponse]
+    deleted: List[int]
+
+
+class TransactionSearchResponse(BaseModel):
+    """Model for a page of search results"""
+    query: str
+    total: int
+    limit: int
+    offset: int
+    results: List[TransactionSearchHit]
+
+
+class DuplicateCandidate(BaseModel):
+    """Model for two transactions that look like the same payment; first was imported earlier"""
+    score: float
+    days_apart: int
+    account: str
+    amount: float
+    first: TransactionResponse
+    second: TransactionResponse
+
+
+class DuplicatesResponse(BaseModel):
+    """Model for duplicate candidates, best match first"""
+    total: int
+    window_days: int
+    min_score: float
+    candidates: List[DuplicateCandidate]
+
+
+class DuplicateResolution(BaseModel):
+    """Model for resolving one candidate: delete the duplicate or dismiss the pair as distinct"""
+    keep_id: int
+    duplicate_id: int
+    action: Literal['delete', 'dismiss'] = 'delete'
+
+
+class DuplicateResolveRequest(BaseModel):
+    """Model for resolving many duplicate candidates at once"""
+    resolutions: List[DuplicateResolution] = Field(..., min_length=1)
+
+
+class DuplicateResolveResponse(BaseModel):
+    """Model for duplicate resolution results; result ids are duplicate_ids"""
+    deleted_count: int
+    dismissed_count: int
+    results: List[BulkItemStatus]
+
+
 class CategoryMappingBase(BaseModel):
     """Base category mapping model"""
     account: str
@@ -63,6 +163,69 @@ class CategoryMappingResponse(CategoryMappingBase):
         from_attributes = True
 
 
+class CategoryRuleBase(BaseModel):
+    """Base categorization rule model"""
+    field: Literal["description", "payee"] = "payee"
+    match_type: Literal["substring", "prefix", "regex"] = "substring"
+    pattern: str
+    category: str
+    priority: int = 0
+
+
+class CategoryRuleCreate(CategoryRuleBase):
+    """Model for creating a categorization rule"""
+    pass
+
+
+class CategoryRuleResponse(CategoryRuleBase):
+    """Model for categorization rule response"""
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class AmortizationRuleBase(BaseModel):
+    """Base recurring cost rule model"""
+    account: str
+    payee: str
+    months: int = Field(1, ge=1, le=120, description="Months one payment covers, e.g. 1 for rent, 12 for an annual fee")
+
+
+class AmortizationRuleCreate(AmortizationRuleBase):
+    """Model for creating or updating a recurring cost rule"""
+    pass
+
+
+class AmortizationRuleResponse(AmortizationRuleBase):
+    """Model for recurring cost rule response"""
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class BudgetBase(BaseModel):
+    """Base monthly budget model"""
+    category: str
+    amount: float = Field(..., gt=0, description="Most to spend in the category per month")
+
+
+class BudgetCreate(BudgetBase):
+    """Model for setting a category's budget"""
+    pass
+
+
+class BudgetResponse(BudgetBase):
+    """Model for budget response"""
+    created_at: datetime
+    updated_at: datetime
+
+
 class CategoryStats(BaseModel):
     """Model for category statistics"""
     category: str
@@ -87,6 +250,47 @@ class UploadStats(BaseModel):
     auto_categorized_count: int
     has_category_column: bool
     message: str
+    ingest_profile: Optional[Dict] = None
+
+
+class IngestProfileResponse(BaseModel):
+    """Model for a CSV format remembered by header signature"""
+    signature: str
+    header: str
+    profile: Dict
+    uses: int
+    created_at: datetime
+    last_used_at: datetime
+
+
+class ImportResponse(BaseModel):
+    """Model for one imported source file"""
+    id: int
+    filename: str
+    account: Optional[str] = None
+    mode: str
+    row_count: int
+    first_transaction_id: Optional[int] = None
+    last_transaction_id: Optional[int] = None
+    min_date: Optional[str] = None
+    max_date: Optional[str] = None
+    created_at: datetime
+
+
+class UploadJobResponse(BaseModel):
+    """Model for background upload job status"""
+    id: str
+    filename: str
+    status: str
+    phase: str
+    rows_processed: int
+    bytes_total: int
+    elapsed_seconds: Optional[float] = None
+    rows_per_second: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[UploadStats] = None
+    cancel_requested: bool = False
+    created_at: datetime
 
 
 class AnalyticsData(BaseModel):
@@ -99,11 +303,24 @@ class AnalyticsData(BaseModel):
 
 class CategorySuggestion(BaseModel):
     """Model for category suggestion response"""
-    suggested_category: str
+    # None when no mapping or rule matched
+    suggested_category: Optional[str] = None
     confidence: float = 0.0
     reason: str = ""
 
 
+class LedgerCreate(BaseModel):
+    """Model for creating a ledger"""
+    name: str = Field(..., description="1-64 letters, digits, '-' or '_'")
+
+
+class LedgerResponse(BaseModel):
+    """Model for ledger responses"""
+    name: str
+    is_open: bool
+    size_bytes: int
+
+
 class ErrorResponse(BaseModel):
     """Model for error responses"""
     error: str
@@ -3,8 +3,7 @@ Analytics API endpoints
 """
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict, Optional
-from datetime import datetime, timedelta
-import pandas as pd
+from datetime import date
 import os
 import sys
 
@@ -13,14 +12,75 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from api.models import AnalyticsData
-from database.db_manager import db
+from api.anomaly_scoring import anomaly_scoring_status, refresh_anomalies
+from api.middleware import TimedRoute
+from api.models import (
+    AnalyticsData,
+    AmortizationRuleCreate,
+    AmortizationRuleResponse,
+    BudgetCreate,
+    BudgetResponse,
+    SuccessResponse,
+)
+from database.db_manager import db, AVAILABLE_CATEGORIES
+from tools.amortization import amortize, period_months
+from tools.anomalies import DEFAULT_THRESHOLD, MIN_STORED_SCORE
+from tools.date_ranges import DateRange, month_start, resolve_date_range
+from tools.forecast import EXCLUDED_CATEGORIES, forecast_month, profile_window, spending_profiles
+from tools.recurring import DEFAULT_MIN_OCCURRENCES, active_series, detect_recurring
+from tools.lazy import lazy_import
 
-router = APIRouter()
+pd = lazy_import("pandas")
+
+router = APIRouter(route_class=TimedRoute)
+
+START_DATE_QUERY = Query(None, description="First day to include (inclusive); overrides months_back")
+END_DATE_QUERY = Query(None, description="Last day to include (inclusive); overrides months_back")
+AMORTIZED_QUERY = Query(False, description="Spread recurring costs (see /amortization-rules) over the months they cover")
+
+
+def _date_window(start_date: Optional[date], end_date: Optional[date],
+                 months_back: Optional[int]) -> DateRange:
+    """Window of a request: explicit dates, else whole calendar months ending with this one."""
+    try:
+        return resolve_date_range(start_date, end_date, months_back)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _transactions(window: DateRange, amortized: bool = False, freq: str = 'M') -> "pd.DataFrame":
+    """Transactions in the window; amortized replaces recurring costs by daily or monthly slices."""
+    if not amortized:
+        return db.get_transactions(start_date=window.start, end_date=window.end)
+    
+    rules = [(rule['account'], rule['payee'], rule['months']) for rule in db.get_amortization_rules()]
+    # Payments made before the window can still cover part of it
+    longest = max((months for _, _, months in rules), default=1)
+    start = month_start(window.start, -(longest - 1)) if window.start else None
+    df = db.get_transactions(start_date=start, end_date=window.end)
+    df = amortize(df, period_months(df, rules), freq)
+    if window.start:
+        df = df[df['date'] >= pd.Timestamp(window.start)]
+    if window.end:
+        df = df[df['date'] <= pd.Timestamp(window.end)]
+    return df
+
+
+def _filled(window: DateRange, df: "pd.DataFrame") -> DateRange:
+    """Close open sides of a window with the first transaction and today (or the last transaction)."""
+    today = date.today()
+    has_dates = not df.empty and df['date'].notna().any()
+    start = window.start
+    if start is None:
+        start = df['date'].min().date() if has_dates else today
+    end = window.end
+    if end is None:
+        end = max(today, df['date'].max().date()) if has_dates else today
+    return DateRange(start, end)
 
 
 @router.get("/has-data")
-async def check_if_data_exists():
+def check_if_data_exists():
     """Check if there's existing transaction data in the database"""
     try:
         df = db.get_transactions(limit=1)  # Just check if any transactions exist
@@ -30,10 +90,15 @@ async def check_if_data_exists():
 
 
 @router.get("/overview", response_model=Dict)
-async def get_analytics_overview():
+def get_analytics_overview(
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY,
+    months_back: Optional[int] = Query(None, ge=1, description="Number of calendar months to analyze, including this one")
+):
     """Get analytics overview data for dashboard"""
     try:
-        df = db.get_transactions()
+        window = _date_window(start_date, end_date, months_back)
+        df = db.get_transactions(start_date=window.start, end_date=window.end)
         
         if df.empty:
             return {
@@ -70,25 +135,27 @@ async def get_analytics_overview():
             "date_range": date_range
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating analytics overview: {str(e)}")
 
 
 @router.get("/income-vs-expenses")
-async def get_income_vs_expenses(months_back: int = Query(12, description="Number of months to analyze")):
+def get_income_vs_expenses(
+    months_back: int = Query(12, ge=1, description="Number of calendar months to analyze, including this one"),
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY,
+    amortized: bool = AMORTIZED_QUERY
+):
     """Get income vs expenses data by month"""
     try:
-        df = db.get_transactions()
+        window = _date_window(start_date, end_date, months_back)
+        df_filtered = _transactions(window, amortized, 'M')
         
-        if df.empty:
+        if df_filtered.empty:
             return {"monthly_data": []}
         
-        # Filter by date range
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=months_back * 30)
-        
-        df_filtered = df[df['date'] >= start_date]
-        
         # Group by month
         df_filtered['year_month'] = df_filtered['date'].dt.to_period('M')
         monthly_data = []
@@ -111,15 +178,22 @@ async def get_income_vs_expenses(months_back: int = Query(12, description="Numbe
         
         return {"monthly_data": monthly_data}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating income vs expenses data: {str(e)}")
 
 
 @router.get("/expenses-by-category")
-async def get_expenses_by_category():
+def get_expenses_by_category(
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY,
+    months_back: Optional[int] = Query(None, ge=1, description="Number of calendar months to analyze, including this one")
+):
     """Get expenses breakdown by category"""
     try:
-        df = db.get_transactions()
+        window = _date_window(start_date, end_date, months_back)
+        df = db.get_transactions(start_date=window.start, end_date=window.end)
         
         if df.empty:
             return {"category_data": []}
@@ -155,15 +229,23 @@ async def get_expenses_by_category():
         
         return {"category_data": category_data}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating expenses by category: {str(e)}")
 
 
 @router.get("/cumulative-expenses")
-async def get_cumulative_expenses():
+def get_cumulative_expenses(
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY,
+    months_back: Optional[int] = Query(None, ge=1, description="Number of calendar months to analyze, including this one"),
+    amortized: bool = AMORTIZED_QUERY
+):
     """Get cumulative expenses by month for each category"""
     try:
-        df = db.get_transactions()
+        window = _date_window(start_date, end_date, months_back)
+        df = _transactions(window, amortized, 'M')
         
         if df.empty:
             return {"cumulative_data": []}
@@ -199,15 +281,22 @@ async def get_cumulative_expenses():
         
         return {"cumulative_data": cumulative_data}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating cumulative expenses: {str(e)}")
 
 
 @router.get("/transaction-trends")
-async def get_transaction_trends():
+def get_transaction_trends(
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY,
+    months_back: Optional[int] = Query(None, ge=1, description="Number of calendar months to analyze, including this one")
+):
     """Get transaction trends and patterns"""
     try:
-        df = db.get_transactions()
+        window = _date_window(start_date, end_date, months_back)
+        df = db.get_transactions(start_date=window.start, end_date=window.end)
         
         if df.empty:
             return {"trends": {}}
@@ -243,39 +332,40 @@ async def get_transaction_trends():
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating transaction trends: {str(e)}")
 
 
 @router.get("/income-expense-plot")
-async def get_income_expense_plot(months_back: int = Query(12, description="Number of months to analyze")):
+def get_income_expense_plot(
+    months_back: int = Query(12, ge=1, description="Number of calendar months to analyze, including this one"),
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY,
+    amortized: bool = AMORTIZED_QUERY
+):
     """Get detailed income vs expenses data for plotting like streamlit version"""
     try:
-        df = db.get_transactions()
+        window = _date_window(start_date, end_date, months_back)
+        df_filtered = _transactions(window, amortized, 'M')
         
-        if df.empty:
+        # A quiet window still gets a row per month; only an empty database doesn't
+        if df_filtered.empty and db.get_transactions(limit=1).empty:
             return {"monthly_data": [], "plot_data": []}
         
-        # Convert date to datetime and filter by date range
-        df['date'] = pd.to_datetime(df['date'])
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=months_back * 30)
-        
-        df_filtered = df[df['date'] >= start_date]
-        
         # Group by month
         df_filtered['year_month'] = df_filtered['date'].dt.to_period('M')
         
         monthly_data = []
         plot_data = {'income': [], 'expenses': [], 'investment': [], 'dates': []}
         
-        # Generate complete date range for requested months_back period
-        end_period = pd.Period(datetime.now(), freq='M')
-        start_period = end_period - (months_back - 1)  # -1 because we include current month
-        all_months = pd.period_range(start_period, end_period, freq='M')
+        # Every month of the window, including months without transactions
+        window = _filled(window, df_filtered)
+        all_months = pd.period_range(window.start, window.end, freq='M')
         
         for period in all_months:
-            month_df = df_filtered[df_filtered['year_month'] == period] if not df_filtered.empty else pd.DataFrame()
+            month_df = df_filtered[df_filtered['year_month'] == period]
             
             # Income (positive amounts)
             income = month_df[month_df['amount'] > 0]['amount'].sum() if not month_df.empty else 0
@@ -306,36 +396,37 @@ async def get_income_expense_plot(months_back: int = Query(12, description="Numb
         
         return {"monthly_data": monthly_data, "plot_data": plot_data}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating income expense plot data: {str(e)}")
 
 
 @router.get("/cumulative-expenses-plot")
-async def get_cumulative_expenses_plot(months_back: int = Query(3, description="Number of months to analyze")):
+def get_cumulative_expenses_plot(
+    months_back: int = Query(3, ge=1, description="Number of calendar months to analyze, including this one"),
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY,
+    amortized: bool = AMORTIZED_QUERY
+):
     """Get cumulative expenses by category for plotting"""
     try:
-        df = db.get_transactions()
+        window = _date_window(start_date, end_date, months_back)
+        df = _transactions(window, amortized, 'D')
         
-        if df.empty:
+        if df.empty and db.get_transactions(limit=1).empty:
             return {"plot_data": {}, "categories": []}
         
         # Filter only expenses (negative amounts)
         df_expenses = df[df['amount'] < 0].copy()
         df_expenses['amount'] = df_expenses['amount'].abs()
-        df_expenses['date'] = pd.to_datetime(df_expenses['date'])
         
-        # Filter by date range
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=months_back * 30)
-        df_expenses = df_expenses[df_expenses['date'] >= start_date]
+        # Every day of the window, including days without transactions
+        window = _filled(window, df)
+        all_dates = pd.date_range(window.start, window.end, freq='D')
         
         if df_expenses.empty:
             # Still return the full time range structure with empty data
-            end_period = pd.Period(datetime.now(), freq='M')
-            start_period = end_period - (months_back - 1)
-            first_day = start_period.to_timestamp()
-            last_day = end_period.to_timestamp('M')
-            all_dates = pd.date_range(first_day, last_day, freq='D')
             return {
                 "plot_data": {}, 
                 "categories": [], 
@@ -345,18 +436,9 @@ async def get_cumulative_expenses_plot(months_back: int = Query(3, description="
         # Add year_month column
         df_expenses['year_month'] = df_expenses['date'].dt.to_period('M')
         
-        # Get all unique categories and dates
+        # Get all unique categories
         categories = df_expenses['category'].dropna().unique().tolist()
         
-        # Generate complete date range for requested months_back period
-        end_period = pd.Period(datetime.now(), freq='M')
-        start_period = end_period - (months_back - 1)  # -1 because we include current month
-        
-        # Create full date range from start of first month to end of last month
-        first_day = start_period.to_timestamp()
-        last_day = end_period.to_timestamp('M')  # End of month
-        all_dates = pd.date_range(first_day, last_day, freq='D')
-        
         plot_data = {}
         for category in categories:
             plot_data[category] = []
@@ -385,25 +467,26 @@ async def get_cumulative_expenses_plot(months_back: int = Query(3, description="
         
         return {"plot_data": plot_data, "categories": categories, "dates": [d.strftime('%Y-%m-%d') for d in all_dates]}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating cumulative expenses plot: {str(e)}")
 
 
 @router.get("/expense-groups-plot")
-async def get_expense_groups_plot(months_back: Optional[int] = None):
+def get_expense_groups_plot(
+    months_back: Optional[int] = Query(None, ge=1, description="Number of calendar months to analyze, including this one"),
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY
+):
     """Get expense groups data for bar/pie chart plotting"""
     try:
-        df = db.get_transactions()
+        window = _date_window(start_date, end_date, months_back)
+        df = db.get_transactions(start_date=window.start, end_date=window.end)
         
         if df.empty:
             return {"category_data": [], "plot_data": {"labels": [], "values": [], "colors": []}}
         
-        # Apply date filtering if months_back is specified
-        if months_back is not None:
-            df['date'] = pd.to_datetime(df['date'])
-            cutoff_date = datetime.now() - timedelta(days=months_back * 30)  # Approximate months
-            df = df[df['date'] >= cutoff_date]
-        
         # Filter only expenses (negative amounts)
         expenses_df = df[df['amount'] < 0].copy()
         expenses_df['amount'] = expenses_df['amount'].abs()
@@ -443,15 +526,23 @@ async def get_expense_groups_plot(months_back: Optional[int] = None):
         
         return {"category_data": category_data, "plot_data": plot_data}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating expense groups plot: {str(e)}")
 
 
 @router.get("/expense-groups-deepdive")
-async def get_expense_groups_deepdive(category: Optional[str] = None, months_back: Optional[int] = None):
+def get_expense_groups_deepdive(
+    category: Optional[str] = None,
+    months_back: Optional[int] = Query(None, ge=1, description="Number of calendar months to analyze, including this one"),
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY
+):
     """Get detailed expense breakdown by category and subcategory"""
     try:
-        df = db.get_transactions()
+        window = _date_window(start_date, end_date, months_back)
+        df = db.get_transactions(start_date=window.start, end_date=window.end)
         
         if df.empty:
             return {"scatter_data": [], "category_summaries": [], "categories": [], "date_range": {}}
@@ -466,22 +557,9 @@ async def get_expense_groups_deepdive(category: Optional[str] = None, months_bac
         # Get all categories for dropdown
         all_categories = expenses_df['category'].unique().tolist()
         
-        # Add year_month for analysis
-        expenses_df['date'] = pd.to_datetime(expenses_df['date'])
-        
-        # Calculate date range for the chart
-        if months_back is not None:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=months_back * 30)  # Approximate months
-            
-            # Apply date filtering
-            expenses_df = expenses_df[expenses_df['date'] >= start_date]
-        else:
-            # If no months_back specified, use data range
-            start_date = expenses_df['date'].min()
-            end_date = expenses_df['date'].max()
-        
-        # Always provide date range info for chart scaling
+        # Always provide date range info for chart scaling; open sides use the data range
+        start_date = window.start or expenses_df['date'].min()
+        end_date = window.end or expenses_df['date'].max()
         date_range = {
             "start_date": start_date.strftime('%Y-%m-%d'),
             "end_date": end_date.strftime('%Y-%m-%d')
@@ -535,15 +613,22 @@ async def get_expense_groups_deepdive(category: Optional[str] = None, months_bac
             "date_range": date_range
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating expense groups deepdive: {str(e)}")
 
 
 @router.get("/bank-transactions-table")
-async def get_bank_transactions_table():
+def get_bank_transactions_table(
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY,
+    months_back: Optional[int] = Query(None, ge=1, description="Number of calendar months to show, including this one")
+):
     """Get all transactions for table display"""
     try:
-        df = db.get_transactions()
+        window = _date_window(start_date, end_date, months_back)
+        df = db.get_transactions(start_date=window.start, end_date=window.end)
         
         if df.empty:
             return {"transactions": [], "total_count": 0}
@@ -566,5 +651,178 @@ async def get_bank_transactions_table():
         
         return {"transactions": transactions, "total_count": len(transactions)}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating bank transactions table: {str(e)}")
+
+
+@router.get("/recurring")
+def get_recurring_payments(
+    min_occurrences: int = Query(DEFAULT_MIN_OCCURRENCES, ge=2, description="Fewest payments that make a series"),
+    include_inactive: bool = Query(False, description="Also list series whose payments stopped")
+):
+    """Detect subscriptions and other recurring expenses per payee over the whole history.
+    
+    Detection is cached until transactions change.
+    """
+    try:
+        series = db.get_derived(
+            f"recurring:{min_occurrences}",
+            lambda: detect_recurring(db.get_transactions(), min_occurrences=min_occurrences)
+        )
+        series = series.assign(active=active_series(series))
+        if not include_inactive:
+            series = series[series['active']]
+        
+        for column in ('first_date', 'last_date', 'next_expected'):
+            series[column] = pd.to_datetime(series[column]).dt.strftime('%Y-%m-%d')
+        return {
+            "series": series.to_dict(orient='records'),
+            "total_monthly_cost": round(float(series.loc[series['active'], 'monthly_cost'].sum()), 2)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error detecting recurring payments: {str(e)}")
+
+
+@router.get("/anomalies")
+def get_anomalies(
+    threshold: float = Query(DEFAULT_THRESHOLD, ge=MIN_STORED_SCORE, description="Lowest robust z-score to report"),
+    category: Optional[str] = Query(None, description="Only anomalies in this category"),
+    start_date: Optional[date] = START_DATE_QUERY,
+    end_date: Optional[date] = END_DATE_QUERY,
+    months_back: Optional[int] = Query(None, ge=1, description="Number of calendar months to show, including this one"),
+    limit: int = Query(100, ge=1, le=1000, description="Most anomalies returned")
+):
+    """Expenses far above what their payee (or, lacking history, their category) usually costs.
+    
+    Scores are robust z-scores of the log amount against the median and
+    interquartile range of the year before; expected is that median amount.
+    Only reads the stored scores. Uploads score their rows as they are
+    stored; scoring says whether scores are behind anyway (after deletes),
+    which POST /anomalies/refresh fixes.
+    """
+    try:
+        window = _date_window(start_date, end_date, months_back)
+        scoring = anomaly_scoring_status()
+        found = db.get_anomalies(threshold, window.start, window.end, category, limit)
+        return {"threshold": threshold, "scoring": scoring, **found}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error detecting anomalies: {str(e)}")
+
+
+@router.post("/anomalies/refresh")
+def refresh_anomaly_scores(
+    rebuild: bool = Query(False, description="Rescore the whole history instead of only new rows")
+):
+    """Score the rows added since the last refresh, or everything after deletes or with rebuild"""
+    try:
+        return refresh_anomalies(rebuild)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error scoring anomalies: {str(e)}")
+
+
+def _spending_profiles(today: date) -> List[Dict]:
+    """Stored spending profiles, rebuilt from the profile window when data or the month changed."""
+    first, last = profile_window(today)
+    instance_id, data_version = db.get_data_version()
+    # The trailing marker drops profiles stored before short histories were averaged correctly
+    version = f"{instance_id}:{data_version}:{first.isoformat()}:covered"
+    stored_version, profiles = db.get_spending_profiles()
+    if stored_version != version:
+        profiles = spending_profiles(db.get_transactions(start_date=first, end_date=last), end=last)
+        db.save_spending_profiles(version, profiles)
+    return profiles
+
+
+@router.get("/forecast")
+def get_forecast():
+    """Project month-end spending per category and compare it with budgets.
+    
+    Combines this month's spending so far with day-of-month profiles of the
+    last 12 full months, which are stored and only rebuilt after data changes.
+    """
+    try:
+        today = date.today()
+        month = db.get_transactions(start_date=month_start(today), end_date=today)
+        expenses = month[(month['amount'] < 0) & ~month['category'].isin(EXCLUDED_CATEGORIES)]
+        spent = (-expenses['amount']).groupby(expenses['category']).sum().to_dict()
+        budgets = {budget['category']: budget['amount'] for budget in db.get_budgets()}
+        return forecast_month(spent, _spending_profiles(today), budgets, today)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating forecast: {str(e)}")
+
+
+@router.get("/budgets", response_model=List[BudgetResponse])
+def get_budgets():
+    """Get monthly budgets by category"""
+    try:
+        return db.get_budgets()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching budgets: {str(e)}")
+
+
+@router.post("/budgets", response_model=SuccessResponse)
+def save_budget(budget: BudgetCreate):
+    """Set or change a category's monthly budget"""
+    try:
+        if budget.category not in AVAILABLE_CATEGORIES:
+            raise HTTPException(status_code=400, detail="Invalid category")
+        db.save_budget(budget.category, budget.amount)
+        return SuccessResponse(message=f"Budget for {budget.category} saved successfully")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving budget: {str(e)}")
+
+
+@router.delete("/budgets/{category}", response_model=SuccessResponse)
+def delete_budget(category: str):
+    """Remove a category's budget"""
+    try:
+        if not db.delete_budget(category):
+            raise HTTPException(status_code=404, detail="Budget not found")
+        return SuccessResponse(message=f"Budget for {category} deleted successfully")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting budget: {str(e)}")
+
+
+@router.get("/amortization-rules", response_model=List[AmortizationRuleResponse])
+def get_amortization_rules():
+    """Get the recurring costs that amortized=true spreads over their period"""
+    try:
+        return db.get_amortization_rules()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching amortization rules: {str(e)}")
+
+
+@router.post("/amortization-rules", response_model=SuccessResponse)
+def save_amortization_rule(rule: AmortizationRuleCreate):
+    """Mark an account+payee as a recurring cost covering a number of months"""
+    try:
+        rule_id = db.save_amortization_rule(rule.account, rule.payee, rule.months)
+        return SuccessResponse(
+            message="Amortization rule saved successfully",
+            data={"id": rule_id}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving amortization rule: {str(e)}")
+
+
+@router.delete("/amortization-rules/{rule_id}", response_model=SuccessResponse)
+def delete_amortization_rule(rule_id: int):
+    """Delete a recurring cost rule"""
+    try:
+        if not db.delete_amortization_rule(rule_id):
+            raise HTTPException(status_code=404, detail="Amortization rule not found")
+        return SuccessResponse(
+            message=f"Amortization rule {rule_id} deleted successfully"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting amortization rule: {str(e)}")
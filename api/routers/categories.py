@@ -1,11 +1,10 @@
 """
 Categories API endpoints
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, UploadFile, File
 from typing import List, Dict
 import os
 import sys
-import sqlite3
 from datetime import datetime
 
 # Add the project root to Python path
@@ -13,28 +12,31 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+from api.middleware import TimedRoute
 from api.models import (
     CategoryMappingResponse,
     CategoryMappingCreate,
+    CategoryRuleCreate,
+    CategoryRuleResponse,
     CategoryStats,
     SuccessResponse
 )
 from database.db_manager import db, AVAILABLE_CATEGORIES
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/available", response_model=List[str])
-async def get_available_categories():
+def get_available_categories():
     """Get list of available categories"""
     return AVAILABLE_CATEGORIES
 
 
 @router.get("/mappings", response_model=List[CategoryMappingResponse])
-async def get_category_mappings():
+def get_category_mappings():
     """Get all category mappings"""
     try:
-        with sqlite3.connect(db.db_path) as conn:
+        with db.connect() as conn:
             cursor = conn.execute(
                 """SELECT id, account, payee, category, created_at, updated_at 
                    FROM category_mappings ORDER BY updated_at DESC"""
@@ -83,7 +85,7 @@ async def get_category_mappings():
 
 
 @router.post("/mappings", response_model=SuccessResponse)
-async def create_category_mapping(mapping: CategoryMappingCreate):
+def create_category_mapping(mapping: CategoryMappingCreate):
     """Create a new category mapping"""
     try:
         if mapping.category not in AVAILABLE_CATEGORIES:
@@ -92,14 +94,15 @@ async def create_category_mapping(mapping: CategoryMappingCreate):
         if not mapping.account or not mapping.payee:
             raise HTTPException(status_code=400, detail="Both account and payee are required")
         
-        db.save_category_mapping(
+        transactions_updated = db.save_category_mapping(
             account=mapping.account,
             payee=mapping.payee,
             category=mapping.category
         )
         
         return SuccessResponse(
-            message="Category mapping created successfully"
+            message="Category mapping created successfully",
+            data={"transactions_updated": transactions_updated}
         )
     except HTTPException:
         raise
@@ -107,8 +110,117 @@ async def create_category_mapping(mapping: CategoryMappingCreate):
         raise HTTPException(status_code=500, detail=f"Error creating category mapping: {str(e)}")
 
 
+def _import_mappings(mappings: List[CategoryMappingCreate]) -> SuccessResponse:
+    """Validate and save a batch of mappings, applying them to existing transactions"""
+    invalid = sorted({m.category for m in mappings if m.category not in AVAILABLE_CATEGORIES})
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid categories: {', '.join(invalid)}")
+    if any(not m.account or not m.payee for m in mappings):
+        raise HTTPException(status_code=400, detail="Both account and payee are required")
+    
+    result = db.import_category_mappings([(m.account, m.payee, m.category) for m in mappings])
+    return SuccessResponse(
+        message=f"Imported {result['mappings_saved']} category mappings",
+        data=result
+    )
+
+
+@router.post("/mappings/bulk", response_model=SuccessResponse)
+def import_category_mappings(mappings: List[CategoryMappingCreate]):
+    """Create or update many category mappings in one set-based transaction"""
+    try:
+        return _import_mappings(mappings)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing category mappings: {str(e)}")
+
+
+@router.post("/mappings/import/csv", response_model=SuccessResponse)
+def import_category_mappings_csv(file: UploadFile = File(...)):
+    """Import category mappings from a CSV with account, payee and category columns"""
+    try:
+        import pandas as pd
+        import io
+        
+        try:
+            df = pd.read_csv(io.BytesIO(file.file.read()), dtype=str, keep_default_na=False)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error parsing CSV: {str(e)}")
+        
+        df.columns = [col.strip().lower() for col in df.columns]
+        missing_columns = [col for col in ['account', 'payee', 'category'] if col not in df.columns]
+        if missing_columns:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Missing required columns: {', '.join(missing_columns)}"
+            )
+        
+        mappings = [
+            CategoryMappingCreate(account=account, payee=payee, category=category)
+            for account, payee, category in zip(df['account'], df['payee'], df['category'])
+        ]
+        return _import_mappings(mappings)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing category mappings: {str(e)}")
+
+
+@router.get("/rules", response_model=List[CategoryRuleResponse])
+def get_category_rules():
+    """Get all pattern-based categorization rules, highest priority first"""
+    try:
+        return db.get_category_rules()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching category rules: {str(e)}")
+
+
+@router.post("/rules", response_model=SuccessResponse)
+def create_category_rule(rule: CategoryRuleCreate):
+    """Create a substring, prefix or regex rule on payee or description"""
+    try:
+        if rule.category not in AVAILABLE_CATEGORIES:
+            raise HTTPException(status_code=400, detail="Invalid category")
+        
+        try:
+            rule_id = db.save_category_rule(
+                field=rule.field,
+                match_type=rule.match_type,
+                pattern=rule.pattern,
+                category=rule.category,
+                priority=rule.priority
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return SuccessResponse(
+            message="Category rule created successfully",
+            data={"id": rule_id}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating category rule: {str(e)}")
+
+
+@router.delete("/rules/{rule_id}", response_model=SuccessResponse)
+def delete_category_rule(rule_id: int):
+    """Delete a categorization rule"""
+    try:
+        if not db.delete_category_rule(rule_id):
+            raise HTTPException(status_code=404, detail="Category rule not found")
+        return SuccessResponse(
+            message=f"Category rule {rule_id} deleted successfully"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting category rule: {str(e)}")
+
+
 @router.get("/stats", response_model=List[CategoryStats])
-async def get_category_stats():
+def get_category_stats():
     """Get statistics for each category"""
     try:
         df = db.get_category_stats()
@@ -132,7 +244,7 @@ async def get_category_stats():
 
 
 @router.delete("/mappings", response_model=SuccessResponse)
-async def clear_category_mappings():
+def clear_category_mappings():
     """Clear all category mappings"""
     try:
         db.clear_category_mappings()
@@ -144,7 +256,7 @@ async def clear_category_mappings():
 
 
 @router.get("/mappings/export/csv")
-async def export_category_mappings_csv():
+def export_category_mappings_csv():
     """Export category mappings to CSV"""
     try:
         from fastapi.responses import StreamingResponse
@@ -154,13 +266,14 @@ async def export_category_mappings_csv():
         mappings = db.get_category_mappings()
         mapping_rows = []
         
-        for mapping_type in ['payee', 'account']:
-            for value, category in mappings[mapping_type].items():
-                mapping_rows.append({
-                    'Type': mapping_type,
-                    'Value': value,
-                    'Category': category
-                })
+        # Same account, payee, category columns the CSV import expects
+        for composite_key, category in mappings.items():
+            account, payee = composite_key.split('|', 1)
+            mapping_rows.append({
+                'account': account,
+                'payee': payee,
+                'category': category
+            })
         
         if not mapping_rows:
             raise HTTPException(status_code=404, detail="No mappings to export")
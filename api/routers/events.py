@@ -0,0 +1,113 @@
+"""
+Server-sent events API endpoint
+
+GET /api/events streams one `change` event per write to transactions, with
+what changed (uploaded rows, deleted or recategorized ids) and the months it
+touched, so the frontend can refresh only the affected panels. Writes made by
+this process wake the stream right away; writes by other worker processes are
+picked up by a cheap check of the change_events table every POLL_SECONDS.
+"""
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import asyncio
+import json
+import os
+import sys
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from api.middleware import TimedRoute
+from database.db_manager import ledgers
+
+router = APIRouter(route_class=TimedRoute)
+
+# How often the stream checks for writes by other processes
+POLL_SECONDS = 2.0
+
+# Idle time after which a comment line keeps proxies from closing the stream
+HEARTBEAT_SECONDS = 15.0
+
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+
+def _format_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _stream(request: Request, database, last_id: Optional[int]):
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+
+    def notify():
+        # Runs on the writing thread
+        loop.call_soon_threadsafe(wake.set)
+
+    database.add_change_listener(notify)
+    try:
+        oldest, newest = await run_in_threadpool(database.get_change_event_range)
+        _, version = await run_in_threadpool(database.get_data_version)
+        yield f"retry: {RETRY_MS}\n\n"
+        # A client resuming past the kept events (or from another database)
+        # missed changes and has to reload everything
+        missed = last_id is not None and (
+            (oldest is not None and last_id < oldest - 1) or last_id > (newest or 0)
+        )
+        if last_id is None or missed:
+            last_id = newest or 0
+        yield _format_event("ready", {"data_version": version, "reset": missed}, last_id)
+
+        idle = 0.0
+        while not await request.is_disconnected():
+            wake.clear()
+            events = await run_in_threadpool(database.get_change_events, last_id)
+            for event in events:
+                last_id = event["id"]
+                yield _format_event("change", event, last_id)
+            if events:
+                idle = 0.0
+            elif idle >= HEARTBEAT_SECONDS:
+                yield ": keepalive\n\n"
+                idle = 0.0
+            try:
+                await asyncio.wait_for(wake.wait(), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                idle += POLL_SECONDS
+    finally:
+        database.remove_change_listener(notify)
+
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    last_event_id: Optional[int] = Query(
+        None, ge=0, description="Resume after this event id (EventSource sends the Last-Event-ID header on reconnect)"
+    )
+):
+    """Stream data changes as server-sent events.
+
+    Starts with a `ready` event carrying the data version; `reset: true` means
+    the requested resume point is no longer kept and everything should be
+    reloaded. Each `change` event has kind (uploaded, deleted, recategorized,
+    cleared), data_version, count, ids (null past 1000 rows) and months (null
+    when any month may have changed).
+    """
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    # The stream keeps the manager it started with, even if the ledger is evicted
+    database = ledgers.current()
+    return StreamingResponse(
+        _stream(request, database, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,66 @@
+"""
+Ledgers API endpoints
+
+Data endpoints select a ledger with the X-Ledger header or the
+/api/ledgers/{name}/... path prefix, see api.middleware.
+"""
+from fastapi import APIRouter, HTTPException
+from typing import List
+import os
+import sys
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from api.middleware import TimedRoute
+from api.models import LedgerCreate, LedgerResponse
+from database.db_manager import ledgers
+from database.ledgers import validate_ledger_name
+
+router = APIRouter(route_class=TimedRoute)
+
+
+def _describe(name: str) -> dict:
+    for ledger in ledgers.list_ledgers():
+        if ledger["name"] == name:
+            return ledger
+    raise HTTPException(status_code=404, detail=f"Ledger '{name}' not found")
+
+
+@router.get("", response_model=List[LedgerResponse])
+async def list_ledgers():
+    """List ledgers on disk and whether they are currently open"""
+    try:
+        return ledgers.list_ledgers()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing ledgers: {str(e)}")
+
+
+@router.post("", response_model=LedgerResponse, status_code=201)
+def create_ledger(ledger: LedgerCreate):
+    """Create an empty ledger"""
+    try:
+        validate_ledger_name(ledger.name)
+        if ledgers.exists(ledger.name):
+            raise HTTPException(status_code=409, detail=f"Ledger '{ledger.name}' already exists")
+        ledgers.get(ledger.name, create=True)
+        return _describe(ledger.name)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating ledger: {str(e)}")
+
+
+@router.get("/{name}", response_model=LedgerResponse)
+async def get_ledger(name: str):
+    """Get a ledger's size and whether it is open"""
+    try:
+        return _describe(name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching ledger: {str(e)}")
@@ -2,8 +2,10 @@
 Transactions API endpoints
 """
 from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
-import pandas as pd
+from datetime import date
+import json
 import os
 import sys
 
@@ -12,80 +14,214 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+from api.middleware import TimedRoute
 from api.models import (
     TransactionResponse, 
     TransactionCreate, 
     TransactionUpdate,
+    BulkCategorizeRequest,
+    BulkCategorizeResponse,
+    TransactionSearchResponse,
+    TransactionChangesResponse,
+    DuplicatesResponse,
+    DuplicateResolveRequest,
+    DuplicateResolveResponse,
     DatabaseStats,
     CategorySuggestion,
     SuccessResponse,
     ErrorResponse
 )
 from database.db_manager import db, AVAILABLE_CATEGORIES
+from tools.date_ranges import resolve_date_range
+from tools.duplicates import DEFAULT_MIN_SCORE, DEFAULT_WINDOW_DAYS, find_duplicates
+from tools.lazy import lazy_import
 
-router = APIRouter()
+pd = lazy_import("pandas")
+
+router = APIRouter(route_class=TimedRoute)
+
+
+def _transaction_dict(row) -> dict:
+    return {
+        "id": int(row["id"]),
+        "date": row["date"],
+        "amount": float(row["amount"]),
+        "description": str(row["description"]),
+        "account": str(row["account"]),
+        "payee": str(row["payee"]),
+        "category": str(row["category"]),
+        "is_manually_categorized": bool(row["is_manually_categorized"]),
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"]
+    }
 
 
 @router.get("/", response_model=List[TransactionResponse])
-async def get_transactions(
+def get_transactions(
     limit: Optional[int] = Query(None, description="Limit number of transactions returned"),
-    uncategorized_only: bool = Query(False, description="Return only uncategorized transactions")
+    uncategorized_only: bool = Query(False, description="Return only uncategorized transactions"),
+    start_date: Optional[date] = Query(None, description="First day to include (inclusive)"),
+    end_date: Optional[date] = Query(None, description="Last day to include (inclusive)"),
+    months_back: Optional[int] = Query(None, ge=1, description="Only the last N calendar months, including this one")
 ):
-    """Get all transactions or uncategorized transactions"""
+    """Get all transactions or uncategorized transactions
+    
+    The JSON is built by SQLite and streamed as it is read, skipping a pydantic
+    model per row; response_model only documents the shape.
+    """
     try:
-        if uncategorized_only:
-            df = db.get_uncategorized_transactions()
-        else:
-            df = db.get_transactions(limit=limit)
-        
-        if df.empty:
-            return []
-        
-        # Convert DataFrame to list of dictionaries
-        transactions = []
-        for _, row in df.iterrows():
-            transaction = {
-                "id": int(row["id"]),
-                "date": row["date"],
-                "amount": float(row["amount"]),
-                "description": str(row["description"]),
-                "account": str(row["account"]),
-                "payee": str(row["payee"]),
-                "category": str(row["category"]),
-                "is_manually_categorized": bool(row["is_manually_categorized"]),
-                "created_at": row["created_at"],
-                "updated_at": row["updated_at"]
-            }
-            transactions.append(transaction)
-        
-        return transactions
+        window = resolve_date_range(start_date, end_date, months_back)
+        return StreamingResponse(
+            db.iter_transactions_json(
+                limit=limit, start_date=window.start, end_date=window.end,
+                uncategorized_only=uncategorized_only
+            ),
+            media_type="application/json"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching transactions: {str(e)}")
 
 
+# Declared before /{transaction_id} so "search" isn't parsed as an id
+@router.get("/search", response_model=TransactionSearchResponse)
+def search_transactions(
+    q: str = Query(..., min_length=1, description="Text to find in payee or description; all words must match"),
+    start_date: Optional[date] = Query(None, description="Only transactions on or after this date"),
+    end_date: Optional[date] = Query(None, description="Only transactions on or before this date"),
+    category: Optional[str] = Query(None, description="Only transactions in this category"),
+    sort: str = Query("date", description="'date' for newest first or 'relevance' for best match first"),
+    limit: int = Query(50, ge=1, le=500, description="Results per page"),
+    offset: int = Query(0, ge=0, description="Results to skip")
+):
+    """Full-text search over payee and description"""
+    try:
+        found = db.search_transactions(
+            q, start_date=start_date, end_date=end_date, category=category,
+            sort=sort, limit=limit, offset=offset
+        )
+        return {"query": q, "limit": limit, "offset": offset, **found}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching transactions: {str(e)}")
+
+
+@router.get("/changes", response_model=TransactionChangesResponse)
+def get_transaction_changes(
+    since: int = Query(0, ge=0, description="seq of the last sync; 0 for everything")
+):
+    """Transactions inserted or updated and ids deleted since a previous sync.
+    
+    Every write gets the next sequence number; pass the returned seq as since
+    next time. With reset true (first sync, or the history was replaced or
+    wiped since) transactions holds every row and the client replaces its copy.
+    Like the transaction list, the rows' JSON comes from SQLite as is.
+    """
+    try:
+        changes = db.get_transaction_changes(since)
+        transactions_json = changes.pop("transactions_json")
+        # The other fields with the ready-made array spliced in as transactions
+        return Response(
+            json.dumps(changes)[:-1] + ', "transactions": ' + transactions_json + "}",
+            media_type="application/json"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching transaction changes: {str(e)}")
+
+
+@router.get("/duplicates", response_model=DuplicatesResponse)
+def get_duplicates(
+    window_days: int = Query(DEFAULT_WINDOW_DAYS, ge=0, le=31, description="Most days between the two bookings"),
+    min_score: float = Query(DEFAULT_MIN_SCORE, ge=0, le=1, description="Lowest similarity score to report"),
+    start_date: Optional[date] = Query(None, description="Only transactions on or after this date"),
+    end_date: Optional[date] = Query(None, description="Only transactions on or before this date"),
+    months_back: Optional[int] = Query(None, ge=1, description="Only the last N calendar months, including this one"),
+    limit: int = Query(100, ge=1, le=1000, description="Most candidates returned")
+):
+    """Pairs of transactions in the same account with the same amount a few days apart,
+    scored by payee/description similarity and date proximity"""
+    try:
+        window = resolve_date_range(start_date, end_date, months_back)
+        df = db.get_transactions(start_date=window.start, end_date=window.end)
+        pairs = find_duplicates(df, window_days, min_score, dismissed=db.get_duplicate_dismissals())
+        
+        candidates = []
+        for pair in pairs.head(limit).itertuples():
+            first, second = df.iloc[pair.first], df.iloc[pair.second]
+            candidates.append({
+                "score": float(pair.score),
+                "days_apart": int(pair.days_apart),
+                "account": str(first["account"]),
+                "amount": float(first["amount"]),
+                "first": _transaction_dict(first),
+                "second": _transaction_dict(second)
+            })
+        return {
+            "total": len(pairs), "window_days": window_days, "min_score": min_score,
+            "candidates": candidates
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding duplicates: {str(e)}")
+
+
+@router.post("/duplicates/resolve", response_model=DuplicateResolveResponse)
+def resolve_duplicates(request: DuplicateResolveRequest):
+    """Delete duplicates or dismiss pairs as distinct, all in one request.
+    
+    A duplicate is only deleted if the transaction kept in its place exists and
+    isn't deleted by the same request, so resolving a pair never loses both.
+    """
+    try:
+        resolutions = request.resolutions
+        deleting = {r.duplicate_id for r in resolutions if r.action == 'delete'}
+        existing = set(db.existing_transaction_ids(
+            [r.keep_id for r in resolutions] + [r.duplicate_id for r in resolutions]
+        ))
+        
+        results = []
+        to_delete = []
+        to_dismiss = []
+        for resolution in resolutions:
+            keep_id, duplicate_id = resolution.keep_id, resolution.duplicate_id
+            if keep_id == duplicate_id:
+                results.append({"id": duplicate_id, "status": "invalid", "detail": "keep_id equals duplicate_id"})
+            elif keep_id not in existing or duplicate_id not in existing:
+                results.append({"id": duplicate_id, "status": "not_found"})
+            elif resolution.action == 'dismiss':
+                to_dismiss.append((keep_id, duplicate_id))
+                results.append({"id": duplicate_id, "status": "dismissed"})
+            elif keep_id in deleting:
+                results.append({
+                    "id": duplicate_id, "status": "conflict",
+                    "detail": f"Transaction {keep_id} is deleted by this request"
+                })
+            else:
+                to_delete.append(duplicate_id)
+                results.append({"id": duplicate_id, "status": "deleted"})
+        
+        deleted = db.delete_transactions(to_delete) if to_delete else []
+        dismissed = db.dismiss_duplicates(to_dismiss) if to_dismiss else 0
+        return DuplicateResolveResponse(
+            deleted_count=len(deleted), dismissed_count=dismissed, results=results
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error resolving duplicates: {str(e)}")
+
+
 @router.get("/{transaction_id}", response_model=TransactionResponse)
-async def get_transaction(transaction_id: int):
+def get_transaction(transaction_id: int):
     """Get a specific transaction by ID"""
     try:
-        df = db.get_transactions()
-        transaction_row = df[df["id"] == transaction_id]
+        transaction = db.get_transaction(transaction_id)
         
-        if transaction_row.empty:
+        if transaction is None:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
-        row = transaction_row.iloc[0]
-        return {
-            "id": int(row["id"]),
-            "date": row["date"],
-            "amount": float(row["amount"]),
-            "description": str(row["description"]),
-            "account": str(row["account"]),
-            "payee": str(row["payee"]),
-            "category": str(row["category"]),
-            "is_manually_categorized": bool(row["is_manually_categorized"]),
-            "created_at": row["created_at"],
-            "updated_at": row["updated_at"]
-        }
+        return transaction
     except HTTPException:
         raise
     except Exception as e:
@@ -93,26 +229,17 @@ async def get_transaction(transaction_id: int):
 
 
 @router.patch("/{transaction_id}", response_model=SuccessResponse)
-async def update_transaction(transaction_id: int, update_data: TransactionUpdate):
+def update_transaction(transaction_id: int, update_data: TransactionUpdate):
     """Update a transaction (mainly for categorization)"""
     try:
-        # Check if transaction exists
-        df = db.get_transactions()
-        if df[df["id"] == transaction_id].empty:
-            raise HTTPException(status_code=404, detail="Transaction not found")
-        
-        # Currently only category updates are supported in the original system
+        # Currently only category updates are supported in the original system.
+        # The category and its account+payee mapping are written in one transaction.
         if update_data.category:
-            db.update_transaction_category(transaction_id, update_data.category)
-            
-            # Save category mapping for future auto-categorization using account+payee combination
-            transaction_row = df[df["id"] == transaction_id].iloc[0]
-            account = transaction_row["account"]
-            payee = transaction_row["payee"]
-            
-            # Only save mapping if both account and payee exist
-            if account and payee:
-                db.save_category_mapping(account, payee, update_data.category)
+            result = db.bulk_update_categories([(transaction_id, update_data.category)])
+            if result["updated_count"] == 0:
+                raise HTTPException(status_code=404, detail="Transaction not found")
+        elif db.get_transaction(transaction_id) is None:
+            raise HTTPException(status_code=404, detail="Transaction not found")
         
         return SuccessResponse(
             message=f"Transaction {transaction_id} updated successfully"
@@ -124,16 +251,14 @@ async def update_transaction(transaction_id: int, update_data: TransactionUpdate
 
 
 @router.get("/suggest-category/{transaction_id}", response_model=CategorySuggestion)
-async def suggest_category(transaction_id: int):
+def suggest_category(transaction_id: int):
     """Get category suggestion for a transaction"""
     try:
-        df = db.get_transactions()
-        transaction_row = df[df["id"] == transaction_id]
+        row = db.get_transaction(transaction_id)
         
-        if transaction_row.empty:
+        if row is None:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
-        row = transaction_row.iloc[0]
         suggested_category = db.suggest_category(
             amount=row["amount"],
             description=row["description"],
@@ -142,13 +267,13 @@ async def suggest_category(transaction_id: int):
         )
         
         # Determine confidence and reason
-        confidence = 0.5  # Default
-        reason = "Default suggestion"
+        confidence = 0.0
+        reason = "No mapping or rule matches"
         
         if suggested_category == "Income" and row["amount"] > 0:
             confidence = 0.9
             reason = "Positive amount indicates income"
-        elif suggested_category != "Other":
+        elif suggested_category is not None:
             confidence = 0.8
             reason = "Based on learned patterns"
         
@@ -164,7 +289,7 @@ async def suggest_category(transaction_id: int):
 
 
 @router.get("/stats/database", response_model=DatabaseStats)
-async def get_database_stats():
+def get_database_stats():
     """Get database statistics"""
     try:
         stats = db.get_database_stats()
@@ -174,7 +299,7 @@ async def get_database_stats():
 
 
 @router.post("/auto-categorize", response_model=SuccessResponse)
-async def auto_categorize_transactions():
+def auto_categorize_transactions():
     """Auto-categorize transactions based on learned mappings"""
     try:
         updated_count = db.auto_categorize_transactions()
@@ -186,11 +311,54 @@ async def auto_categorize_transactions():
         raise HTTPException(status_code=500, detail=f"Error auto-categorizing: {str(e)}")
 
 
+@router.post("/bulk-categorize", response_model=BulkCategorizeResponse)
+def bulk_categorize_transactions(request: BulkCategorizeRequest):
+    """Recategorize many transactions at once, by id list or by filter plus category.
+    
+    All category updates and mapping upserts are applied in a single database transaction.
+    """
+    try:
+        if request.updates is not None and request.filter is not None:
+            raise HTTPException(status_code=400, detail="Provide either updates or filter, not both")
+        
+        if request.filter is not None:
+            if request.category not in AVAILABLE_CATEGORIES:
+                raise HTTPException(status_code=400, detail="Invalid category")
+            try:
+                result = db.bulk_update_category_by_filter(
+                    request.filter.model_dump(),
+                    request.category,
+                    save_mappings=request.save_mappings
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return BulkCategorizeResponse(**result)
+        
+        if not request.updates:
+            raise HTTPException(status_code=400, detail="No updates provided")
+        
+        # Invalid categories are reported per item instead of failing the whole batch
+        valid_updates = []
+        invalid = []
+        for update in request.updates:
+            if update.category in AVAILABLE_CATEGORIES:
+                valid_updates.append((update.id, update.category))
+            else:
+                invalid.append({"id": update.id, "status": "invalid_category", "detail": update.category})
+        
+        result = db.bulk_update_categories(valid_updates, save_mappings=request.save_mappings)
+        result["results"].extend(invalid)
+        return BulkCategorizeResponse(**result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error bulk categorizing transactions: {str(e)}")
+
+
 @router.get("/export/csv")
-async def export_transactions_csv():
+def export_transactions_csv():
     """Export all transactions to CSV"""
     try:
-        from fastapi.responses import StreamingResponse
         import io
         
         df = db.get_transactions()
@@ -211,3 +379,46 @@ async def export_transactions_csv():
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error exporting transactions: {str(e)}")
+
+
+def _export_columnar(fmt: str, extension: str):
+    """Shared handler for Parquet and Arrow exports"""
+    from fastapi.responses import Response
+    from tools.ingest import write_columnar, COLUMNAR_FORMATS
+    
+    df = db.get_transactions()
+    if df.empty:
+        raise HTTPException(status_code=404, detail="No transactions to export")
+    
+    try:
+        content = write_columnar(df, fmt)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    return Response(
+        content=content,
+        media_type=COLUMNAR_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=transactions.{extension}"}
+    )
+
+
+@router.get("/export/parquet")
+def export_transactions_parquet():
+    """Export all transactions to Parquet"""
+    try:
+        return _export_columnar('parquet', 'parquet')
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting transactions: {str(e)}")
+
+
+@router.get("/export/arrow")
+def export_transactions_arrow():
+    """Export all transactions to an Arrow IPC file"""
+    try:
+        return _export_columnar('arrow', 'arrow')
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting transactions: {str(e)}")
@@ -1,8 +1,8 @@
 """
 File upload API endpoints
 """
-from fastapi import APIRouter, HTTPException, UploadFile, File
-import pandas as pd
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Depends
+from typing import Dict, List, Optional, Tuple
 import io
 import os
 import sys
@@ -12,116 +12,293 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from api.models import UploadStats, SuccessResponse
-from database.db_manager import db
+from api.middleware import TimedRoute
+from api.models import UploadStats, UploadJobResponse, ImportResponse, IngestProfileResponse, SuccessResponse
+from api.upload_jobs import upload_jobs, store_upload, describe_job
+from database.db_manager import db, IMPORT_MODES
+from tools.ingest import (
+    DETECTION_SAMPLE_BYTES,
+    IngestProfile,
+    detect_profile,
+    header_signature,
+    prepare_transactions,
+    read_columnar,
+    read_csv,
+    resolve_profile,
+    validate_profile,
+)
+from tools.lazy import lazy_import
 
-router = APIRouter()
+pd = lazy_import("pandas")
+
+router = APIRouter(route_class=TimedRoute)
+
+# Size of the reads used to stream uploads to the spool directory
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+# Written by older versions that only remembered the last file
+LEGACY_LAST_FILENAME_PATH = "data/last_uploaded_filename.txt"
+
+# Upload modes selectable by clients; replace_import is reached via /imports/{id}/replace
+UPLOAD_MODES = [mode for mode in IMPORT_MODES if mode != 'replace_import']
+
+
+def _validate_mode(mode: str):
+    if mode not in UPLOAD_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid mode '{mode}', expected one of: {', '.join(UPLOAD_MODES)}"
+        )
+
+
+def _ingest_profile(
+    profile: str = Query("auto", description="auto (detect, remembered per bank header) or a built-in profile: default, de, at, ch, fr, es, it, nl, uk, us"),
+    delimiter: Optional[str] = Query(None, description="Field separator, overrides the profile"),
+    decimal: Optional[str] = Query(None, description="Decimal separator of amounts: '.' or ','"),
+    thousands: Optional[str] = Query(None, description="Thousands separator of amounts, e.g. '.'"),
+    date_format: Optional[str] = Query(None, description="Date format, e.g. %d.%m.%Y"),
+    encoding: Optional[str] = Query(None, description="File encoding, e.g. utf-8 or cp1252")
+) -> Dict:
+    """Requested ingest profile of a CSV upload: a profile name plus overrides"""
+    overrides = {
+        field: value for field, value in
+        {"delimiter": delimiter, "decimal": decimal, "thousands": thousands,
+         "date_format": date_format, "encoding": encoding}.items()
+        if value is not None
+    }
+    try:
+        # Check names and overrides before the upload is read
+        resolve_profile("default" if profile == "auto" else profile, **overrides)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"name": profile, "overrides": overrides}
+
+
+def _resolve_ingest_profile(requested: Dict, sample: bytes) -> Tuple[IngestProfile, Optional[Tuple[str, str]]]:
+    """Profile for a file starting with sample.
+    
+    auto uses the profile saved for the file's header signature, detecting one
+    on first sight. Returns the profile plus (signature, header) to save it
+    under once the file parsed, or None if nothing new was detected.
+    """
+    if requested["name"] != "auto":
+        return resolve_profile(requested["name"], **requested["overrides"]), None
+    
+    signature = header_signature(sample)
+    saved = db.get_ingest_profile(signature)
+    try:
+        profile = IngestProfile(**saved) if saved else detect_profile(sample)
+        profile = profile._replace(**requested["overrides"])
+        validate_profile(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Could not detect the CSV format: {str(e)}")
+    if saved:
+        return profile, None
+    header = sample.split(b'\n', 1)[0].decode(profile.encoding, errors='replace').strip('\ufeff\r')
+    return profile, (signature, header)
+
+
+def _parse_csv(contents: bytes, profile: IngestProfile, **kwargs) -> "pd.DataFrame":
+    try:
+        return read_csv(io.BytesIO(contents), profile, **kwargs)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail=f"File is not valid {profile.encoding}; pass encoding=")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error parsing CSV: {str(e)}")
+
+
+def _prepare_csv(df: "pd.DataFrame", profile: IngestProfile,
+                 detected: Optional[Tuple[str, str]]) -> Tuple["pd.DataFrame", bool]:
+    """Validate a parsed CSV; a newly detected profile is saved once the file parsed cleanly"""
+    try:
+        df, has_category_column = prepare_transactions(df, profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if detected:
+        signature, header = detected
+        db.save_ingest_profile(signature, header, profile._asdict())
+    return df, has_category_column
+
+
+def _read_csv_upload(file: UploadFile, requested: Dict) -> Tuple["pd.DataFrame", bool, IngestProfile]:
+    """Read, parse and validate an uploaded CSV file; returns the frame, has_category_column and the profile used"""
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV")
+    
+    # Read CSV content
+    contents = file.file.read()
+    profile, detected = _resolve_ingest_profile(requested, contents[:DETECTION_SAMPLE_BYTES])
+    
+    # Parse CSV
+    df = _parse_csv(contents, profile)
+    df, has_category_column = _prepare_csv(df, profile, detected)
+    return df, has_category_column, profile
 
 
 @router.post("/csv", response_model=UploadStats)
-async def upload_csv(file: UploadFile = File(...)):
+def upload_csv(
+    file: UploadFile = File(...),
+    mode: str = Query("replace_all", description="replace_all, append or replace_account"),
+    ingest: Dict = Depends(_ingest_profile)
+):
     """Upload and process CSV file with transactions"""
     try:
-        # Validate file type
-        if not file.filename.endswith('.csv'):
-            raise HTTPException(status_code=400, detail="File must be a CSV")
+        _validate_mode(mode)
+        df, has_category_column, profile = _read_csv_upload(file, ingest)
         
-        # Read CSV content
-        contents = await file.read()
-        csv_content = contents.decode('utf-8')
-        
-        # Parse CSV
-        try:
-            df = pd.read_csv(io.StringIO(csv_content))
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error parsing CSV: {str(e)}")
-        
-        # Validate required columns
-        required_columns = ['date', 'amount', 'description']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Missing required columns: {', '.join(missing_columns)}"
-            )
-        
-        # Check for optional columns
-        optional_columns = ['account', 'payee', 'category']
-        for col in optional_columns:
-            if col not in df.columns:
-                df[col] = ''
-        
-        # Detect if category column has meaningful data
-        has_category_column = (
-            'category' in df.columns and 
-            not df['category'].isin(['', 'Other', None]).all()
+        return UploadStats(
+            **store_upload(df, has_category_column, file.filename, mode=mode),
+            ingest_profile=profile._asdict()
         )
         
-        # Process dates
-        try:
-            df['date'] = pd.to_datetime(df['date'], errors='coerce')
-            if df['date'].isna().any():
-                raise ValueError("Invalid date format")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error parsing dates: {str(e)}")
-        
-        # Process amounts
-        try:
-            df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-            if df['amount'].isna().any():
-                raise ValueError("Invalid amount format")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error parsing amounts: {str(e)}")
-        
-        # Clean text fields
-        df['description'] = df['description'].astype(str).fillna('')
-        df['account'] = df['account'].astype(str).fillna('')
-        df['payee'] = df['payee'].astype(str).fillna('')
-        
-        # Handle category column
-        if has_category_column:
-            df['category'] = df['category'].astype(str).fillna('Other')
-            # Replace empty strings with 'Other'
-            df.loc[df['category'] == '', 'category'] = 'Other'
-        else:
-            df['category'] = 'Other'
-        
-        # Save to database (this clears existing data first)
-        inserted_count = db.insert_transactions(df)
-        
-        # Auto-categorize uncategorized transactions
-        auto_categorized_count = 0
-        if not has_category_column:
-            auto_categorized_count = db.auto_categorize_transactions()
-        
-        # Save filename for reference
-        filename_path = "data/last_uploaded_filename.txt"
-        os.makedirs(os.path.dirname(filename_path), exist_ok=True)
-        with open(filename_path, 'w') as f:
-            f.write(file.filename)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing upload: {str(e)}")
+
+
+def _upload_columnar(file: UploadFile, fmt: str, extensions: tuple, mode: str) -> UploadStats:
+    """Shared handler for Parquet and Arrow uploads, validated like CSV uploads"""
+    _validate_mode(mode)
+    if not file.filename.endswith(extensions):
+        raise HTTPException(status_code=400, detail=f"File must be {' or '.join(extensions)}")
+    
+    contents = file.file.read()
+    try:
+        df = read_columnar(contents, fmt)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error parsing {fmt} file: {str(e)}")
+    
+    try:
+        df, has_category_column = prepare_transactions(df)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return UploadStats(**store_upload(df, has_category_column, file.filename, mode=mode))
+
+
+@router.post("/parquet", response_model=UploadStats)
+def upload_parquet(
+    file: UploadFile = File(...),
+    mode: str = Query("replace_all", description="replace_all, append or replace_account")
+):
+    """Upload transactions as a Parquet file"""
+    try:
+        return _upload_columnar(file, 'parquet', ('.parquet', '.pq'), mode)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing upload: {str(e)}")
+
+
+@router.post("/arrow", response_model=UploadStats)
+def upload_arrow(
+    file: UploadFile = File(...),
+    mode: str = Query("replace_all", description="replace_all, append or replace_account")
+):
+    """Upload transactions as an Arrow IPC file or stream"""
+    try:
+        return _upload_columnar(file, 'arrow', ('.arrow', '.feather', '.arrows'), mode)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing upload: {str(e)}")
+
+
+@router.post("/jobs", response_model=UploadJobResponse, status_code=202)
+def create_upload_job(
+    file: UploadFile = File(...),
+    mode: str = Query("replace_all", description="replace_all, append or replace_account"),
+    ingest: Dict = Depends(_ingest_profile)
+):
+    """Spool a CSV file to disk and process it in the background.
+    
+    The format is resolved and checked on the first rows before queueing.
+    Returns immediately with a job id; poll GET /jobs/{job_id} for progress.
+    """
+    try:
+        _validate_mode(mode)
+        if not file.filename.endswith('.csv'):
+            raise HTTPException(status_code=400, detail="File must be a CSV")
         
-        message = f"Successfully uploaded {inserted_count} transactions"
-        if auto_categorized_count > 0:
-            message += f" and auto-categorized {auto_categorized_count}"
+        job_id = upload_jobs.new_job_id()
+        sample = b''
+        with open(upload_jobs.spool_path(job_id), 'wb') as spool:
+            while chunk := file.file.read(SPOOL_CHUNK_BYTES):
+                if len(sample) < DETECTION_SAMPLE_BYTES:
+                    sample += chunk[:DETECTION_SAMPLE_BYTES - len(sample)]
+                spool.write(chunk)
         
-        return UploadStats(
-            inserted_count=inserted_count,
-            auto_categorized_count=auto_categorized_count,
-            has_category_column=has_category_column,
-            message=message
-        )
+        try:
+            profile, detected = _resolve_ingest_profile(ingest, sample)
+            # Whole lines only, the sample may end mid-row
+            head = sample if len(sample) < DETECTION_SAMPLE_BYTES else sample[:sample.rfind(b'\n') + 1]
+            # A newly detected profile is saved by the job once the whole file parsed
+            _prepare_csv(_parse_csv(head, profile), profile, None)
+        except HTTPException:
+            os.remove(upload_jobs.spool_path(job_id))
+            raise
         
+        options = {"mode": mode, "profile": profile._asdict()}
+        if detected:
+            options["detected"] = list(detected)
+        return describe_job(upload_jobs.submit(job_id, file.filename, options=options))
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error queueing upload: {str(e)}")
+
+
+@router.get("/jobs", response_model=List[UploadJobResponse])
+def list_upload_jobs(limit: int = 50):
+    """List recent upload jobs"""
+    try:
+        return [describe_job(job) for job in db.list_upload_jobs(limit=limit)]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing upload jobs: {str(e)}")
+
+
+@router.get("/jobs/{job_id}", response_model=UploadJobResponse)
+def get_upload_job(job_id: str):
+    """Get phase, rows processed, throughput and errors of an upload job"""
+    try:
+        job = db.get_upload_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Upload job not found")
+        return describe_job(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching upload job: {str(e)}")
+
+
+@router.delete("/jobs/{job_id}", response_model=UploadJobResponse)
+def cancel_upload_job(job_id: str):
+    """Cancel a queued or running upload job"""
+    try:
+        status = upload_jobs.cancel(job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Upload job not found")
+        if status in ('completed', 'failed'):
+            raise HTTPException(status_code=409, detail=f"Upload job already {status}")
+        return describe_job(db.get_upload_job(job_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error cancelling upload job: {str(e)}")
 
 
 @router.get("/last-filename")
-async def get_last_uploaded_filename():
+def get_last_uploaded_filename():
     """Get the filename of the last uploaded file"""
     try:
-        filename_path = "data/last_uploaded_filename.txt"
+        filename = db.get_last_import_filename()
+        if filename:
+            return {"filename": filename}
+        
+        filename_path = LEGACY_LAST_FILENAME_PATH
         if os.path.exists(filename_path):
             with open(filename_path, 'r') as f:
                 filename = f.read().strip()
@@ -132,8 +309,55 @@ async def get_last_uploaded_filename():
         raise HTTPException(status_code=500, detail=f"Error getting last filename: {str(e)}")
 
 
+@router.get("/imports", response_model=List[ImportResponse])
+def get_imports():
+    """List imported source files with their account and transaction id range"""
+    try:
+        return db.get_imports()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching imports: {str(e)}")
+
+
+@router.delete("/imports/{import_id}", response_model=SuccessResponse)
+def rollback_import(import_id: int):
+    """Roll back one import, deleting only the transactions it created"""
+    try:
+        deleted_count = db.delete_import(import_id)
+        if deleted_count is None:
+            raise HTTPException(status_code=404, detail="Import not found")
+        return SuccessResponse(
+            message=f"Rolled back import {import_id} ({deleted_count} transactions deleted)",
+            data={"deleted_count": deleted_count}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rolling back import: {str(e)}")
+
+
+@router.post("/imports/{import_id}/replace", response_model=UploadStats)
+def replace_import(import_id: int, file: UploadFile = File(...),
+                         ingest: Dict = Depends(_ingest_profile)):
+    """Re-import a statement, replacing only the transactions of an earlier import"""
+    try:
+        df, has_category_column, _ = _read_csv_upload(file, ingest)
+        
+        try:
+            stats = store_upload(
+                df, has_category_column, file.filename,
+                mode="replace_import", replace_import_id=import_id
+            )
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Import not found")
+        return UploadStats(**stats)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error replacing import: {str(e)}")
+
+
 @router.delete("/clear-data", response_model=SuccessResponse)
-async def clear_all_data():
+def clear_all_data():
     """Clear all transaction data"""
     try:
         db.clear_all_transactions()
@@ -142,3 +366,25 @@ async def clear_all_data():
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing data: {str(e)}")
+
+
+@router.get("/profiles", response_model=List[IngestProfileResponse])
+def get_ingest_profiles():
+    """CSV formats detected so far, by header signature"""
+    try:
+        return db.get_ingest_profiles()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching ingest profiles: {str(e)}")
+
+
+@router.delete("/profiles/{signature}", response_model=SuccessResponse)
+def delete_ingest_profile(signature: str):
+    """Forget a detected CSV format, so the next upload with that header is detected again"""
+    try:
+        if not db.delete_ingest_profile(signature):
+            raise HTTPException(status_code=404, detail="Ingest profile not found")
+        return SuccessResponse(message=f"Ingest profile {signature} deleted successfully")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting ingest profile: {str(e)}")
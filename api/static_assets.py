@@ -0,0 +1,215 @@
+"""
+Frontend assets with fingerprinted URLs, caching headers and precompression.
+
+Every file under the frontend directory is hashed and compressed (gzip, plus
+brotli when the optional `brotli` package is installed) once, when it is first
+served or changes on disk, and kept in memory. index.html is served with its
+/static/ references rewritten to fingerprinted URLs (/static/app.<hash>.js),
+which never change content and are cached for a year; index.html itself is
+revalidated after a short TTL, so a deploy is picked up within a minute.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+# Fingerprinted URLs never change content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# index.html and files requested without a fingerprint
+INDEX_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Characters of the content hash used in fingerprinted names
+HASH_LENGTH = 12
+
+# Files smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 512
+
+MEDIA_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.json': 'application/json',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.ico': 'image/x-icon',
+    '.woff2': 'font/woff2',
+}
+COMPRESSIBLE = ('.html', '.js', '.css', '.json', '.svg')
+
+# src="/static/..." and href="/static/..." references in HTML
+STATIC_REFERENCE = re.compile(r'(?P<attr>(?:src|href)=")/static/(?P<path>[^"?#]+)"')
+
+
+def _brotli():
+    """The brotli module, or None; it's an optional dependency."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+@dataclass
+class Asset:
+    """One file's content, fingerprint and precompressed variants."""
+    path: str
+    media_type: str
+    digest: str
+    # Content-Encoding ('identity', 'gzip', 'br') -> body
+    variants: Dict[str, bytes] = field(default_factory=dict)
+    stamp: tuple = ()
+
+    @property
+    def fingerprinted(self) -> str:
+        """The file name with the hash before the extension: app.js -> app.<hash>.js"""
+        base, ext = os.path.splitext(self.path)
+        return f"{base}.{self.digest}{ext}"
+
+
+def build_asset(path: str, content: bytes, stamp: tuple = ()) -> Asset:
+    ext = os.path.splitext(path)[1].lower()
+    asset = Asset(
+        path=path,
+        media_type=MEDIA_TYPES.get(ext, 'application/octet-stream'),
+        digest=hashlib.sha256(content).hexdigest()[:HASH_LENGTH],
+        variants={'identity': content},
+        stamp=stamp
+    )
+    if ext in COMPRESSIBLE and len(content) >= MIN_COMPRESS_BYTES:
+        # mtime=0 keeps the gzip bytes identical across restarts and workers
+        asset.variants['gzip'] = gzip.compress(content, compresslevel=9, mtime=0)
+        brotli = _brotli()
+        if brotli is not None:
+            asset.variants['br'] = brotli.compress(content, quality=11)
+    return asset
+
+
+def choose_encoding(accept_encoding: str, available) -> str:
+    """Best of the available encodings the client accepts: br, then gzip, then identity."""
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    for encoding in ('br', 'gzip'):
+        if encoding in available and (encoding in accepted or '*' in accepted):
+            return encoding
+    return 'identity'
+
+
+class StaticAssets:
+    """Serve a directory of frontend files; see the module docstring."""
+
+    def __init__(self, directory: str, index: str = "index.html"):
+        self.directory = os.path.abspath(directory)
+        self.index_name = index
+        self._assets: Dict[str, Asset] = {}
+        self._index: Optional[Asset] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        """Hash and compress every file now rather than on first request. Returns the file count."""
+        count = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                relative = os.path.relpath(os.path.join(root, name), self.directory).replace(os.sep, '/')
+                if self.get(relative) is not None:
+                    count += 1
+        self.index()
+        return count
+
+    def get(self, path: str) -> Optional[Asset]:
+        """The current asset at a path relative to the directory, rebuilt if the file changed."""
+        full = os.path.normpath(os.path.join(self.directory, path))
+        if not full.startswith(self.directory + os.sep):
+            return None
+        try:
+            stat = os.stat(full)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        asset = self._assets.get(path)
+        if asset is None or asset.stamp != stamp:
+            with open(full, 'rb') as f:
+                asset = build_asset(path, f.read(), stamp)
+            with self._lock:
+                self._assets[path] = asset
+        return asset
+
+    def index(self) -> Optional[Asset]:
+        """index.html with fingerprinted references to the current assets."""
+        source = self.get(self.index_name)
+        if source is None:
+            return None
+
+        def fingerprint(match: re.Match) -> str:
+            asset = self.get(match.group('path'))
+            path = asset.fingerprinted if asset is not None else match.group('path')
+            return f'{match.group("attr")}/static/{path}"'
+
+        html = STATIC_REFERENCE.sub(fingerprint, source.variants['identity'].decode('utf-8'))
+        content = html.encode('utf-8')
+        current = self._index
+        if current is None or current.digest != hashlib.sha256(content).hexdigest()[:HASH_LENGTH]:
+            current = build_asset(self.index_name, content)
+            self._index = current
+        return current
+
+    def resolve(self, path: str):
+        """(asset, immutable) for a request path; fingerprinted names are immutable."""
+        asset = self.get(path)
+        if asset is not None:
+            return asset, False
+        base, ext = os.path.splitext(path)
+        base, _, digest = base.rpartition('.')
+        if not base or len(digest) != HASH_LENGTH:
+            return None, False
+        asset = self.get(base + ext)
+        # An outdated fingerprint still gets the current file, just not cached for good
+        return asset, asset is not None and asset.digest == digest
+
+    def respond(self, request: Request, asset: Asset, cache_control: str) -> Response:
+        encoding = choose_encoding(request.headers.get('accept-encoding', ''), asset.variants)
+        etag = f'"{asset.digest}"' if encoding == 'identity' else f'"{asset.digest}-{encoding}"'
+        headers = {'Cache-Control': cache_control, 'ETag': etag, 'Vary': 'Accept-Encoding'}
+
+        if_none_match = request.headers.get('if-none-match', '')
+        if if_none_match:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            if etag in tags or '*' in tags:
+                return Response(status_code=304, headers=headers)
+
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(asset.variants[encoding], media_type=asset.media_type, headers=headers)
+
+    async def serve(self, request: Request, path: str) -> Response:
+        """GET /static/{path}"""
+        asset, immutable = self.resolve(path)
+        if asset is None:
+            return Response(status_code=404)
+        return self.respond(request, asset, IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL)
+
+    async def serve_index(self, request: Request) -> Optional[Response]:
+        """index.html, or None without one."""
+        asset = self.index()
+        if asset is None:
+            return None
+        return self.respond(request, asset, INDEX_CACHE_CONTROL)
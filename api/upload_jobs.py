@@ -0,0 +1,284 @@
+"""
+Background processing for large uploads.
+
+Uploaded files are spooled to disk and processed by a bounded thread pool.
+Job state lives in the upload_jobs table so progress can be polled, jobs can
+be cancelled, and jobs interrupted by a restart are picked up again. A job
+stores its rows in one transaction that tags the import with the job id; a
+rerun from the spooled file replaces that import rather than adding the rows
+again, and categorizing and scoring are safe to repeat.
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from api.anomaly_scoring import refresh_anomalies
+from database.db_manager import db
+from tools.ingest import IngestProfile, prepare_transactions, read_csv
+from tools.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+
+SPOOL_DIR = "data/uploads"
+
+# Rows parsed between progress updates and cancellation checks
+CHUNK_ROWS = 100_000
+
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested."""
+
+
+class JobInterrupted(Exception):
+    """Raised inside a job when the server is shutting down."""
+
+
+def store_upload(df: pd.DataFrame, has_category_column: bool, filename: str,
+                 mode: str = "replace_all", replace_import_id: Optional[int] = None,
+                 upload_job_id: Optional[str] = None, on_phase=None) -> Dict:
+    """Insert a prepared frame as a new import, auto-categorize it and score its anomalies.
+
+    Shared by the synchronous upload endpoint and background jobs. Returns the
+    fields of UploadStats.
+    """
+    if on_phase:
+        on_phase('inserting')
+    # Save to database; the mode decides which existing rows are replaced
+    inserted_count = db.insert_transactions(
+        df, filename=filename, mode=mode, replace_import_id=replace_import_id,
+        upload_job_id=upload_job_id
+    )
+
+    # Auto-categorize uncategorized transactions
+    auto_categorized_count = 0
+    if not has_category_column:
+        if on_phase:
+            on_phase('categorizing')
+        auto_categorized_count = db.auto_categorize_transactions()
+
+    # Only the new rows are scored, against the stored baselines
+    if on_phase:
+        on_phase('scoring')
+    try:
+        refresh_anomalies()
+    except Exception as e:
+        # The upload is stored; GET /anomalies reports the scores as behind
+        print(f"⚠️  Anomaly scoring failed: {e}")
+
+    message = f"Successfully uploaded {inserted_count} transactions"
+    if auto_categorized_count > 0:
+        message += f" and auto-categorized {auto_categorized_count}"
+
+    return {
+        "inserted_count": inserted_count,
+        "auto_categorized_count": auto_categorized_count,
+        "has_category_column": has_category_column,
+        "message": message
+    }
+
+
+class UploadJobManager:
+    """Runs spooled uploads on a bounded worker pool."""
+
+    def __init__(self, spool_dir: str = SPOOL_DIR, max_workers: Optional[int] = None):
+        self.spool_dir = spool_dir
+        self.max_workers = max_workers or int(os.environ.get("PFIN_UPLOAD_WORKERS", "2"))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        # Jobs running in this process
+        self._active = set()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._stopping.clear()
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="upload-job"
+                )
+            return self._executor
+
+    def spool_path(self, job_id: str) -> str:
+        """Path of the spooled upload for a job."""
+        return os.path.join(self.spool_dir, f"{job_id}.csv")
+
+    def new_job_id(self) -> str:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        return uuid.uuid4().hex
+
+    def submit(self, job_id: str, filename: str, options: Optional[Dict] = None) -> Dict:
+        """Queue a job whose file has already been written to spool_path(job_id).
+
+        Options are keyword arguments for store_upload, e.g. the import mode,
+        plus the fields of the file's IngestProfile under 'profile' and, when
+        that profile was just detected, the [signature, header] to remember
+        it by under 'detected'.
+        """
+        path = self.spool_path(job_id)
+        db.create_upload_job(
+            job_id, filename, path, os.path.getsize(path),
+            options=json.dumps(options) if options else None
+        )
+        self._enqueue(job_id)
+        return db.get_upload_job(job_id)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Request cancellation; returns the resulting status or None if unknown."""
+        return db.request_upload_job_cancel(job_id)
+
+    def resume_interrupted(self) -> int:
+        """Requeue jobs left running or queued by a previous process. Returns how many.
+        
+        Jobs still running in another live worker process are not touched, and
+        the atomic claim makes sure each queued job runs in only one worker.
+        """
+        job_ids = db.requeue_interrupted_upload_jobs(is_job_alive=self._job_alive)
+        for job_id in job_ids:
+            self._enqueue(job_id)
+        return len(job_ids)
+
+    def _enqueue(self, job_id: str):
+        # Run in the caller's context so the job writes to the ledger it was submitted to
+        self._get_executor().submit(contextvars.copy_context().run, self._run, job_id)
+
+    def _job_alive(self, job_id: str, owner_pid: int) -> bool:
+        """Whether a job marked running is really still running somewhere."""
+        if owner_pid == os.getpid():
+            return job_id in self._active
+        return _process_alive(owner_pid)
+
+    def shutdown(self):
+        """Stop workers at their next checkpoint; unfinished jobs resume on next start."""
+        self._stopping.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _checkpoint(self, job_id: str):
+        if self._stopping.is_set():
+            raise JobInterrupted()
+        if db.is_upload_job_cancel_requested(job_id):
+            raise JobCancelled()
+
+    def _run(self, job_id: str):
+        if not db.claim_upload_job(job_id):
+            return
+        self._active.add(job_id)
+        job = db.get_upload_job(job_id)
+        keep_spool = False
+
+        try:
+            if not os.path.exists(job['spool_path']):
+                raise ValueError("Spooled upload file is missing")
+
+            options = json.loads(job['options']) if job.get('options') else {}
+            profile = IngestProfile(**options.pop('profile', {}))
+            detected = options.pop('detected', None)
+
+            db.update_upload_job(job_id, phase='parsing')
+            chunks = []
+            rows_processed = 0
+            try:
+                for chunk in read_csv(job['spool_path'], profile, chunksize=CHUNK_ROWS):
+                    self._checkpoint(job_id)
+                    chunks.append(chunk)
+                    rows_processed += len(chunk)
+                    db.update_upload_job(job_id, rows_processed=rows_processed)
+            except (JobCancelled, JobInterrupted):
+                raise
+            except Exception as e:
+                raise ValueError(f"Error parsing CSV: {str(e)}")
+
+            self._checkpoint(job_id)
+            db.update_upload_job(job_id, phase='validating')
+            df = pd.concat(chunks, ignore_index=True)
+            df, has_category_column = prepare_transactions(df, profile)
+            if detected:
+                # Only now is it known that the profile parses the whole file
+                signature, header = detected
+                db.save_ingest_profile(signature, header, profile._asdict())
+
+            self._checkpoint(job_id)
+            result = store_upload(
+                df, has_category_column, job['filename'], **options, upload_job_id=job_id,
+                on_phase=lambda phase: db.update_upload_job(job_id, phase=phase)
+            )
+            result["ingest_profile"] = profile._asdict()
+            db.update_upload_job(
+                job_id, status='completed', phase='completed',
+                result=json.dumps(result), finished_at=time.time()
+            )
+        except JobInterrupted:
+            keep_spool = True
+            db.update_upload_job(job_id, status='queued', phase='interrupted')
+        except JobCancelled:
+            db.update_upload_job(job_id, status='cancelled', phase='cancelled', finished_at=time.time())
+        except Exception as e:
+            db.update_upload_job(
+                job_id, status='failed', phase='failed', error=str(e), finished_at=time.time()
+            )
+        finally:
+            self._active.discard(job_id)
+            if not keep_spool and os.path.exists(job['spool_path']):
+                os.remove(job['spool_path'])
+
+
+def _process_alive(pid: int) -> bool:
+    """Whether a process with this pid is running."""
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows; assume it died
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def describe_job(job: Dict) -> Dict:
+    """Turn an upload_jobs row into the API representation with throughput."""
+    started_at = job.get('started_at')
+    elapsed = None
+    throughput = None
+    if started_at:
+        elapsed = (job.get('finished_at') or time.time()) - started_at
+        if elapsed > 0:
+            throughput = round(job['rows_processed'] / elapsed, 1)
+
+    return {
+        "id": job['id'],
+        "filename": job['filename'],
+        "status": job['status'],
+        "phase": job['phase'],
+        "rows_processed": job['rows_processed'],
+        "bytes_total": job['bytes_total'],
+        "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+        "rows_per_second": throughput,
+        "error": job['error'],
+        "result": json.loads(job['result']) if job['result'] else None,
+        "cancel_requested": bool(job['cancel_requested']),
+        "created_at": job['created_at']
+    }
+
+
+# Global instance
+upload_jobs = UploadJobManager()
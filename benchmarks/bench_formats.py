@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark CSV vs Parquet vs Arrow for transaction import and export.
+
+Import measures parse + the shared validation (prepare_transactions), export
+measures serialization of the transactions frame. No database involved.
+csv-de is a German bank export (`;`, `1.234,56`, `31.12.2024`) read with the
+`de` ingest profile.
+
+Usage: python benchmarks/bench_formats.py [rows]
+"""
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from tools.ingest import INGEST_PROFILES, prepare_transactions, read_columnar, read_csv, write_columnar
+
+
+def generate_transactions(rows: int) -> pd.DataFrame:
+    """Synthetic transactions with realistic cardinalities"""
+    rng = np.random.default_rng(42)
+    payees = np.array([f"Merchant {i}" for i in range(2000)])
+    accounts = np.array([f"Account {i}" for i in range(5)])
+    return pd.DataFrame({
+        'date': pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, rows), unit='D'),
+        'amount': np.round(rng.normal(-40, 120, rows), 2),
+        'description': np.char.add('Card payment ', rng.integers(0, 100000, rows).astype(str)),
+        'account': accounts[rng.integers(0, len(accounts), rows)],
+        'payee': payees[rng.integers(0, len(payees), rows)],
+    })
+
+
+def to_german_csv(df: pd.DataFrame) -> bytes:
+    """Format like a German bank export"""
+    amounts = df['amount'].map(lambda value: f"{value:,.2f}").str.translate(str.maketrans(",.", ".,"))
+    german = df.assign(date=df['date'].dt.strftime('%d.%m.%Y'), amount=amounts)
+    return german.to_csv(index=False, sep=';').encode('utf-8')
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = generate_transactions(rows)
+    df_csv = df.assign(date=df['date'].dt.strftime('%Y-%m-%d'))
+
+    print(f"{'format':<8} {'size MB':>9} {'export s':>9} {'import s':>9} {'import rows/s':>14}")
+    for fmt in ('csv', 'csv-de', 'parquet', 'arrow'):
+        profile = INGEST_PROFILES['default']
+        if fmt == 'csv':
+            payload, export_seconds = timed(lambda: df_csv.to_csv(index=False).encode('utf-8'))
+            read = lambda: pd.read_csv(io.StringIO(payload.decode('utf-8')))
+        elif fmt == 'csv-de':
+            payload, export_seconds = timed(lambda: to_german_csv(df))
+            profile = INGEST_PROFILES['de']
+            read = lambda: read_csv(io.BytesIO(payload), profile)
+        else:
+            payload, export_seconds = timed(lambda: write_columnar(df, fmt))
+            read = lambda: read_columnar(payload, fmt)
+
+        _, import_seconds = timed(lambda: prepare_transactions(read(), profile))
+        print(f"{fmt:<8} {len(payload) / 1e6:>9.1f} {export_seconds:>9.2f} "
+              f"{import_seconds:>9.2f} {rows / import_seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark full-text search against a LIKE scan, plus the cost of keeping the
+index in sync on import.
+
+Usage: python benchmarks/bench_search.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.db_manager import LocalDatabaseManager
+
+QUERIES = ["coffee", "Merchant 1234", "amazon prime", "rent"]
+
+
+def generate_transactions(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    words = np.array(["coffee", "grocery", "amazon", "prime", "fuel", "rent", "gym", "pharmacy", "books"])
+    payees = np.array([f"Merchant {i}" for i in range(20000)])
+    return pd.DataFrame({
+        'date': pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, rows), unit='D'),
+        'amount': np.round(rng.normal(-40, 120, rows), 2),
+        'description': np.char.add(
+            np.char.add(words[rng.integers(0, len(words), rows)], " "),
+            words[rng.integers(0, len(words), rows)]
+        ),
+        'account': 'Checking',
+        'payee': payees[rng.integers(0, len(payees), rows)],
+        'category': 'Other',
+    })
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = generate_transactions(rows)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["PFIN_SNAPSHOT"] = "0"
+        manager = LocalDatabaseManager(os.path.join(workdir, "bench.db"))
+        start = time.perf_counter()
+        manager.insert_transactions(df, filename="bench.csv")
+        print(f"Import {rows:,} rows incl. index: {time.perf_counter() - start:.2f}s (fts={manager.fts_enabled})")
+
+        print(f"{'query':<16} {'matches':>9} {'newest':>10} {'relevance':>10} {'LIKE scan':>10}")
+        for query in QUERIES:
+            found = manager.search_transactions(query, limit=50)
+            newest = best_of(lambda: manager.search_transactions(query, limit=50))
+            relevance = best_of(lambda: manager.search_transactions(query, sort="relevance", limit=50))
+            manager.fts_enabled = False
+            like = best_of(lambda: manager.search_transactions(query, limit=50), repeat=2)
+            manager.fts_enabled = True
+            print(f"{query:<16} {found['total']:>9,} {newest * 1000:>8.1f}ms "
+                  f"{relevance * 1000:>8.1f}ms {like * 1000:>8.1f}ms")
+
+        start = time.perf_counter()
+        manager.clear_all_transactions()
+        print(f"Delete all incl. index: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
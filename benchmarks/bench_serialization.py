@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /api/transactions/ serialization: JSON built by SQLite and
+joined in chunks against the previous path, a dict per row from iterrows()
+that FastAPI validates against TransactionResponse and serializes again.
+
+Usage: python benchmarks/bench_serialization.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from api.models import TransactionResponse
+from api.routers.transactions import _transaction_dict
+from database.db_manager import LocalDatabaseManager
+
+
+def generate_transactions(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    payees = np.array([f"Merchant {i}" for i in range(5000)])
+    return pd.DataFrame({
+        'date': pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, rows), unit='D'),
+        'amount': np.round(rng.normal(-40, 120, rows), 2),
+        'description': np.char.add("CARD PAYMENT ", rng.integers(0, 10**6, rows).astype(str)),
+        'account': rng.choice(["Checking", "Visa"], rows),
+        'payee': payees[rng.integers(0, len(payees), rows)],
+        'category': 'Other',
+    })
+
+
+def per_row_models(manager: LocalDatabaseManager) -> bytes:
+    """What the endpoint did before: dicts, validation, then JSON encoding."""
+    df = manager.get_transactions()
+    rows = [_transaction_dict(row) for _, row in df.iterrows()]
+    validated = TypeAdapter(List[TransactionResponse]).validate_python(rows)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def sqlite_json(manager: LocalDatabaseManager) -> bytes:
+    return "".join(manager.iter_transactions_json()).encode()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["PFIN_SNAPSHOT"] = "0"
+        manager = LocalDatabaseManager(os.path.join(workdir, "bench.db"))
+        manager.insert_transactions(generate_transactions(rows), filename="bench.csv")
+
+        results = {}
+        for name, serialize in (("Per-row pydantic", per_row_models), ("SQLite JSON", sqlite_json)):
+            start = time.perf_counter()
+            body = serialize(manager)
+            elapsed = time.perf_counter() - start
+            results[name] = elapsed
+            print(f"{name:>17}: {rows:,} rows in {elapsed:.2f}s "
+                  f"({rows / elapsed:,.0f} rows/s, {len(body) / 1e6:.1f} MB)")
+        print(f"Speedup: {results['Per-row pydantic'] / results['SQLite JSON']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
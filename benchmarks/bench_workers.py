@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Load test read throughput against 1..N uvicorn worker processes.
+
+Builds a throwaway database, starts `start_api.py --production --workers N`
+for each worker count, hammers a read endpoint from several client processes
+and reports requests per second. Reads scale with workers until the machine
+runs out of cores; the client processes compete for the same cores.
+
+Usage: python benchmarks/bench_workers.py [rows] [max_workers] [seconds]
+"""
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.db_manager import LocalDatabaseManager
+
+
+ENDPOINT = "/api/analytics/overview"
+PORT = 8765
+
+
+def seed_database(db_path: str, rows: int):
+    """Fill a fresh database with synthetic transactions"""
+    rng = np.random.default_rng(42)
+    payees = np.array([f"Merchant {i}" for i in range(2000)])
+    df = pd.DataFrame({
+        'date': pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, rows), unit='D'),
+        'amount': np.round(rng.normal(-40, 120, rows), 2),
+        'description': 'Card payment',
+        'account': 'Checking',
+        'payee': payees[rng.integers(0, len(payees), rows)],
+        'category': 'Other',
+    })
+    manager = LocalDatabaseManager(db_path)
+    manager.insert_transactions(df, filename="bench.csv")
+    manager.snapshot.rebuild()
+
+
+def wait_until_up(timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def client(seconds: float) -> int:
+    """Issue requests over one keep-alive connection until time runs out"""
+    conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+    done = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        conn.request("GET", ENDPOINT)
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"{ENDPOINT} returned {response.status}")
+        done += 1
+    return done
+
+
+def run(workers: int, db_path: str, seconds: float) -> float:
+    env = dict(os.environ, PFIN_DB_PATH=db_path)
+    server = subprocess.Popen(
+        [sys.executable, "start_api.py", "--production", "--workers", str(workers), "--port", str(PORT)],
+        cwd=project_root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_up()
+        # Warm every worker (snapshot mapping, lazy imports) before measuring
+        client(2.0)
+        clients = max(2, workers * 2)
+        with multiprocessing.Pool(clients) as pool:
+            counts = pool.map(client, [seconds] * clients)
+        return sum(counts) / seconds
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "bench.db")
+        seed_database(db_path, rows)
+        print(f"{rows:,} transactions, GET {ENDPOINT}, {os.cpu_count()} CPUs")
+
+        baseline = None
+        workers = 1
+        while workers <= max_workers:
+            throughput = run(workers, db_path, seconds)
+            baseline = baseline or throughput
+            print(f"{workers:>3} workers: {throughput:8.1f} req/s  ({throughput / baseline:.2f}x)")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
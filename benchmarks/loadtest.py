@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Load test the API with a dashboard traffic mix and report latency percentiles.
+
+Builds a throwaway database of synthetic transactions, starts
+`start_api.py --production` against it with Server-Timing enabled, and runs
+concurrent asyncio clients, each one keep-alive connection issuing requests
+from TRAFFIC_MIX back to back. The JSON report has throughput and
+p50/p95/p99 latency per endpoint, the mean server-side breakdown from the
+Server-Timing header (db, endpoint, serialize, cpu, app), and the CPU seconds
+the server processes used during the measurement.
+
+Usage: python benchmarks/loadtest.py [--rows N] [--seconds S] [--clients C]
+                                     [--workers W] [--output report.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Add the project root to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.db_manager import LocalDatabaseManager
+
+
+PORT = 8766
+
+# (path, weight) of what the dashboard requests: the sidebar stats after every
+# page, the analytics page's charts, table and forecast, search, and transaction
+# syncs. {seq} is the database's current change sequence (an empty delta).
+TRAFFIC_MIX = [
+    ("/api/transactions/stats/database", 15),
+    ("/api/analytics/has-data", 4),
+    ("/api/categories/available", 4),
+    ("/api/analytics/overview", 8),
+    ("/api/analytics/income-expense-plot?months_back=12", 10),
+    ("/api/analytics/cumulative-expenses-plot?months_back=12", 10),
+    ("/api/analytics/expense-groups-plot?months_back=1", 10),
+    ("/api/analytics/expense-groups-deepdive?months_back=12", 5),
+    ("/api/analytics/bank-transactions-table?months_back=3", 6),
+    ("/api/analytics/forecast", 5),
+    ("/api/analytics/recurring", 3),
+    ("/api/transactions/search?q=coffee", 6),
+    ("/api/transactions/?months_back=1", 4),
+    ("/api/transactions/changes?since={seq}", 10),
+]
+
+CATEGORIES = ["Living", "Groceries", "Transport", "Shopping", "Subscriptions",
+              "Eating out, Bars, Social", "Sports, Wellness, Health", "Other"]
+
+
+def seed_database(db_path: str, rows: int) -> int:
+    """Fill a fresh database with a few years of transactions; returns the change sequence."""
+    rng = np.random.default_rng(42)
+    payees = np.array([f"Merchant {i}" for i in range(2000)])
+    words = np.array(["coffee", "grocery", "fuel", "pharmacy", "books", "online order", "card payment"])
+    end = pd.Timestamp.today().normalize()
+    df = pd.DataFrame({
+        'date': end - pd.to_timedelta(rng.integers(0, 3 * 365, rows), unit='D'),
+        'amount': np.round(-np.abs(rng.lognormal(3, 1.1, rows)), 2),
+        'description': words[rng.integers(0, len(words), rows)],
+        'account': rng.choice(["Checking", "Visa", "Savings"], rows, p=[0.6, 0.35, 0.05]),
+        'payee': payees[rng.integers(0, len(payees), rows)],
+        'category': rng.choice(CATEGORIES, rows),
+    })
+    salaries = pd.DataFrame({
+        'date': pd.date_range(end=end, periods=36, freq='MS'),
+        'amount': 4200.0,
+        'description': 'Salary',
+        'account': 'Checking',
+        'payee': 'Employer',
+        'category': 'Income',
+    })
+    manager = LocalDatabaseManager(db_path)
+    manager.insert_transactions(pd.concat([df, salaries], ignore_index=True), filename="loadtest.csv")
+    if manager.snapshot is not None:
+        manager.snapshot.rebuild()
+    with manager.connect() as conn:
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'change_seq'").fetchone()[0])
+
+
+def process_tree_cpu(pid: int) -> Optional[float]:
+    """User + system CPU seconds of a process and its descendants (Linux /proc only)."""
+    if not os.path.isdir("/proc"):
+        return None
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                data = f.read()
+        except OSError:
+            continue
+        # Fields after the command name: state, ppid, ..., utime (12th), stime (13th)
+        fields = data[data.rindex(")") + 2:].split()
+        stats[int(entry)] = (int(fields[1]), int(fields[11]) + int(fields[12]))
+    tree = {pid}
+    while True:
+        children = {child for child, (parent, _) in stats.items() if parent in tree} - tree
+        if not children:
+            break
+        tree |= children
+    return sum(stats[p][1] for p in tree if p in stats) / os.sysconf("SC_CLK_TCK")
+
+
+async def fetch(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, path: str):
+    """One GET over a keep-alive HTTP/1.1 connection; returns (status, headers, body size)."""
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{PORT}\r\nAccept-Encoding: gzip\r\n\r\n".encode()
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    size = 0
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            chunk = int((await reader.readline()).split(b";")[0], 16)
+            if chunk == 0:
+                # Trailers, if any, end with an empty line
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                break
+            size += len(await reader.readexactly(chunk + 2)) - 2
+    else:
+        size = len(await reader.readexactly(int(headers.get("content-length", 0))))
+    return status, headers, size
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    timings = {}
+    for metric in filter(None, (part.strip() for part in header.split(","))):
+        name, _, params = metric.partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                timings[name.strip()] = float(value)
+    return timings
+
+
+async def client(paths: List[str], weights: List[int], deadline: float, seed: int, results: Dict):
+    """Issue requests from the mix until the deadline; records (latency, status, timing) per path."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    try:
+        while time.perf_counter() < deadline:
+            path = rng.choices(paths, weights)[0]
+            started = time.perf_counter()
+            status, headers, size = await fetch(reader, writer, path)
+            latency = time.perf_counter() - started
+            results[path].append((latency, status, size, parse_server_timing(headers.get("server-timing", ""))))
+            if headers.get("connection", "").lower() == "close":
+                writer.close()
+                reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    finally:
+        writer.close()
+
+
+async def drive(paths: List[str], weights: List[int], clients: int, seconds: float) -> Dict:
+    results = defaultdict(list)
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(client(paths, weights, deadline, seed, results) for seed in range(clients)))
+    return results
+
+
+def summarize(results: Dict, seconds: float) -> Dict:
+    endpoints = {}
+    for path, samples in sorted(results.items()):
+        latencies = np.array([sample[0] for sample in samples]) * 1000
+        phases = defaultdict(list)
+        for sample in samples:
+            for name, duration in sample[3].items():
+                phases[name].append(duration)
+        endpoints[path] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / seconds, 1),
+            "errors": sum(1 for sample in samples if sample[1] >= 400),
+            "mean_bytes": int(np.mean([sample[2] for sample in samples])),
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies, 50)), 2),
+                "p95": round(float(np.percentile(latencies, 95)), 2),
+                "p99": round(float(np.percentile(latencies, 99)), 2),
+                "max": round(float(latencies.max()), 2),
+            },
+            # Averaged over the requests that reported the phase
+            "server_timing_ms": {name: round(float(np.mean(values)), 2) for name, values in phases.items()},
+        }
+    return endpoints
+
+
+def wait_until_up(timeout: float = 30.0):
+    async def probe():
+        reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+        try:
+            return (await fetch(reader, writer, "/health"))[0]
+        finally:
+            writer.close()
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if asyncio.run(probe()) == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API with a dashboard traffic mix")
+    parser.add_argument("--rows", type=int, default=100_000, help="Synthetic transactions (default: 100000)")
+    parser.add_argument("--seconds", type=float, default=20.0, help="Measured duration (default: 20)")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent connections (default: 16)")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes (default: 1)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds first (default: 3)")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "loadtest.db")
+        seq = seed_database(db_path, args.rows)
+        paths = [path.format(seq=seq) for path, _ in TRAFFIC_MIX]
+        weights = [weight for _, weight in TRAFFIC_MIX]
+
+        env = dict(os.environ, PFIN_DB_PATH=db_path, PFIN_SERVER_TIMING="1",
+                   PFIN_LEDGERS_DIR=os.path.join(workdir, "ledgers"))
+        server = subprocess.Popen(
+            [sys.executable, "start_api.py", "--production", "--workers", str(args.workers), "--port", str(PORT)],
+            cwd=project_root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_up()
+            # Lazy imports, snapshot mapping and derived-data caches in every worker
+            asyncio.run(drive(paths, weights, args.clients, args.warmup))
+            cpu_before = process_tree_cpu(server.pid)
+            started = time.perf_counter()
+            results = asyncio.run(drive(paths, weights, args.clients, args.seconds))
+            elapsed = time.perf_counter() - started
+            cpu_after = process_tree_cpu(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+
+    total = sum(len(samples) for samples in results.values())
+    server_cpu = round(cpu_after - cpu_before, 2) if cpu_before is not None else None
+    report = {
+        "config": {
+            "rows": args.rows, "seconds": args.seconds, "clients": args.clients,
+            "workers": args.workers, "cpus": os.cpu_count(),
+        },
+        "requests": total,
+        "errors": sum(endpoint_errors for endpoint_errors in (
+            sum(1 for sample in samples if sample[1] >= 400) for samples in results.values()
+        )),
+        "throughput_rps": round(total / elapsed, 1),
+        "server_cpu_seconds": server_cpu,
+        # Cores kept busy on average; compare with workers and cpus
+        "server_cpu_utilization": round(server_cpu / elapsed, 2) if server_cpu is not None else None,
+        "endpoints": summarize(results, elapsed),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,216 @@
 Database manager for local SQLite data storage.
 Privacy-first approach - all data stays on user's device.
 """
+from __future__ import annotations
+
+import json
 import sqlite3
-import pandas as pd
 import os
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+import uuid
+from datetime import date, datetime
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
+
+from database.ledgers import DEFAULT_LEDGER, LedgerRegistry
+from database.snapshot import ColumnarSnapshot
+from tools.lazy import lazy_import
+from tools.request_timing import current_timings
+from tools.rule_engine import RuleMatcher, validate_rule
+
+pd = lazy_import("pandas")
+
+
+# Upsert that keeps created_at of an existing account+payee mapping
+UPSERT_MAPPING_SQL = """
+    INSERT INTO category_mappings (account, payee, category, updated_at)
+    SELECT account, payee, category, CURRENT_TIMESTAMP FROM incoming_mappings WHERE true
+    ON CONFLICT(account, payee) DO UPDATE SET
+        category = excluded.category,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Retroactively apply incoming mappings to matching, not manually categorized rows.
+# CROSS JOIN pins the small staging table as the outer loop so every mapping
+# is an index lookup on lower(account), lower(payee) rather than a table scan.
+APPLY_MAPPINGS_SQL = """
+    UPDATE transactions
+    SET category = (
+            SELECT m.category FROM incoming_mappings AS m
+            WHERE m.account = lower(transactions.account) AND m.payee = lower(transactions.payee)
+        ),
+        updated_at = CURRENT_TIMESTAMP,
+        change_seq = ?
+    WHERE id IN (
+        SELECT t.id
+        FROM incoming_mappings AS m
+        CROSS JOIN transactions AS t
+            ON lower(t.account) = m.account AND lower(t.payee) = m.payee
+        WHERE t.is_manually_categorized = FALSE AND t.category != m.category
+    )
+    RETURNING id, substr(date, 1, 7)
+"""
+
+# Columns a bulk recategorization filter may constrain
+TRANSACTION_FILTER_FIELDS = (
+    'account', 'payee', 'category', 'description_contains',
+    'start_date', 'end_date', 'uncategorized_only'
+)
+
+DEFAULT_DB_PATH = "data/personal_finance.db"
+
+# How insert_transactions treats existing rows
+IMPORT_MODES = ('replace_all', 'append', 'replace_account', 'replace_import')
+
+# Columns returned by get_transactions, newest first
+TRANSACTIONS_QUERY = """
+    SELECT id, date, amount, description, account, payee, category, 
+           is_manually_categorized, created_at, updated_at
+    FROM transactions {where}
+    ORDER BY date DESC
+"""
+
+# One row of TRANSACTIONS_QUERY as a TransactionResponse JSON object, built by
+# SQLite. Timestamps get the ISO form pydantic gives datetimes.
+TRANSACTION_JSON = """json_object(
+    'id', id,
+    'date', CASE WHEN length(date) = 10 THEN date || 'T00:00:00' ELSE replace(date, ' ', 'T') END,
+    'amount', amount,
+    'description', ifnull(description, ''),
+    'account', ifnull(account, ''),
+    'payee', ifnull(payee, ''),
+    'category', ifnull(category, 'Other'),
+    'is_manually_categorized', json(CASE WHEN is_manually_categorized THEN 'true' ELSE 'false' END),
+    'created_at', replace(created_at, ' ', 'T'),
+    'updated_at', replace(updated_at, ' ', 'T')
+)"""
+
+# Full-text index over payee and description. The trigram tokenizer matches
+# any substring of 3+ characters, case-insensitively, straight from the index.
+# Triggers keep it in sync row by row; bulk imports and deletes set the
+# fts_deferred meta flag inside their transaction and maintain the index with
+# set-based statements instead, which is an order of magnitude faster.
+FTS_SCHEMA = (
+    """CREATE VIRTUAL TABLE transactions_fts USING fts5(
+           description, payee,
+           content='transactions', content_rowid='id', tokenize='trigram'
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions
+       WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'fts_deferred') BEGIN
+           INSERT INTO transactions_fts (rowid, description, payee)
+           VALUES (new.id, new.description, new.payee);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions
+       WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'fts_deferred') BEGIN
+           INSERT INTO transactions_fts (transactions_fts, rowid, description, payee)
+           VALUES ('delete', old.id, old.description, old.payee);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_fts_update
+       AFTER UPDATE OF description, payee ON transactions
+       WHEN NOT EXISTS (SELECT 1 FROM meta WHERE key = 'fts_deferred') BEGIN
+           INSERT INTO transactions_fts (transactions_fts, rowid, description, payee)
+           VALUES ('delete', old.id, old.description, old.payee);
+           INSERT INTO transactions_fts (rowid, description, payee)
+           VALUES (new.id, new.description, new.payee);
+       END""",
+)
+
+# Result orders of search_transactions
+SEARCH_SORTS = ('date', 'relevance')
+
+# Shortest search term the trigram index can answer; shorter ones use LIKE
+_MIN_FTS_TERM_LENGTH = 3
+
+# How long a connection waits for another process's write lock before failing
+BUSY_TIMEOUT_SECONDS = 30
+
+# SQLite's default limit on host parameters is 999 on older builds
+_MAX_SQL_VARIABLES = 900
+
+# Change events kept for clients catching up, see get_change_events
+CHANGE_EVENTS_KEPT = 1000
+
+# Changes touching more rows list only their count, not their ids
+MAX_EVENT_IDS = 1000
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose `with conn:` blocks count as database time of the current request.
+    
+    See tools.request_timing; outside a timed request nothing is recorded.
+    """
+    
+    def __enter__(self):
+        timings = current_timings.get()
+        self._timing = (timings, timings.start("db")) if timings is not None else None
+        return super().__enter__()
+    
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            if self._timing is not None:
+                timings, started = self._timing
+                timings.stop("db", started)
 
 
 class LocalDatabaseManager:
     """Manages local SQLite database for transactions and category mappings."""
     
-    def __init__(self, db_path: str = "data/personal_finance.db"):
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
         """Initialize database manager with local SQLite database."""
         self.db_path = db_path
+        self._rule_matcher: Optional[RuleMatcher] = None
+        self._rule_matcher_version: Optional[int] = None
+        # Results derived from all transactions, by key, with the data version they were computed at
+        self._derived: Dict[str, Tuple[Tuple[str, int], Any]] = {}
+        # Called after each committed transactions write, see add_change_listener
+        self._change_listeners: List[Callable[[], None]] = []
         # Ensure directory exists
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self._init_database()
+        
+        # Memory-mapped copy of the transactions table for analytics reads
+        self.snapshot: Optional[ColumnarSnapshot] = None
+        if os.environ.get("PFIN_SNAPSHOT", "1") != "0":
+            self.snapshot = ColumnarSnapshot(
+                os.path.splitext(db_path)[0] + ".snapshot",
+                self.get_data_version,
+                self._read_versioned_transactions,
+                sort_column='date'
+            )
+    
+    def connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        """Open a connection that waits for locks held by other workers instead of failing.
+        
+        check_same_thread=False allows a connection to move between threads
+        (used by one at a time), as a streamed response's reads do.
+        """
+        conn = sqlite3.connect(
+            self.db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=check_same_thread,
+            factory=TimedConnection
+        )
+        # Safe with WAL: a crash can lose the last commits but never corrupts the file
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+    
+    def close(self):
+        """Release the snapshot mapping and in-memory caches, e.g. when the ledger is evicted.
+        
+        Connections are opened per call, so none stay open. The manager stays
+        usable and rebuilds whatever it needs on next use.
+        """
+        if self.snapshot is not None:
+            self.snapshot.close()
+        self._derived.clear()
+        self._rule_matcher = None
+        self._rule_matcher_version = None
     
     def _init_database(self):
         """Initialize database tables if they don't exist."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
+            # WAL lets readers in every worker process run while one process
+            # writes; the setting is stored in the database file
+            conn.execute("PRAGMA journal_mode = WAL")
+            
             # Transactions table
             conn.execute('''
                 CREATE TABLE IF NOT EXISTS transactions (
@@ -51,75 +241,970 @@ class LocalDatabaseManager:
                 )
             ''')
             
+            # Source files, one row per upload, so a single import can be rolled back or replaced
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS imports (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    filename TEXT NOT NULL,
+                    account TEXT,
+                    mode TEXT NOT NULL DEFAULT 'replace_all',
+                    row_count INTEGER NOT NULL DEFAULT 0,
+                    first_transaction_id INTEGER,
+                    last_transaction_id INTEGER,
+                    min_date TEXT,
+                    max_date TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            self._ensure_column(conn, 'transactions', 'import_id', 'INTEGER REFERENCES imports(id)')
+            # Background upload job that stored the import, so a rerun of the job replaces it
+            self._ensure_column(conn, 'imports', 'upload_job_id', 'TEXT')
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transactions_import_id ON transactions(import_id)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions(account)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date)"
+            )
+            
+            # Delta sync: change_seq is the sequence number (meta change_seq) of
+            # the write that last inserted or updated a row, and deleted ids are
+            # kept as tombstones with the sequence number of their delete.
+            # Rows from before the column existed have 0 and only go out in
+            # full syncs, which they were already part of.
+            self._ensure_column(conn, 'transactions', 'change_seq', 'INTEGER NOT NULL DEFAULT 0')
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transactions_change_seq ON transactions(change_seq)"
+            )
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS transaction_tombstones (
+                    id INTEGER PRIMARY KEY,
+                    change_seq INTEGER NOT NULL
+                )
+            ''')
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transaction_tombstones_change_seq "
+                "ON transaction_tombstones(change_seq)"
+            )
+            
+            # Lets mapping writes find their account+payee rows without a table scan
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_transactions_account_payee
+                ON transactions(lower(account), lower(payee))
+            ''')
+            
+            # Background upload jobs, persisted so they survive restarts
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS upload_jobs (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    spool_path TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    phase TEXT NOT NULL DEFAULT 'queued',
+                    rows_processed INTEGER NOT NULL DEFAULT 0,
+                    bytes_total INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    result TEXT,
+                    cancel_requested BOOLEAN DEFAULT FALSE,
+                    options TEXT,
+                    started_at REAL,
+                    finished_at REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            self._ensure_column(conn, 'upload_jobs', 'options', 'TEXT')
+            # Process running the job, so a restarting worker only requeues jobs of dead processes
+            self._ensure_column(conn, 'upload_jobs', 'owner_pid', 'INTEGER')
+            
+            # Pattern rules for payee/description variants that exact mappings miss
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS category_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    field TEXT NOT NULL DEFAULT 'payee',
+                    match_type TEXT NOT NULL DEFAULT 'substring',
+                    pattern TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Recurring costs (rent, subscriptions, annual fees) that analytics
+            # can spread over the months they pay for
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS amortization_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    account TEXT NOT NULL,
+                    payee TEXT NOT NULL,
+                    months INTEGER NOT NULL DEFAULT 1,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(account, payee)
+                )
+            ''')
+            
+            # Monthly spending limits per category
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS budgets (
+                    category TEXT PRIMARY KEY,
+                    amount REAL NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Precomputed day-of-month spending profiles for forecasts, see
+            # tools.forecast; the profiles_version meta entry says what they cover
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS spending_profiles (
+                    category TEXT PRIMARY KEY,
+                    typical_monthly REAL NOT NULL,
+                    months INTEGER NOT NULL,
+                    shares TEXT NOT NULL
+                )
+            ''')
+            
+            # Detected CSV formats by header signature, so repeat uploads skip detection
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ingest_profiles (
+                    signature TEXT PRIMARY KEY,
+                    header TEXT NOT NULL,
+                    profile TEXT NOT NULL,
+                    uses INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Near-duplicate pairs the user confirmed are distinct transactions
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS duplicate_dismissals (
+                    first_id INTEGER NOT NULL,
+                    second_id INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (first_id, second_id)
+                )
+            ''')
+            
+            # Anomaly scores of expenses (only those worth showing) and the
+            # baselines new expenses are scored against, see tools.anomalies
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS anomaly_scores (
+                    transaction_id INTEGER PRIMARY KEY,
+                    score REAL NOT NULL,
+                    baseline TEXT NOT NULL,
+                    expected REAL
+                )
+            ''')
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_anomaly_scores_score ON anomaly_scores(score)"
+            )
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS anomaly_baselines (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    median REAL NOT NULL,
+                    spread REAL NOT NULL,
+                    samples INTEGER NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+            ''')
+            
+            # Summary of every write to transactions (what changed, which months),
+            # read by the events stream; only the last CHANGE_EVENTS_KEPT are kept
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS change_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data_version INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Database identity and counters bumped by every write to transactions
+            # and rules, so derived data (the columnar snapshot, the compiled rule
+            # matcher) can tell when it's stale, also in other worker processes
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value
+                )
+            ''')
+            conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('instance_id', ?)", (uuid.uuid4().hex,)
+            )
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('rules_version', 0)")
+            # Bumped only by writes that delete rows, so state derived from
+            # appends alone (anomaly baselines) can tell it may be extended
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('rewrite_version', 0)")
+            # Sequence of the last write, and of the last write that deleted
+            # everything (clients synced before it start over)
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('change_seq', 0)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('changes_reset_seq', 0)")
+            # A crash can't leave the flag behind (it never outlives a transaction),
+            # but clear it anyway so sync triggers can't stay disabled
+            conn.execute("DELETE FROM meta WHERE key = 'fts_deferred'")
+            
+            self.fts_enabled = self._ensure_fts(conn)
+            
             conn.commit()
     
+    @staticmethod
+    def _ensure_fts(conn: sqlite3.Connection) -> bool:
+        """Create the full-text index and its sync triggers, backfilling existing rows.
+        
+        Returns False if this SQLite build lacks FTS5 or the trigram tokenizer;
+        search then falls back to LIKE scans.
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+        ).fetchone()
+        try:
+            if not exists:
+                conn.execute(FTS_SCHEMA[0])
+            for statement in FTS_SCHEMA[1:]:
+                conn.execute(statement)
+        except sqlite3.OperationalError:
+            return False
+        if not exists:
+            # Index rows written before the index existed
+            conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+        return True
+    
+    def _defer_fts(self, conn: sqlite3.Connection, deferred: bool):
+        """Switch the row-by-row index triggers off or back on within the current transaction."""
+        if not self.fts_enabled:
+            return
+        if deferred:
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('fts_deferred', 1)")
+        else:
+            conn.execute("DELETE FROM meta WHERE key = 'fts_deferred'")
+    
+    def _fts_unindex(self, conn: sqlite3.Connection, where: Optional[str] = None, params: Tuple = ()):
+        """Remove rows matching where (all rows if None) from the index before deleting them."""
+        if not self.fts_enabled:
+            return
+        if where is None:
+            conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('delete-all')")
+        else:
+            conn.execute(
+                f"""INSERT INTO transactions_fts (transactions_fts, rowid, description, payee)
+                    SELECT 'delete', id, description, payee FROM transactions WHERE {where}""",
+                params
+            )
+    
+    def _fts_index(self, conn: sqlite3.Connection, where: str, params: Tuple = ()):
+        """Add rows matching where to the index."""
+        if not self.fts_enabled:
+            return
+        conn.execute(
+            f"""INSERT INTO transactions_fts (rowid, description, payee)
+                SELECT id, description, payee FROM transactions WHERE {where}""",
+            params
+        )
+    
+    @staticmethod
+    def _ensure_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+        """Add a column to an existing table if an older database lacks it."""
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    
+    @staticmethod
+    def _bump_data_version(conn: sqlite3.Connection, rewrite: bool = False):
+        """Mark transactions as changed; call inside the writing transaction.
+        
+        rewrite marks writes that delete rows rather than only adding or
+        recategorizing them.
+        """
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+        if rewrite:
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'rewrite_version'")
+    
+    @staticmethod
+    def _next_change_seq(conn: sqlite3.Connection) -> int:
+        """Allocate the sequence number of a write; call inside the writing transaction."""
+        return conn.execute(
+            "UPDATE meta SET value = value + 1 WHERE key = 'change_seq' RETURNING value"
+        ).fetchone()[0]
+    
+    @staticmethod
+    def _tombstone(conn: sqlite3.Connection, seq: int, where: Optional[str] = None, params=()):
+        """Record rows matching where as deleted at seq, before deleting them.
+        
+        Deleting all rows (where None) instead makes every client synced
+        before seq start over, so it needs no tombstone per row.
+        """
+        if where is None:
+            conn.execute("DELETE FROM transaction_tombstones")
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'changes_reset_seq'", (seq,))
+        else:
+            conn.execute(
+                f"""INSERT OR REPLACE INTO transaction_tombstones (id, change_seq)
+                    SELECT id, ? FROM transactions WHERE {where}""",
+                (seq, *params)
+            )
+    
+    @staticmethod
+    def _record_change(conn: sqlite3.Connection, kind: str, ids: Optional[List[int]] = None,
+                       months=None, **details):
+        """Log what a write changed for the events stream; call inside the writing
+        transaction, after _bump_data_version.
+        
+        months are the YYYY-MM months of the changed rows; None means any month
+        may have changed. ids are left out (only their count is kept) past
+        MAX_EVENT_IDS.
+        """
+        summary = dict(details)
+        if ids is not None:
+            summary['count'] = len(ids)
+            summary['ids'] = ids if len(ids) <= MAX_EVENT_IDS else None
+        summary['months'] = sorted(set(months)) if months is not None else None
+        cursor = conn.execute(
+            """INSERT INTO change_events (data_version, kind, summary)
+               SELECT value, ?, ? FROM meta WHERE key = 'data_version'""",
+            (kind, json.dumps(summary))
+        )
+        conn.execute(
+            "DELETE FROM change_events WHERE id <= ?", (cursor.lastrowid - CHANGE_EVENTS_KEPT,)
+        )
+    
+    def _transactions_changed(self):
+        """Refresh derived data and wake change listeners after a committed transactions write."""
+        if self.snapshot is not None:
+            self.snapshot.schedule_rebuild()
+        for listener in list(self._change_listeners):
+            listener()
+    
+    def add_change_listener(self, listener: Callable[[], None]):
+        """Call listener() after every transactions write committed by this process.
+        
+        Listeners run on the writing thread and must not block. Writes by
+        other processes only show up in get_change_events.
+        """
+        self._change_listeners.append(listener)
+    
+    def remove_change_listener(self, listener: Callable[[], None]):
+        if listener in self._change_listeners:
+            self._change_listeners.remove(listener)
+    
+    def get_change_events(self, after_id: int = 0, limit: int = 100) -> List[Dict]:
+        """Change events with an id above after_id, oldest first."""
+        with self.connect() as conn:
+            cursor = conn.execute(
+                """SELECT id, data_version, kind, summary, created_at FROM change_events
+                   WHERE id > ? ORDER BY id LIMIT ?""",
+                (after_id, limit)
+            )
+            return [
+                {"id": event_id, "data_version": version, "kind": kind,
+                 "created_at": created_at, **json.loads(summary)}
+                for event_id, version, kind, summary, created_at in cursor.fetchall()
+            ]
+    
+    def get_change_event_range(self) -> Tuple[Optional[int], Optional[int]]:
+        """(oldest, newest) kept change event id, (None, None) before the first write."""
+        with self.connect() as conn:
+            return conn.execute("SELECT MIN(id), MAX(id) FROM change_events").fetchone()
+    
+    def get_data_version(self) -> Tuple[str, int]:
+        """Get (instance_id, data_version) identifying the current transactions data."""
+        with self.connect() as conn:
+            return self._read_data_version(conn)
+    
+    def _get_rules_version(self) -> int:
+        with self.connect() as conn:
+            return int(conn.execute("SELECT value FROM meta WHERE key = 'rules_version'").fetchone()[0])
+    
+    @staticmethod
+    def _read_data_version(conn: sqlite3.Connection) -> Tuple[str, int]:
+        rows = dict(conn.execute(
+            "SELECT key, value FROM meta WHERE key IN ('instance_id', 'data_version')"
+        ).fetchall())
+        return rows['instance_id'], int(rows['data_version'])
+    
     def clear_all_transactions(self):
-        """Clear all existing transactions (single file approach)."""
-        with sqlite3.connect(self.db_path) as conn:
+        """Clear all existing transactions and their import history."""
+        with self.connect() as conn:
+            self._defer_fts(conn, True)
+            self._fts_unindex(conn)
+            self._tombstone(conn, self._next_change_seq(conn))
             conn.execute("DELETE FROM transactions")
+            conn.execute("DELETE FROM imports")
+            self._defer_fts(conn, False)
+            self._bump_data_version(conn, rewrite=True)
+            self._record_change(conn, "cleared")
             conn.commit()
+        self._transactions_changed()
     
-    def insert_transactions(self, df: pd.DataFrame) -> int:
-        """Replace all transactions with new data (single file approach)."""
-        with sqlite3.connect(self.db_path) as conn:
-            # Clear existing transactions
-            conn.execute("DELETE FROM transactions")
-            
-            # Convert DataFrame to records and ensure proper data types
-            df_clean = df.copy()
-            
-            # Convert date to string format for SQLite
-            df_clean['date'] = pd.to_datetime(df_clean['date']).dt.strftime('%Y-%m-%d')
-            
-            # Ensure amount is float
-            df_clean['amount'] = pd.to_numeric(df_clean['amount'], errors='coerce')
+    @staticmethod
+    def _refresh_import_counts(conn: sqlite3.Connection, import_ids: List[int]):
+        """Recount rows of the given imports and drop imports that have none left."""
+        for import_id in import_ids:
+            count = conn.execute(
+                "SELECT COUNT(*) FROM transactions WHERE import_id = ?", (import_id,)
+            ).fetchone()[0]
+            if count:
+                conn.execute("UPDATE imports SET row_count = ? WHERE id = ?", (count, import_id))
+            else:
+                conn.execute("DELETE FROM imports WHERE id = ?", (import_id,))
+    
+    def insert_transactions(self, df: pd.DataFrame, filename: str = "",
+                            mode: str = "replace_all",
+                            replace_import_id: Optional[int] = None,
+                            upload_job_id: Optional[str] = None) -> int:
+        """Insert transactions as a new import.
+        
+        Modes:
+            replace_all: wipe all transactions first (the original single file approach)
+            append: keep existing transactions
+            replace_account: delete existing transactions of the accounts in df first
+            replace_import: delete the rows of replace_import_id first (re-import a statement)
+        
+        Deletes are scoped by the account or import_id indexes, so replacing one
+        statement doesn't touch the rest of the history. Everything runs in one
+        transaction.
+        
+        upload_job_id tags the import with the background job storing it. If
+        that job already stored an import before it was interrupted, the rerun
+        replaces that import instead of adding its rows a second time.
+        """
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Invalid import mode '{mode}', expected one of: {', '.join(IMPORT_MODES)}")
+        if mode == "replace_import" and replace_import_id is None:
+            raise ValueError("replace_import mode requires an import id")
+        
+        # Convert DataFrame to column arrays with proper data types
+        dates = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        amounts = pd.to_numeric(df['amount'], errors='coerce').astype(float)
+        descriptions = df['description'].fillna('').astype(str)
+        accounts = df['account'].fillna('').astype(str) if 'account' in df.columns else pd.Series('', index=df.index)
+        payees = df['payee'].fillna('').astype(str) if 'payee' in df.columns else pd.Series('', index=df.index)
+        if 'category' in df.columns:
+            categories = df['category'].fillna('Other').astype(str).replace('', 'Other')
+        else:
+            categories = pd.Series('Other', index=df.index)
+        
+        file_accounts = accounts.unique().tolist()
+        
+        with self.connect() as conn:
+            self._defer_fts(conn, True)
+            seq = self._next_change_seq(conn)
+            previous_import = None
+            if upload_job_id is not None:
+                row = conn.execute(
+                    "SELECT id FROM imports WHERE upload_job_id = ?", (upload_job_id,)
+                ).fetchone()
+                previous_import = row[0] if row else None
+            # Rows of another import are deleted, so append only stays append for a first run
+            rewrite = mode != "append" or previous_import is not None
             
-            # Ensure text fields are strings
-            df_clean['description'] = df_clean['description'].astype(str).fillna('')
-            df_clean['account'] = df_clean['account'].astype(str).fillna('')
-            df_clean['payee'] = df_clean['payee'].astype(str).fillna('')
+            if previous_import is not None and mode in ("append", "replace_import"):
+                # The first run already replaced its target; replace that run's rows instead
+                self._fts_unindex(conn, "import_id = ?", (previous_import,))
+                self._tombstone(conn, seq, "import_id = ?", (previous_import,))
+                conn.execute("DELETE FROM transactions WHERE import_id = ?", (previous_import,))
+                conn.execute("DELETE FROM imports WHERE id = ?", (previous_import,))
+            elif mode == "replace_all":
+                self._fts_unindex(conn)
+                self._tombstone(conn, seq)
+                conn.execute("DELETE FROM transactions")
+                conn.execute("DELETE FROM imports")
+            elif mode == "replace_account" and file_accounts:
+                placeholders = ','.join('?' * len(file_accounts))
+                affected = [row[0] for row in conn.execute(
+                    f"""SELECT DISTINCT import_id FROM transactions
+                        WHERE account IN ({placeholders}) AND import_id IS NOT NULL""",
+                    file_accounts
+                )]
+                self._fts_unindex(conn, f"account IN ({placeholders})", file_accounts)
+                self._tombstone(conn, seq, f"account IN ({placeholders})", file_accounts)
+                conn.execute(f"DELETE FROM transactions WHERE account IN ({placeholders})", file_accounts)
+                self._refresh_import_counts(conn, affected)
+            elif mode == "replace_import":
+                if conn.execute("SELECT 1 FROM imports WHERE id = ?", (replace_import_id,)).fetchone() is None:
+                    raise KeyError(f"Import {replace_import_id} not found")
+                self._fts_unindex(conn, "import_id = ?", (replace_import_id,))
+                self._tombstone(conn, seq, "import_id = ?", (replace_import_id,))
+                conn.execute("DELETE FROM transactions WHERE import_id = ?", (replace_import_id,))
+                conn.execute("DELETE FROM imports WHERE id = ?", (replace_import_id,))
             
-            records = df_clean.to_dict('records')
-            inserted_count = 0
+            cursor = conn.execute(
+                """INSERT INTO imports 
+                   (filename, account, mode, row_count, min_date, max_date, upload_job_id)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    filename,
+                    file_accounts[0] if len(file_accounts) == 1 else None,
+                    mode,
+                    len(df),
+                    dates.min() if len(df) else None,
+                    dates.max() if len(df) else None,
+                    upload_job_id
+                )
+            )
+            import_id = cursor.lastrowid
             
-            for record in records:
-                # Insert new transaction
-                conn.execute(
-                    """INSERT INTO transactions 
-                       (date, amount, description, account, payee, category) 
-                       VALUES (?, ?, ?, ?, ?, ?)""",
-                    (
-                        str(record['date']),
-                        float(record['amount']),
-                        str(record.get('description', '')),
-                        str(record.get('account', '')),
-                        str(record.get('payee', '')),
-                        'Other'  # Default category
-                    )
+            conn.executemany(
+                """INSERT INTO transactions 
+                   (date, amount, description, account, payee, category, import_id, change_seq) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                zip(
+                    dates.tolist(), amounts.tolist(), descriptions.tolist(),
+                    accounts.tolist(), payees.tolist(), categories.tolist(),
+                    [import_id] * len(df), [seq] * len(df)
                 )
-                inserted_count += 1
+            )
+            
+            # A single writer inserts a contiguous id range
+            first_id, last_id = conn.execute(
+                "SELECT MIN(id), MAX(id) FROM transactions WHERE import_id = ?", (import_id,)
+            ).fetchone()
+            conn.execute(
+                "UPDATE imports SET first_transaction_id = ?, last_transaction_id = ? WHERE id = ?",
+                (first_id, last_id, import_id)
+            )
+            self._fts_index(conn, "import_id = ?", (import_id,))
+            self._defer_fts(conn, False)
             
+            self._bump_data_version(conn, rewrite=rewrite)
+            # Rows replaced by other modes may be in any month
+            self._record_change(
+                conn, "uploaded", months=None if rewrite else dates.str[:7].unique().tolist(),
+                count=len(df), import_id=import_id, mode=mode, first_id=first_id, last_id=last_id
+            )
             conn.commit()
-            return inserted_count
+        self._transactions_changed()
+        return len(df)
     
-    def get_transactions(self, limit: Optional[int] = None) -> pd.DataFrame:
-        """Get all transactions from database."""
-        query = """
-            SELECT id, date, amount, description, account, payee, category, 
-                   is_manually_categorized, created_at, updated_at
-            FROM transactions 
-            ORDER BY date DESC
+    def get_last_import_filename(self) -> Optional[str]:
+        """Get the filename of the most recent import."""
+        with self.connect() as conn:
+            row = conn.execute("SELECT filename FROM imports ORDER BY id DESC LIMIT 1").fetchone()
+            return row[0] if row else None
+    
+    def get_imports(self) -> List[Dict]:
+        """Get import history, newest first."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(
+                """SELECT id, filename, account, mode, row_count, first_transaction_id,
+                          last_transaction_id, min_date, max_date, created_at
+                   FROM imports ORDER BY id DESC"""
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def delete_import(self, import_id: int) -> Optional[int]:
+        """Roll back an import. Returns the number of deleted rows, or None if it doesn't exist."""
+        with self.connect() as conn:
+            if conn.execute("SELECT 1 FROM imports WHERE id = ?", (import_id,)).fetchone() is None:
+                return None
+            self._defer_fts(conn, True)
+            self._fts_unindex(conn, "import_id = ?", (import_id,))
+            self._tombstone(conn, self._next_change_seq(conn), "import_id = ?", (import_id,))
+            deleted = conn.execute(
+                "DELETE FROM transactions WHERE import_id = ? RETURNING id, substr(date, 1, 7)", (import_id,)
+            ).fetchall()
+            conn.execute("DELETE FROM imports WHERE id = ?", (import_id,))
+            self._defer_fts(conn, False)
+            self._bump_data_version(conn, rewrite=True)
+            self._record_change(
+                conn, "deleted", [row[0] for row in deleted], [row[1] for row in deleted], import_id=import_id
+            )
+            conn.commit()
+        self._transactions_changed()
+        return len(deleted)
+    
+    def delete_transactions(self, transaction_ids: List[int]) -> List[int]:
+        """Delete transactions by id in one transaction. Returns the ids that existed."""
+        ids = list(dict.fromkeys(transaction_ids))
+        deleted = []
+        months = set()
+        with self.connect() as conn:
+            self._defer_fts(conn, True)
+            seq = self._next_change_seq(conn)
+            affected = set()
+            for start in range(0, len(ids), _MAX_SQL_VARIABLES):
+                chunk = ids[start:start + _MAX_SQL_VARIABLES]
+                where = f"id IN ({','.join('?' * len(chunk))})"
+                self._fts_unindex(conn, where, chunk)
+                self._tombstone(conn, seq, where, chunk)
+                for transaction_id, import_id, month in conn.execute(
+                    f"DELETE FROM transactions WHERE {where} RETURNING id, import_id, substr(date, 1, 7)",
+                    chunk
+                ).fetchall():
+                    deleted.append(transaction_id)
+                    months.add(month)
+                    if import_id is not None:
+                        affected.add(import_id)
+            self._refresh_import_counts(conn, sorted(affected))
+            self._defer_fts(conn, False)
+            if deleted:
+                self._bump_data_version(conn, rewrite=True)
+                self._record_change(conn, "deleted", deleted, months)
+            conn.commit()
+        if deleted:
+            self._transactions_changed()
+        return deleted
+    
+    def existing_transaction_ids(self, transaction_ids: List[int]) -> List[int]:
+        """The ids among transaction_ids that belong to a transaction."""
+        ids = list(dict.fromkeys(transaction_ids))
+        found = []
+        with self.connect() as conn:
+            for start in range(0, len(ids), _MAX_SQL_VARIABLES):
+                chunk = ids[start:start + _MAX_SQL_VARIABLES]
+                found.extend(row[0] for row in conn.execute(
+                    f"SELECT id FROM transactions WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+        return found
+    
+    def get_transactions_after(self, transaction_id: int) -> pd.DataFrame:
+        """Transactions with a higher id, i.e. inserted after transaction_id, by id."""
+        with self.connect() as conn:
+            df = pd.read_sql_query(
+                TRANSACTIONS_QUERY.format(where="WHERE id > ?").replace("ORDER BY date DESC", "ORDER BY id"),
+                conn, params=(transaction_id,)
+            )
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+        return df
+    
+    def get_anomaly_state(self) -> Dict:
+        """Highest transaction id and rewrite version the stored anomaly scores cover, and the current ones."""
+        with self.connect() as conn:
+            meta = dict(conn.execute(
+                """SELECT key, value FROM meta
+                   WHERE key IN ('rewrite_version', 'anomalies_rewrite_version', 'anomalies_through_id')"""
+            ).fetchall())
+            max_id = conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0]
+        return {
+            "rewrite_version": int(meta['rewrite_version']),
+            "scored_rewrite_version": meta.get('anomalies_rewrite_version'),
+            "scored_through_id": meta.get('anomalies_through_id'),
+            "max_id": max_id or 0,
+        }
+    
+    def get_anomaly_baselines(self, kind: str, keys: List[str]) -> pd.DataFrame:
+        """Stored baselines of one kind for the given keys."""
+        frames = []
+        with self.connect() as conn:
+            for start in range(0, len(keys), _MAX_SQL_VARIABLES):
+                chunk = keys[start:start + _MAX_SQL_VARIABLES]
+                frames.append(pd.read_sql_query(
+                    f"""SELECT kind, key, median, spread, samples FROM anomaly_baselines
+                        WHERE kind = ? AND key IN ({','.join('?' * len(chunk))})""",
+                    conn, params=[kind] + chunk
+                ))
+        if not frames:
+            return pd.DataFrame(columns=['kind', 'key', 'median', 'spread', 'samples'])
+        return pd.concat(frames, ignore_index=True)
+    
+    def save_anomaly_scores(self, scores: pd.DataFrame, baselines: pd.DataFrame,
+                            through_id: int, rewrite_version: int, replace: bool = False):
+        """Store scores (id, score, baseline, expected) and baselines (kind, key, median, spread, samples).
+        
+        replace drops everything stored before, for a full rescoring; otherwise
+        rows and baselines are added or overwritten.
+        """
+        with self.connect() as conn:
+            if replace:
+                conn.execute("DELETE FROM anomaly_scores")
+                conn.execute("DELETE FROM anomaly_baselines")
+            conn.executemany(
+                """INSERT OR REPLACE INTO anomaly_scores (transaction_id, score, baseline, expected)
+                   VALUES (?, ?, ?, ?)""",
+                zip(scores['id'].tolist(), scores['score'].tolist(),
+                    scores['baseline'].tolist(), scores['expected'].tolist())
+            )
+            conn.executemany(
+                """INSERT OR REPLACE INTO anomaly_baselines (kind, key, median, spread, samples)
+                   VALUES (?, ?, ?, ?, ?)""",
+                zip(baselines['kind'].tolist(), baselines['key'].tolist(), baselines['median'].tolist(),
+                    baselines['spread'].tolist(), baselines['samples'].tolist())
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [('anomalies_through_id', through_id), ('anomalies_rewrite_version', rewrite_version)]
+            )
+            conn.commit()
+    
+    def get_anomalies(self, min_score: float, start_date: Optional[date] = None,
+                      end_date: Optional[date] = None, category: Optional[str] = None,
+                      limit: int = 100) -> Dict:
+        """Scored expenses at or above min_score, highest score first, with the total count."""
+        clauses = ["a.score >= ?"]
+        params: List = [min_score]
+        if start_date is not None:
+            clauses.append("t.date >= ?")
+            params.append(start_date.isoformat())
+        if end_date is not None:
+            clauses.append("t.date <= ?")
+            params.append(end_date.isoformat())
+        if category:
+            clauses.append("t.category = ?")
+            params.append(category)
+        where = " AND ".join(clauses)
+        
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            total = conn.execute(
+                f"""SELECT COUNT(*) FROM anomaly_scores AS a
+                    JOIN transactions AS t ON t.id = a.transaction_id WHERE {where}""",
+                params
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"""SELECT t.id, t.date, t.amount, t.description, t.account, t.payee, t.category,
+                           a.score, a.baseline, a.expected
+                    FROM anomaly_scores AS a JOIN transactions AS t ON t.id = a.transaction_id
+                    WHERE {where}
+                    ORDER BY a.score DESC, t.date DESC
+                    LIMIT ?""",
+                params + [limit]
+            ).fetchall()
+        return {"total": total, "anomalies": [dict(row) for row in rows]}
+    
+    def get_duplicate_dismissals(self) -> List[Tuple[int, int]]:
+        """(first_id, second_id) pairs marked as not duplicates."""
+        with self.connect() as conn:
+            return conn.execute("SELECT first_id, second_id FROM duplicate_dismissals").fetchall()
+    
+    def dismiss_duplicates(self, pairs: List[Tuple[int, int]]) -> int:
+        """Remember pairs of transactions as distinct, so duplicate detection skips them."""
+        with self.connect() as conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO duplicate_dismissals (first_id, second_id) VALUES (?, ?)",
+                [(min(a, b), max(a, b)) for a, b in pairs]
+            )
+            conn.commit()
+            return cursor.rowcount
+    
+    def get_transactions(self, limit: Optional[int] = None, start_date: Optional[date] = None,
+                         end_date: Optional[date] = None) -> pd.DataFrame:
+        """Get transactions from database, newest first, optionally between two dates (inclusive).
+        
+        Full and date-bounded reads come from the memory-mapped snapshot when it
+        is current, which slices the date range by binary search; otherwise
+        SQLite answers them with a range scan on the date index.
         """
+        if not limit and self.snapshot is not None:
+            df = self.snapshot.load(low=start_date, high=end_date)
+            if df is not None:
+                return df
+        
+        with self.connect() as conn:
+            return self._read_transactions(conn, limit, start_date, end_date)
+    
+    @staticmethod
+    def _date_filter(start_date: Optional[date], end_date: Optional[date]) -> Tuple[List[str], List]:
+        clauses = []
+        params = []
+        if start_date is not None:
+            clauses.append("date >= ?")
+            params.append(start_date.isoformat())
+        if end_date is not None:
+            clauses.append("date <= ?")
+            params.append(end_date.isoformat())
+        return clauses, params
+    
+    @staticmethod
+    def _read_transactions(conn: sqlite3.Connection, limit: Optional[int] = None,
+                           start_date: Optional[date] = None, end_date: Optional[date] = None) -> pd.DataFrame:
+        clauses, params = LocalDatabaseManager._date_filter(start_date, end_date)
+        query = TRANSACTIONS_QUERY.format(where=f"WHERE {' AND '.join(clauses)}" if clauses else "")
         if limit:
             query += f" LIMIT {limit}"
-            
-        with sqlite3.connect(self.db_path) as conn:
-            df = pd.read_sql_query(query, conn)
-            if not df.empty:
-                # Convert date column to datetime
-                df['date'] = pd.to_datetime(df['date'], errors='coerce')
-                df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-            return df
+        
+        df = pd.read_sql_query(query, conn, params=params)
+        # Converted even when empty, so an empty date range still has datetime columns
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+        return df
+    
+    def iter_transactions_json(self, limit: Optional[int] = None, start_date: Optional[date] = None,
+                               end_date: Optional[date] = None, uncategorized_only: bool = False,
+                               chunk_rows: int = 5000) -> Iterator[str]:
+        """Transactions as one JSON array of TransactionResponse objects, newest first, in chunks.
+        
+        SQLite builds each row's JSON, so no Python objects are made per row
+        and nothing is validated again; rows are fetched chunk_rows at a time.
+        Filters as in get_transactions; uncategorized_only keeps rows that
+        weren't manually categorized.
+        """
+        clauses, params = self._date_filter(start_date, end_date)
+        if uncategorized_only:
+            clauses.append("is_manually_categorized = FALSE")
+        query = f"""SELECT {TRANSACTION_JSON} FROM transactions
+                    {f"WHERE {' AND '.join(clauses)}" if clauses else ""}
+                    ORDER BY date DESC"""
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        
+        # Executed here rather than on first iteration, so errors surface
+        # before a response has started; the chunks are read from worker threads
+        conn = self.connect(check_same_thread=False)
+        try:
+            cursor = conn.execute(query, params)
+        except Exception:
+            conn.close()
+            raise
+        
+        def chunks():
+            try:
+                separator = "["
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    yield separator + ",".join(row[0] for row in rows)
+                    separator = ","
+                yield "[]" if separator == "[" else "]"
+            finally:
+                conn.close()
+        
+        return chunks()
+    
+    def _read_versioned_transactions(self) -> Tuple[Tuple[str, int], pd.DataFrame]:
+        """Read all transactions and the data version they belong to in one read transaction."""
+        with self.connect() as conn:
+            conn.execute("BEGIN")
+            version = self._read_data_version(conn)
+            df = self._read_transactions(conn)
+            conn.rollback()
+        return version, df
+    
+    def get_transaction_changes(self, since: int = 0) -> Dict:
+        """Transactions inserted or updated and ids deleted after change sequence since.
+        
+        since=0, a since from before the last full wipe, or one ahead of this
+        database (a restored file) return every row with reset=True, and the
+        client replaces its copy. Pass the returned seq as since next time; a
+        different instance_id also means the client has to start over.
+        
+        The rows come as transactions_json, a JSON array of TransactionResponse
+        objects built by SQLite as in iter_transactions_json, since a reset
+        sends the whole history.
+        """
+        with self.connect() as conn:
+            # One read transaction, so rows, tombstones and seq agree
+            conn.execute("BEGIN")
+            meta = dict(conn.execute(
+                """SELECT key, value FROM meta
+                   WHERE key IN ('instance_id', 'change_seq', 'changes_reset_seq')"""
+            ).fetchall())
+            seq = int(meta['change_seq'])
+            reset = since <= 0 or since < int(meta['changes_reset_seq']) or since > seq
+            if reset:
+                cursor = conn.execute(f"SELECT {TRANSACTION_JSON} FROM transactions ORDER BY date DESC")
+                deleted = []
+            else:
+                cursor = conn.execute(
+                    f"""SELECT {TRANSACTION_JSON} FROM transactions
+                        WHERE change_seq > ? ORDER BY date DESC""",
+                    (since,)
+                )
+                deleted = [row[0] for row in conn.execute(
+                    "SELECT id FROM transaction_tombstones WHERE change_seq > ? ORDER BY id", (since,)
+                )]
+            transactions_json = "[" + ",".join(row[0] for row in cursor) + "]"
+            conn.rollback()
+        return {
+            "instance_id": meta['instance_id'],
+            "seq": seq,
+            "reset": reset,
+            "transactions_json": transactions_json,
+            "deleted": deleted
+        }
+    
+    def search_transactions(self, query: str, start_date: Optional[str] = None,
+                            end_date: Optional[str] = None, category: Optional[str] = None,
+                            sort: str = "date", limit: int = 50, offset: int = 0) -> Dict:
+        """Find transactions whose payee or description contains every term of query.
+        
+        Terms of 3+ characters are answered by the trigram index, shorter ones
+        are checked with LIKE. Results come newest first (sort="date") or best
+        match first by bm25 with payee hits weighted double (sort="relevance").
+        Returns the total match count and one page of results.
+        """
+        if sort not in SEARCH_SORTS:
+            raise ValueError(f"Invalid sort '{sort}', expected one of: {', '.join(SEARCH_SORTS)}")
+        terms = query.split()
+        if not terms:
+            raise ValueError("Search query must not be empty")
+        
+        long_terms = [term for term in terms if len(term) >= _MIN_FTS_TERM_LENGTH]
+        use_fts = self.fts_enabled and bool(long_terms)
+        
+        clauses = []
+        params = []
+        for term in terms:
+            if use_fts and len(term) >= _MIN_FTS_TERM_LENGTH:
+                continue
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            clauses.append("(t.description LIKE ? ESCAPE '\\' OR t.payee LIKE ? ESCAPE '\\')")
+            params.extend([f"%{escaped}%", f"%{escaped}%"])
+        if start_date:
+            clauses.append("t.date >= ?")
+            params.append(str(start_date))
+        if end_date:
+            clauses.append("t.date <= ?")
+            params.append(str(end_date))
+        if category:
+            clauses.append("t.category = ?")
+            params.append(category)
+        
+        rank = "0.0"
+        order = "t.date DESC, t.id DESC"
+        if use_fts:
+            # Each term is a quoted phrase, so FTS5 syntax in user input is matched literally
+            match = " AND ".join('"' + term.replace('"', '""') + '"' for term in long_terms)
+            if sort == "relevance":
+                source = "transactions_fts AS f JOIN transactions AS t ON t.id = f.rowid"
+                clauses.insert(0, "transactions_fts MATCH ?")
+                rank = "bm25(transactions_fts, 1.0, 2.0)"
+                order = "rank, " + order
+            else:
+                # Lets SQLite walk the date index newest first and stop after one page
+                source = "transactions AS t"
+                clauses.insert(0, "t.id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)")
+            params.insert(0, match)
+        else:
+            source = "transactions AS t"
+        where = " AND ".join(clauses) or "1"
+        
+        with self.connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM {source} WHERE {where}", params).fetchone()[0]
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(
+                f"""SELECT t.id, t.date, t.amount, t.description, t.account, t.payee, t.category,
+                           t.is_manually_categorized, t.created_at, t.updated_at, {rank} AS rank
+                    FROM {source}
+                    WHERE {where}
+                    ORDER BY {order}
+                    LIMIT ? OFFSET ?""",
+                params + [limit, offset]
+            )
+            results = [dict(row) for row in cursor.fetchall()]
+        
+        return {"total": total, "results": results}
+    
+    def get_transaction(self, transaction_id: int) -> Optional[Dict]:
+        """Get a single transaction by id without loading the whole table."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                """SELECT id, date, amount, description, account, payee, category,
+                          is_manually_categorized, created_at, updated_at
+                   FROM transactions WHERE id = ?""",
+                (transaction_id,)
+            ).fetchone()
+            return dict(row) if row else None
     
     def get_uncategorized_transactions(self) -> pd.DataFrame:
         """Get transactions that haven't been manually categorized."""
@@ -129,7 +1214,7 @@ class LocalDatabaseManager:
             WHERE is_manually_categorized = FALSE
             ORDER BY date DESC
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             df = pd.read_sql_query(query, conn)
             if not df.empty:
                 # Convert date column to datetime
@@ -137,31 +1222,237 @@ class LocalDatabaseManager:
                 df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
             return df
     
-    def update_transaction_category(self, transaction_id: int, category: str):
-        """Update category for a specific transaction and mark as manually categorized."""
-        with sqlite3.connect(self.db_path) as conn:
+    def update_transaction_category(self, transaction_id: int, category: str) -> bool:
+        """Update category for a specific transaction and mark as manually categorized.
+        
+        Returns False, without touching versions or change sequence, if the
+        transaction doesn't exist.
+        """
+        with self.connect() as conn:
+            found = conn.execute(
+                "SELECT substr(date, 1, 7) FROM transactions WHERE id = ?", (transaction_id,)
+            ).fetchone()
+            if found is None:
+                return False
             conn.execute(
                 """UPDATE transactions 
-                   SET category = ?, is_manually_categorized = TRUE, updated_at = CURRENT_TIMESTAMP
+                   SET category = ?, is_manually_categorized = TRUE, updated_at = CURRENT_TIMESTAMP,
+                       change_seq = ?
                    WHERE id = ?""",
-                (category, transaction_id)
+                (category, self._next_change_seq(conn), transaction_id)
             )
+            self._bump_data_version(conn)
+            self._record_change(conn, "recategorized", [transaction_id], [found[0]], category=category)
             conn.commit()
+        self._transactions_changed()
+        return True
     
-    def save_category_mapping(self, account: str, payee: str, category: str):
-        """Save a category mapping for account+payee combination."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """INSERT OR REPLACE INTO category_mappings 
-                   (account, payee, category, updated_at) 
-                   VALUES (?, ?, ?, CURRENT_TIMESTAMP)""",
-                (account.lower(), payee.lower(), category)
+    @staticmethod
+    def _upsert_and_apply_mappings(conn: sqlite3.Connection,
+                                   mappings: List[Tuple[str, str, str]]) -> Tuple[int, int]:
+        """Upsert (account, payee, category) mappings and apply them to existing rows.
+        
+        Mappings are staged in a temp table so both the upsert and the
+        retroactive update are single set-based statements; the update uses the
+        lower(account), lower(payee) index. Does not commit. Returns the number
+        of mappings saved and transactions recategorized.
+        """
+        if not mappings:
+            return 0, 0
+        
+        # Columns are untyped on purpose: a TEXT affinity would stop SQLite
+        # from using the expression index when joining against lower(...)
+        conn.execute(
+            """CREATE TEMP TABLE IF NOT EXISTS incoming_mappings (
+                   account NOT NULL,
+                   payee NOT NULL,
+                   category NOT NULL,
+                   PRIMARY KEY (account, payee)
+               )"""
+        )
+        conn.execute("DELETE FROM incoming_mappings")
+        # Later rows for the same account+payee win
+        conn.executemany(
+            "INSERT OR REPLACE INTO incoming_mappings (account, payee, category) VALUES (?, ?, ?)",
+            [(account.lower(), payee.lower(), category) for account, payee, category in mappings]
+        )
+        saved = conn.execute(UPSERT_MAPPING_SQL).rowcount
+        applied = conn.execute(
+            APPLY_MAPPINGS_SQL, (LocalDatabaseManager._next_change_seq(conn),)
+        ).fetchall()
+        conn.execute("DELETE FROM incoming_mappings")
+        if applied:
+            LocalDatabaseManager._bump_data_version(conn)
+            LocalDatabaseManager._record_change(
+                conn, "recategorized", [row[0] for row in applied], [row[1] for row in applied],
+                source="mappings"
             )
+        return saved, len(applied)
+    
+    def save_category_mapping(self, account: str, payee: str, category: str) -> int:
+        """Save a category mapping for account+payee combination.
+        
+        Existing transactions with that account+payee that weren't manually
+        categorized are recategorized right away. Returns how many were updated.
+        """
+        with self.connect() as conn:
+            _, applied = self._upsert_and_apply_mappings(conn, [(account, payee, category)])
             conn.commit()
+        if applied:
+            self._transactions_changed()
+        return applied
+    
+    def import_category_mappings(self, mappings: List[Tuple[str, str, str]]) -> Dict[str, int]:
+        """Save many (account, payee, category) mappings and apply them in one transaction."""
+        with self.connect() as conn:
+            saved, applied = self._upsert_and_apply_mappings(conn, mappings)
+            conn.commit()
+        if applied:
+            self._transactions_changed()
+        return {"mappings_saved": saved, "transactions_updated": applied}
+    
+    def bulk_update_categories(self, updates: List[Tuple[int, str]],
+                               save_mappings: bool = True) -> Dict:
+        """Manually categorize many transactions in a single transaction.
+        
+        Looks up only the affected rows by primary key, then applies every
+        category update and account+payee mapping upsert with executemany.
+        Returns per-item statuses plus update and mapping counts.
+        """
+        ids = list(dict.fromkeys(transaction_id for transaction_id, _ in updates))
+        
+        with self.connect() as conn:
+            found = {}
+            for start in range(0, len(ids), _MAX_SQL_VARIABLES):
+                chunk = ids[start:start + _MAX_SQL_VARIABLES]
+                cursor = conn.execute(
+                    f"SELECT id, account, payee, substr(date, 1, 7) FROM transactions "
+                    f"WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                for transaction_id, account, payee, month in cursor.fetchall():
+                    found[transaction_id] = (account, payee, month)
+            
+            results = []
+            category_rows = []
+            mappings = []
+            for transaction_id, category in updates:
+                if transaction_id not in found:
+                    results.append({"id": transaction_id, "status": "not_found"})
+                    continue
+                
+                category_rows.append((category, transaction_id))
+                results.append({"id": transaction_id, "status": "updated"})
+                
+                account, payee, _ = found[transaction_id]
+                if save_mappings and account and payee:
+                    mappings.append((account, payee, category))
+            
+            mappings_saved, mappings_applied = 0, 0
+            if category_rows:
+                # Only a write that matched rows takes a sequence number and a new version
+                seq = self._next_change_seq(conn)
+                conn.executemany(
+                    """UPDATE transactions 
+                       SET category = ?, is_manually_categorized = TRUE, updated_at = CURRENT_TIMESTAMP,
+                           change_seq = ?
+                       WHERE id = ?""",
+                    [(category, seq, transaction_id) for category, transaction_id in category_rows]
+                )
+                mappings_saved, mappings_applied = self._upsert_and_apply_mappings(conn, mappings)
+                self._bump_data_version(conn)
+                updated_ids = [transaction_id for _, transaction_id in category_rows]
+                self._record_change(conn, "recategorized", updated_ids,
+                                    [found[transaction_id][2] for transaction_id in updated_ids])
+            conn.commit()
+        if category_rows or mappings_applied:
+            self._transactions_changed()
+        
+        return {
+            "updated_count": len(category_rows),
+            "mappings_saved": mappings_saved,
+            "mappings_applied": mappings_applied,
+            "results": results
+        }
+    
+    @staticmethod
+    def _build_transaction_filter(filters: Dict) -> Tuple[str, List]:
+        """Translate a transaction filter into a SQL WHERE clause and parameters."""
+        clauses = []
+        params = []
+        
+        if filters.get('account'):
+            clauses.append("lower(account) = ?")
+            params.append(filters['account'].lower())
+        if filters.get('payee'):
+            clauses.append("lower(payee) = ?")
+            params.append(filters['payee'].lower())
+        if filters.get('category'):
+            clauses.append("category = ?")
+            params.append(filters['category'])
+        if filters.get('description_contains'):
+            clauses.append("description LIKE ?")
+            params.append(f"%{filters['description_contains']}%")
+        if filters.get('start_date'):
+            clauses.append("date >= ?")
+            params.append(str(filters['start_date']))
+        if filters.get('end_date'):
+            clauses.append("date <= ?")
+            params.append(str(filters['end_date']))
+        if filters.get('uncategorized_only'):
+            clauses.append("is_manually_categorized = FALSE")
+        
+        if not clauses:
+            raise ValueError(
+                f"At least one filter is required: {', '.join(TRANSACTION_FILTER_FIELDS)}"
+            )
+        return " AND ".join(clauses), params
+    
+    def bulk_update_category_by_filter(self, filters: Dict, category: str,
+                                       save_mappings: bool = True) -> Dict:
+        """Manually categorize every transaction matching a filter in one transaction."""
+        where, params = self._build_transaction_filter(filters)
+        
+        with self.connect() as conn:
+            mappings = []
+            if save_mappings:
+                # Collect mappings before the update, while the filter still matches
+                cursor = conn.execute(
+                    f"""SELECT DISTINCT lower(account), lower(payee) FROM transactions
+                        WHERE {where} AND account != '' AND payee != ''""",
+                    params
+                )
+                mappings = [(account, payee, category) for account, payee in cursor.fetchall()]
+            
+            cursor = conn.execute(
+                f"""UPDATE transactions 
+                    SET category = ?, is_manually_categorized = TRUE, updated_at = CURRENT_TIMESTAMP,
+                        change_seq = ?
+                    WHERE {where}
+                    RETURNING id, substr(date, 1, 7)""",
+                [category, self._next_change_seq(conn)] + params
+            )
+            updated = cursor.fetchall()
+            updated_ids = [row[0] for row in updated]
+            mappings_saved, mappings_applied = self._upsert_and_apply_mappings(conn, mappings)
+            if updated_ids:
+                self._bump_data_version(conn)
+                self._record_change(conn, "recategorized", updated_ids, [row[1] for row in updated],
+                                    category=category)
+            conn.commit()
+        if updated_ids or mappings_applied:
+            self._transactions_changed()
+        
+        return {
+            "updated_count": len(updated_ids),
+            "mappings_saved": mappings_saved,
+            "mappings_applied": mappings_applied,
+            "results": [{"id": transaction_id, "status": "updated"} for transaction_id in updated_ids]
+        }
     
     def get_category_mappings(self) -> Dict[str, str]:
         """Get all category mappings for auto-categorization."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             cursor = conn.execute(
                 "SELECT account, payee, category FROM category_mappings"
             )
@@ -174,39 +1465,258 @@ class LocalDatabaseManager:
                 
             return mappings
     
-    def auto_categorize_transactions(self) -> int:
-        """Auto-categorize uncategorized transactions based on saved mappings."""
-        mappings = self.get_category_mappings()
-        updated_count = 0
+    def get_category_rules(self) -> List[Dict]:
+        """Get all pattern-based categorization rules, highest priority first."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(
+                """SELECT id, field, match_type, pattern, category, priority, created_at, updated_at
+                   FROM category_rules ORDER BY priority DESC, id"""
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def save_category_rule(self, field: str, match_type: str, pattern: str,
+                           category: str, priority: int = 0) -> int:
+        """Save a categorization rule and return its id."""
+        validate_rule(field, match_type, pattern)
+        with self.connect() as conn:
+            cursor = conn.execute(
+                """INSERT INTO category_rules (field, match_type, pattern, category, priority)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (field, match_type, pattern, category, priority)
+            )
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'rules_version'")
+            conn.commit()
+        return cursor.lastrowid
+    
+    def delete_category_rule(self, rule_id: int) -> bool:
+        """Delete a categorization rule. Returns False if it didn't exist."""
+        with self.connect() as conn:
+            cursor = conn.execute("DELETE FROM category_rules WHERE id = ?", (rule_id,))
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'rules_version'")
+            conn.commit()
+        return cursor.rowcount > 0
+    
+    def get_amortization_rules(self) -> List[Dict]:
+        """Get all recurring cost rules."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(
+                """SELECT id, account, payee, months, created_at, updated_at
+                   FROM amortization_rules ORDER BY account, payee"""
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def save_amortization_rule(self, account: str, payee: str, months: int) -> int:
+        """Mark account+payee as a recurring cost covering months months. Returns the rule id."""
+        if months < 1:
+            raise ValueError("months must be at least 1")
+        with self.connect() as conn:
+            conn.execute(
+                """INSERT INTO amortization_rules (account, payee, months)
+                   VALUES (?, ?, ?)
+                   ON CONFLICT(account, payee) DO UPDATE SET
+                       months = excluded.months,
+                       updated_at = CURRENT_TIMESTAMP""",
+                (account, payee, months)
+            )
+            rule_id = conn.execute(
+                "SELECT id FROM amortization_rules WHERE account = ? AND payee = ?", (account, payee)
+            ).fetchone()[0]
+            conn.commit()
+        return rule_id
+    
+    def delete_amortization_rule(self, rule_id: int) -> bool:
+        """Delete a recurring cost rule. Returns False if it didn't exist."""
+        with self.connect() as conn:
+            cursor = conn.execute("DELETE FROM amortization_rules WHERE id = ?", (rule_id,))
+            conn.commit()
+        return cursor.rowcount > 0
+    
+    def get_budgets(self) -> List[Dict]:
+        """Get monthly budgets by category."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(
+                "SELECT category, amount, created_at, updated_at FROM budgets ORDER BY category"
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def save_budget(self, category: str, amount: float):
+        """Set the monthly budget of a category."""
+        if amount <= 0:
+            raise ValueError("amount must be positive")
+        with self.connect() as conn:
+            conn.execute(
+                """INSERT INTO budgets (category, amount) VALUES (?, ?)
+                   ON CONFLICT(category) DO UPDATE SET
+                       amount = excluded.amount,
+                       updated_at = CURRENT_TIMESTAMP""",
+                (category, amount)
+            )
+            conn.commit()
+    
+    def delete_budget(self, category: str) -> bool:
+        """Delete a category's budget. Returns False if it had none."""
+        with self.connect() as conn:
+            cursor = conn.execute("DELETE FROM budgets WHERE category = ?", (category,))
+            conn.commit()
+        return cursor.rowcount > 0
+    
+    def get_spending_profiles(self) -> Tuple[Optional[str], List[Dict]]:
+        """Get the stored spending profiles and the version they were built for."""
+        with self.connect() as conn:
+            conn.execute("BEGIN")
+            row = conn.execute("SELECT value FROM meta WHERE key = 'profiles_version'").fetchone()
+            rows = conn.execute(
+                "SELECT category, typical_monthly, months, shares FROM spending_profiles"
+            ).fetchall()
+            conn.rollback()
+        profiles = [
+            {"category": category, "typical_monthly": typical, "months": months, "shares": json.loads(shares)}
+            for category, typical, months, shares in rows
+        ]
+        return (row[0] if row else None), profiles
+    
+    def save_spending_profiles(self, version: str, profiles: List[Dict]):
+        """Replace the stored spending profiles."""
+        with self.connect() as conn:
+            conn.execute("DELETE FROM spending_profiles")
+            conn.executemany(
+                """INSERT INTO spending_profiles (category, typical_monthly, months, shares)
+                   VALUES (?, ?, ?, ?)""",
+                [
+                    (profile["category"], profile["typical_monthly"], profile["months"],
+                     json.dumps(profile["shares"]))
+                    for profile in profiles
+                ]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('profiles_version', ?)", (version,)
+            )
+            conn.commit()
+    
+    def get_ingest_profile(self, signature: str) -> Optional[Dict]:
+        """Get the saved CSV profile for a header signature and count the use, or None."""
+        with self.connect() as conn:
+            cursor = conn.execute(
+                """UPDATE ingest_profiles SET uses = uses + 1, last_used_at = CURRENT_TIMESTAMP
+                   WHERE signature = ? RETURNING profile""",
+                (signature,)
+            )
+            row = cursor.fetchone()
+            conn.commit()
+        return json.loads(row[0]) if row else None
+    
+    def save_ingest_profile(self, signature: str, header: str, profile: Dict):
+        """Remember the CSV profile of files with this header signature."""
+        with self.connect() as conn:
+            conn.execute(
+                """INSERT INTO ingest_profiles (signature, header, profile, uses) VALUES (?, ?, ?, 1)
+                   ON CONFLICT(signature) DO UPDATE SET
+                       header = excluded.header,
+                       profile = excluded.profile,
+                       last_used_at = CURRENT_TIMESTAMP""",
+                (signature, header, json.dumps(profile))
+            )
+            conn.commit()
+    
+    def get_ingest_profiles(self) -> List[Dict]:
+        """Get all saved CSV profiles, most recently used first."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(
+                """SELECT signature, header, profile, uses, created_at, last_used_at
+                   FROM ingest_profiles ORDER BY last_used_at DESC"""
+            )
+            return [{**dict(row), "profile": json.loads(row["profile"])} for row in cursor.fetchall()]
+    
+    def delete_ingest_profile(self, signature: str) -> bool:
+        """Forget a saved CSV profile, so the next upload detects it again."""
+        with self.connect() as conn:
+            cursor = conn.execute("DELETE FROM ingest_profiles WHERE signature = ?", (signature,))
+            conn.commit()
+        return cursor.rowcount > 0
+    
+    def get_derived(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Result of compute(), cached under key until transactions change.
+        
+        Like the rule matcher, the cache is checked against the data version in
+        the database, so writes by other worker processes invalidate it too.
+        The version is read before computing, so a write racing with compute()
+        leaves an older version behind and the next call recomputes.
+        """
+        version = self.get_data_version()
+        cached = self._derived.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = compute()
+        self._derived[key] = (version, value)
+        return value
+    
+    def get_rule_matcher(self) -> RuleMatcher:
+        """Get the compiled rule matcher, compiling it on first use after a change.
         
-        with sqlite3.connect(self.db_path) as conn:
+        The rules version lives in the database, so a rule saved by another
+        worker process invalidates this process's matcher too.
+        """
+        version = self._get_rules_version()
+        if self._rule_matcher is None or self._rule_matcher_version != version:
+            self._rule_matcher = RuleMatcher(self.get_category_rules())
+            self._rule_matcher_version = version
+        return self._rule_matcher
+    
+    def categorize_frame(self, df: pd.DataFrame) -> pd.Series:
+        """Resolve categories for a frame with account, payee and description columns.
+        
+        Exact account+payee mappings win over pattern rules. Returns None for
+        rows that nothing matched.
+        """
+        account = df['account'].fillna('').astype(str).str.lower()
+        payee = df['payee'].fillna('').astype(str).str.lower()
+        
+        mapped = (account + '|' + payee).map(self.get_category_mappings())
+        mapped = mapped.where((account != '') & (payee != ''))
+        
+        unmatched = mapped.isna()
+        if unmatched.any():
+            matcher = self.get_rule_matcher()
+            if len(matcher):
+                mapped = mapped.astype(object)
+                mapped[unmatched] = matcher.match(df[unmatched])
+        
+        return mapped.astype(object).where(mapped.notna(), None)
+    
+    def auto_categorize_transactions(self) -> int:
+        """Auto-categorize uncategorized transactions based on saved mappings and rules."""
+        with self.connect() as conn:
             # Get uncategorized transactions
-            cursor = conn.execute(
-                """SELECT id, account, payee FROM transactions 
-                   WHERE is_manually_categorized = FALSE AND category = 'Other'"""
+            df = pd.read_sql_query(
+                """SELECT id, account, payee, description, substr(date, 1, 7) AS month FROM transactions 
+                   WHERE is_manually_categorized = FALSE AND category = 'Other'""",
+                conn
             )
+            if df.empty:
+                return 0
             
-            for transaction_id, account, payee in cursor.fetchall():
-                new_category = None
-                
-                # Create composite key from account and payee
-                if account and payee:
-                    composite_key = f"{account.lower()}|{payee.lower()}"
-                    if composite_key in mappings:
-                        new_category = mappings[composite_key]
-                
-                # Update if we found a mapping
-                if new_category and new_category != 'Other':
-                    conn.execute(
-                        """UPDATE transactions 
-                           SET category = ?, updated_at = CURRENT_TIMESTAMP
-                           WHERE id = ?""",
-                        (new_category, transaction_id)
-                    )
-                    updated_count += 1
+            categories = self.categorize_frame(df)
+            found = categories.notna() & (categories != 'Other')
             
+            seq = self._next_change_seq(conn)
+            conn.executemany(
+                """UPDATE transactions 
+                   SET category = ?, updated_at = CURRENT_TIMESTAMP, change_seq = ?
+                   WHERE id = ?""",
+                zip(categories[found].tolist(), [seq] * int(found.sum()), df.loc[found, 'id'].tolist())
+            )
+            if found.any():
+                self._bump_data_version(conn)
+                self._record_change(conn, "recategorized", df.loc[found, 'id'].tolist(),
+                                    df.loc[found, 'month'].tolist(), source="auto")
             conn.commit()
-            return updated_count
+        if found.any():
+            self._transactions_changed()
+        return int(found.sum())
     
     def get_category_stats(self) -> pd.DataFrame:
         """Get statistics about categories."""
@@ -220,73 +1730,210 @@ class LocalDatabaseManager:
             GROUP BY category
             ORDER BY transaction_count DESC
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             return pd.read_sql_query(query, conn)
     
     def get_database_stats(self) -> Dict[str, int]:
-        """Get general database statistics."""
-        with sqlite3.connect(self.db_path) as conn:
-            stats = {}
-            
-            # Total transactions
-            cursor = conn.execute("SELECT COUNT(*) FROM transactions")
-            stats['total_transactions'] = cursor.fetchone()[0]
-            
-            # Manually categorized
-            cursor = conn.execute(
-                "SELECT COUNT(*) FROM transactions WHERE is_manually_categorized = TRUE"
-            )
-            stats['manually_categorized'] = cursor.fetchone()[0]
-            
-            # Auto categorized (not Other and not manually categorized)
-            cursor = conn.execute(
-                """SELECT COUNT(*) FROM transactions 
-                   WHERE category != 'Other' AND is_manually_categorized = FALSE"""
-            )
-            stats['auto_categorized'] = cursor.fetchone()[0]
-            
-            # Uncategorized (Other category)
-            cursor = conn.execute(
-                "SELECT COUNT(*) FROM transactions WHERE category = 'Other'"
-            )
-            stats['uncategorized'] = cursor.fetchone()[0]
-            
-            # Total mappings
-            cursor = conn.execute("SELECT COUNT(*) FROM category_mappings")
-            stats['total_mappings'] = cursor.fetchone()[0]
-            
-            return stats
-
+        """Get general database statistics.
+        
+        The transaction counts come from one pass over the table, cached until
+        transactions change; only the small mappings table is counted per call.
+        """
+        stats = dict(self.get_derived("database_stats", self._count_transactions))
+        with self.connect() as conn:
+            stats['total_mappings'] = conn.execute(
+                "SELECT COUNT(*) FROM category_mappings"
+            ).fetchone()[0]
+        return stats
+    
+    def _count_transactions(self) -> Dict[str, int]:
+        with self.connect() as conn:
+            row = conn.execute("""
+                SELECT COUNT(*),
+                       COUNT(*) FILTER (WHERE is_manually_categorized = TRUE),
+                       COUNT(*) FILTER (WHERE category != 'Other' AND is_manually_categorized = FALSE),
+                       COUNT(*) FILTER (WHERE category = 'Other')
+                FROM transactions
+            """).fetchone()
+        return dict(zip(
+            ('total_transactions', 'manually_categorized', 'auto_categorized', 'uncategorized'), row
+        ))
+    
     def suggest_category(self, amount: float, description: str, 
-                       account: str, payee: str) -> str:
-        """Simple category suggestion - just detect income vs other."""
+                       account: str, payee: str) -> Optional[str]:
+        """Suggest a category: Income for positive amounts, else what mappings or rules say.
+        
+        Resolved like auto-categorization (categorize_frame). Returns None if
+        nothing matched.
+        """
         # Income detection
         if amount > 0:
             return "Income"
         
-        # Check learned mappings
-        mappings = self.get_category_mappings()
+        row = pd.DataFrame({'account': [account], 'payee': [payee], 'description': [description]})
+        return self.categorize_frame(row).iloc[0]
+
+    def create_upload_job(self, job_id: str, filename: str, spool_path: str, bytes_total: int,
+                          options: Optional[str] = None):
+        """Register a queued upload job for a spooled file. Options are stored as JSON text."""
+        with self.connect() as conn:
+            conn.execute(
+                """INSERT INTO upload_jobs (id, filename, spool_path, bytes_total, options)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (job_id, filename, spool_path, bytes_total, options)
+            )
+            conn.commit()
+    
+    def claim_upload_job(self, job_id: str) -> bool:
+        """Atomically move a queued job to running. False if someone else got it first."""
+        with self.connect() as conn:
+            cursor = conn.execute(
+                """UPDATE upload_jobs 
+                   SET status = 'running', phase = 'starting', rows_processed = 0,
+                       started_at = ?, owner_pid = ?, updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND status = 'queued'""",
+                (datetime.now().timestamp(), os.getpid(), job_id)
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+    
+    def update_upload_job(self, job_id: str, **fields):
+        """Update progress fields (status, phase, rows_processed, error, result, finished_at)."""
+        allowed = {'status', 'phase', 'rows_processed', 'error', 'result', 'finished_at'}
+        unknown = set(fields) - allowed
+        if unknown:
+            raise ValueError(f"Unknown upload job fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
         
-        # Check payee mapping first (more specific)
-        if payee and payee.lower() in mappings['payee']:
-            return mappings['payee'][payee.lower()]
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.connect() as conn:
+            conn.execute(
+                f"UPDATE upload_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                list(fields.values()) + [job_id]
+            )
+            conn.commit()
+    
+    def get_upload_job(self, job_id: str) -> Optional[Dict]:
+        """Get an upload job by id."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM upload_jobs WHERE id = ?", (job_id,)).fetchone()
+            return dict(row) if row else None
+    
+    def list_upload_jobs(self, limit: int = 50) -> List[Dict]:
+        """Get the most recent upload jobs."""
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(
+                "SELECT * FROM upload_jobs ORDER BY created_at DESC, rowid DESC LIMIT ?",
+                (limit,)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def request_upload_job_cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a job. Queued jobs are cancelled immediately, running jobs at their next checkpoint.
         
-        # Check account mapping if no payee match
-        if account and account.lower() in mappings['account']:
-            return mappings['account'][account.lower()]
+        Returns the job status after the request, or None if the job doesn't exist.
+        """
+        with self.connect() as conn:
+            conn.execute(
+                """UPDATE upload_jobs 
+                   SET status = 'cancelled', phase = 'cancelled', finished_at = ?,
+                       updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND status = 'queued'""",
+                (datetime.now().timestamp(), job_id)
+            )
+            conn.execute(
+                """UPDATE upload_jobs SET cancel_requested = TRUE, updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND status = 'running'""",
+                (job_id,)
+            )
+            conn.commit()
+            row = conn.execute("SELECT status FROM upload_jobs WHERE id = ?", (job_id,)).fetchone()
+            return row[0] if row else None
+    
+    def is_upload_job_cancel_requested(self, job_id: str) -> bool:
+        """Check whether cancellation was requested for a running job."""
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT cancel_requested FROM upload_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            return bool(row and row[0])
+    
+    def requeue_interrupted_upload_jobs(self,
+                                        is_job_alive: Optional[Callable[[str, int], bool]] = None
+                                        ) -> List[str]:
+        """Put jobs that were running when their process stopped back in the queue.
         
-        # Default to Other for manual categorization
-        return "Other"
-
+        With is_job_alive(job_id, owner_pid), jobs that are still running (in
+        another worker or this process) are left alone. Returns ids of all
+        queued jobs, oldest first.
+        """
+        with self.connect() as conn:
+            running = conn.execute(
+                "SELECT id, owner_pid FROM upload_jobs WHERE status = 'running'"
+            ).fetchall()
+            orphaned = [
+                (job_id,) for job_id, owner_pid in running
+                if is_job_alive is None or owner_pid is None or not is_job_alive(job_id, owner_pid)
+            ]
+            conn.executemany(
+                """UPDATE upload_jobs 
+                   SET status = 'queued', phase = 'interrupted', rows_processed = 0,
+                       updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND status = 'running'""",
+                orphaned
+            )
+            conn.commit()
+            cursor = conn.execute(
+                "SELECT id FROM upload_jobs WHERE status = 'queued' ORDER BY created_at, rowid"
+            )
+            return [row[0] for row in cursor.fetchall()]
+    
     def clear_category_mappings(self):
         """Clear all category mappings."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             conn.execute("DELETE FROM category_mappings")
             conn.commit()
 
 
+# Open ledgers; the default ledger is the single database of older versions
+ledgers = LedgerRegistry(
+    LocalDatabaseManager,
+    ledgers_dir=os.environ.get("PFIN_LEDGERS_DIR", "data/ledgers"),
+    default_path=os.environ.get("PFIN_DB_PATH", DEFAULT_DB_PATH),
+    max_open=int(os.environ.get("PFIN_MAX_OPEN_LEDGERS", "32")),
+    idle_seconds=float(os.environ.get("PFIN_LEDGER_IDLE_SECONDS", "600"))
+)
+
+
+def init_db(db_path: Optional[str] = None) -> LocalDatabaseManager:
+    """Open the default ledger (directories, schema) if needed.
+    
+    The path comes from the argument, then PFIN_DB_PATH, then the default.
+    Called from the app lifespan; anything touching ``db`` earlier triggers it too.
+    """
+    if db_path and not ledgers.is_open(DEFAULT_LEDGER):
+        ledgers.default_path = db_path
+    return ledgers.get(DEFAULT_LEDGER)
+
+
+def get_db() -> LocalDatabaseManager:
+    """Get the database manager of the current ledger, opening it on first use."""
+    return ledgers.current()
+
+
+class _LazyDatabase:
+    """Stand-in for the current ledger's manager, so importing this module has no
+    side effects and request code doesn't need to know which ledger it serves."""
+    
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+
 # Global instance
-db = LocalDatabaseManager()
+db = _LazyDatabase()
 
 
 # Available categories - keep this simple and universal
@@ -0,0 +1,221 @@
+"""
+Ledger selection for serving many households from one process.
+
+Each ledger is its own SQLite file. The registry keeps an LRU of open database
+managers, with their warm caches (memory-mapped snapshot, compiled rules), and
+closes the least recently used or idle ones so memory and file descriptors
+stay bounded no matter how many ledgers exist on disk.
+
+The ledger of the current request lives in a context variable, set by the API
+middleware; the global ``db`` resolves through it, so data access code doesn't
+need to pass ledgers around.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List
+
+
+DEFAULT_LEDGER = "default"
+
+LEDGER_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+# Ledger used by data access in the current request or job
+current_ledger: ContextVar[str] = ContextVar("current_ledger", default=DEFAULT_LEDGER)
+
+
+class LedgerNotFound(KeyError):
+    """Raised when a ledger doesn't exist and wasn't asked to be created."""
+
+
+def validate_ledger_name(name: str):
+    """Raise ValueError for names that aren't safe as file names."""
+    if not LEDGER_NAME_PATTERN.match(name or ""):
+        raise ValueError(
+            "Invalid ledger name: use 1-64 letters, digits, '-' or '_', starting with a letter or digit"
+        )
+
+
+class LedgerRegistry:
+    """LRU of open ledgers with idle eviction."""
+
+    def __init__(self, factory: Callable[[str], Any], ledgers_dir: str, default_path: str,
+                 max_open: int = 32, idle_seconds: float = 600.0):
+        """
+        Args:
+            factory: opens a database manager for a file path
+            ledgers_dir: directory holding <name>.db for named ledgers
+            default_path: database file of the default ledger
+            max_open: most ledgers kept open at once
+            idle_seconds: ledgers unused this long are closed
+        """
+        self.factory = factory
+        self.ledgers_dir = ledgers_dir
+        self.default_path = default_path
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._open: "OrderedDict[str, Any]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        # Ledgers being opened; other requests for them wait on the future
+        self._opening: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._on_open: List[Callable[[str, Any], None]] = []
+
+    def path_for(self, name: str) -> str:
+        if name == DEFAULT_LEDGER:
+            return self.default_path
+        return os.path.join(self.ledgers_dir, f"{name}.db")
+
+    def exists(self, name: str) -> bool:
+        return name == DEFAULT_LEDGER or os.path.exists(self.path_for(name))
+
+    def is_open(self, name: str) -> bool:
+        return name in self._open
+
+    def on_open(self, callback: Callable[[str, Any], None]):
+        """Run callback(name, manager) whenever a ledger is opened, with that ledger current."""
+        if callback not in self._on_open:
+            self._on_open.append(callback)
+
+    def get(self, name: str = DEFAULT_LEDGER, create: bool = False):
+        """Get the manager of a ledger, opening it if needed.
+
+        Raises ValueError for invalid names and LedgerNotFound for missing
+        ledgers unless create is set.
+        """
+        now = time.monotonic()
+        with self._lock:
+            manager = self._open.get(name)
+            if manager is not None:
+                self._open.move_to_end(name)
+                self._last_used[name] = now
+                evicted = self._evict(now)
+        if manager is not None:
+            self._release(evicted)
+            return manager
+
+        validate_ledger_name(name)
+        if not create and not self.exists(name):
+            raise LedgerNotFound(name)
+
+        with self._lock:
+            # Another thread may have opened it meanwhile, or be opening it
+            manager = self._open.get(name)
+            pending = self._opening.get(name)
+            opening = manager is None and pending is None
+            if manager is not None:
+                self._open.move_to_end(name)
+                self._last_used[name] = now
+                evicted = self._evict(now)
+            elif opening:
+                pending = self._opening[name] = Future()
+        if manager is not None:
+            self._release(evicted)
+            return manager
+        if not opening:
+            return pending.result()
+
+        # Opening runs schema setup and maps the snapshot; requests for other
+        # ledgers must not wait for it, so only the registry update is locked
+        try:
+            if name != DEFAULT_LEDGER:
+                os.makedirs(self.ledgers_dir, exist_ok=True)
+            manager = self.factory(self.path_for(name))
+        except BaseException as e:
+            with self._lock:
+                del self._opening[name]
+            pending.set_exception(e)
+            raise
+
+        now = time.monotonic()
+        with self._lock:
+            del self._opening[name]
+            self._open[name] = manager
+            self._last_used[name] = now
+            evicted = self._evict(now)
+        pending.set_result(manager)
+
+        self._release(evicted)
+        self._run_on_open(name, manager)
+        return manager
+
+    def _run_on_open(self, name: str, manager):
+        token = current_ledger.set(name)
+        try:
+            for callback in self._on_open:
+                callback(name, manager)
+        finally:
+            current_ledger.reset(token)
+
+    def _evict(self, now: float) -> List[Any]:
+        """Drop idle ledgers and trim to max_open, least recently used first.
+
+        Holds the lock; returns the dropped managers for _release.
+        """
+        evicted = []
+        for name in list(self._open):
+            over_limit = len(self._open) > self.max_open
+            idle = now - self._last_used[name] > self.idle_seconds
+            if not (over_limit or idle):
+                break
+            evicted.append(self._open.pop(name))
+            del self._last_used[name]
+        return evicted
+
+    @staticmethod
+    def _release(managers: List[Any]):
+        """Free the caches of dropped managers, outside the lock.
+
+        Requests still holding a manager keep working; it reopens what it needs.
+        """
+        for manager in managers:
+            manager.close()
+
+    def sweep(self) -> int:
+        """Close ledgers idle for longer than idle_seconds. Returns how many.
+
+        get() evicts as well, but only while requests come in; the app calls
+        this periodically so idle ledgers are also closed on a quiet server.
+        """
+        with self._lock:
+            evicted = self._evict(time.monotonic())
+        self._release(evicted)
+        return len(evicted)
+
+    def close(self, name: str) -> bool:
+        """Close a ledger and drop it from the cache. Returns False if it wasn't open."""
+        with self._lock:
+            self._last_used.pop(name, None)
+            manager = self._open.pop(name, None)
+        if manager is None:
+            return False
+        self._release([manager])
+        return True
+
+    def list_ledgers(self) -> List[Dict]:
+        """Ledgers on disk plus the default one, with whether each is open."""
+        names = {DEFAULT_LEDGER}
+        if os.path.isdir(self.ledgers_dir):
+            names.update(
+                entry[:-3] for entry in os.listdir(self.ledgers_dir)
+                if entry.endswith(".db") and LEDGER_NAME_PATTERN.match(entry[:-3])
+            )
+        return [
+            {
+                "name": name,
+                "is_open": name in self._open,
+                "size_bytes": os.path.getsize(self.path_for(name)) if os.path.exists(self.path_for(name)) else 0
+            }
+            for name in sorted(names)
+        ]
+
+    def open_count(self) -> int:
+        return len(self._open)
+
+    def current(self):
+        """Manager of the ledger selected for the current context."""
+        return self.get(current_ledger.get())
@@ -0,0 +1,262 @@
+"""
+On-disk columnar snapshot of the transactions table.
+
+The snapshot is a directory of .npy files next to the SQLite database, one per
+column. Numeric and date columns are memory-mapped as they are; text columns
+are dictionary encoded as int32 codes plus a small file of distinct values.
+Loading a snapshot therefore costs a few page faults instead of a full SQLite
+read and pandas parsing, and every worker process maps the same pages.
+
+When the frame is sorted by a column (transactions come newest first), a load
+can be limited to a range of that column: the bounds are found by binary
+search on the mapped column, and only the rows inside are materialized.
+
+Each snapshot is tagged with the database instance id and data version it was
+built from. A stale snapshot is never read; callers fall back to SQLite and
+the snapshot is rebuilt on a background thread.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from tools.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+# Text dictionaries are stored NUL separated; values containing NUL are not snapshotted
+_SEPARATOR = "\x00"
+
+# Coalesce bursts of writes (e.g. saving categories one by one) into one rebuild
+REBUILD_DELAY_SECONDS = 0.5
+
+
+class ColumnarSnapshot:
+    """Versioned, memory-mapped copy of a DataFrame kept next to the database."""
+
+    def __init__(self, path: str, read_version: Callable[[], Tuple[str, int]],
+                 read_frame: Callable[[], Tuple[Tuple[str, int], pd.DataFrame]],
+                 sort_column: Optional[str] = None):
+        """
+        Args:
+            path: directory holding one subdirectory per snapshot version
+            read_version: returns the current (instance_id, data_version)
+            read_frame: returns ((instance_id, data_version), frame) read consistently
+            sort_column: column read_frame sorts by, highest first; enables range loads
+        """
+        self.path = path
+        self.sort_column = sort_column
+        self._read_version = read_version
+        self._read_frame = read_frame
+        self._loaded_key: Optional[Tuple[str, int]] = None
+        self._loaded: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_requested = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _dirname(key: Tuple[str, int]) -> str:
+        instance_id, version = key
+        return f"{instance_id}-{version}"
+
+    def load(self, low: Any = None, high: Any = None) -> Optional[pd.DataFrame]:
+        """Return the snapshot as a DataFrame, or None if it is missing or stale.
+
+        low and high limit the rows to sort_column values within [low, high].
+        A missing or stale snapshot schedules a background rebuild.
+        """
+        key = self._read_version()
+        with self._lock:
+            if self._loaded_key != key:
+                self._loaded = self._open(key)
+                self._loaded_key = key if self._loaded is not None else None
+            loaded = self._loaded
+
+        if loaded is None:
+            self.schedule_rebuild()
+            return None
+        if loaded['rows'] == 0:
+            return None
+        rows = slice(None)
+        if low is not None or high is not None:
+            rows = self._range(loaded, low, high)
+        return self._to_frame(loaded, rows)
+
+    def _range(self, loaded: Dict, low: Any, high: Any) -> slice:
+        """Rows whose sort_column value lies in [low, high], by binary search."""
+        if self.sort_column is None:
+            raise ValueError("Range loads need a snapshot with a sort_column")
+        _, column, _ = loaded['columns'][self.sort_column]
+        # Reversed view of the descending column is ascending, without a copy
+        ascending = np.asarray(column)[::-1]
+        total = len(ascending)
+        first = 0 if high is None else total - int(np.searchsorted(ascending, np.array(high, dtype=ascending.dtype), 'right'))
+        stop = total if low is None else total - int(np.searchsorted(ascending, np.array(low, dtype=ascending.dtype), 'left'))
+        return slice(first, max(first, stop))
+
+    def _open(self, key: Tuple[str, int]) -> Optional[Dict]:
+        """Memory-map the snapshot built for key and decode its dictionaries."""
+        directory = os.path.join(self.path, self._dirname(key))
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+
+            columns = {}
+            for name, spec in meta['columns'].items():
+                if spec['kind'] == 'text':
+                    codes = np.load(os.path.join(directory, f"{name}.codes.npy"), mmap_mode='r')
+                    with open(os.path.join(directory, f"{name}.dict.txt"), encoding="utf-8") as f:
+                        text = f.read()
+                    values = text.split(_SEPARATOR) if spec['distinct'] else []
+                    if len(values) != spec['distinct']:
+                        return None
+                    # Decoded once per version; code -1 (missing) picks the trailing None
+                    dictionary = pd.array(values + [None], dtype=spec['dtype'])
+                    columns[name] = ('text', codes, dictionary)
+                else:
+                    columns[name] = ('array', np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r'), None)
+            return {'rows': meta['rows'], 'order': meta['order'], 'columns': columns}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def _to_frame(loaded: Dict, rows: slice = slice(None)) -> pd.DataFrame:
+        """Build a frame; numeric columns reference the mapped pages without copying."""
+        data = {}
+        for name in loaded['order']:
+            kind, array, dictionary = loaded['columns'][name]
+            if kind == 'text':
+                data[name] = dictionary.take(np.asarray(array[rows]))
+            else:
+                # A plain ndarray view of the mapped pages
+                data[name] = np.asarray(array[rows])
+        return pd.DataFrame(data, copy=False)
+
+    def schedule_rebuild(self):
+        """Rebuild the snapshot on a background thread, coalescing repeated requests."""
+        with self._rebuild_lock:
+            self._rebuild_requested.set()
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._rebuild_loop, name="snapshot-rebuild", daemon=True
+                )
+                self._worker.start()
+
+    def _rebuild_loop(self):
+        while True:
+            time.sleep(REBUILD_DELAY_SECONDS)
+            with self._rebuild_lock:
+                if not self._rebuild_requested.is_set():
+                    self._worker = None
+                    return
+                self._rebuild_requested.clear()
+            try:
+                self.rebuild()
+            except Exception as e:
+                # Analytics keep working from SQLite; the next write retries
+                print(f"⚠️  Snapshot rebuild failed: {e}")
+
+    @contextmanager
+    def _exclusive(self):
+        """Yield True if this process may rebuild, False if another worker process is at it."""
+        os.makedirs(self.path, exist_ok=True)
+        if fcntl is None:
+            yield True
+            return
+        with open(os.path.join(self.path, ".lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def rebuild(self) -> bool:
+        """Write a snapshot of the current data unless one exists. Returns True if written.
+
+        Only one worker process rebuilds at a time; the others skip and pick
+        the result up on their next load.
+        """
+        with self._exclusive() as acquired:
+            if not acquired:
+                return False
+            return self._write()
+
+    def _write(self) -> bool:
+        key, df = self._read_frame()
+        final_dir = os.path.join(self.path, self._dirname(key))
+        if os.path.exists(os.path.join(final_dir, "meta.json")):
+            return False
+
+        tmp_dir = os.path.join(self.path, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            columns = {}
+            for name in df.columns:
+                series = df[name]
+                if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+                    codes, uniques = pd.factorize(series)
+                    values = [str(value) for value in uniques]
+                    if any(_SEPARATOR in value for value in values):
+                        return False
+                    np.save(os.path.join(tmp_dir, f"{name}.codes.npy"), codes.astype(np.int32))
+                    with open(os.path.join(tmp_dir, f"{name}.dict.txt"), "w", encoding="utf-8") as f:
+                        f.write(_SEPARATOR.join(values))
+                    columns[name] = {'kind': 'text', 'distinct': len(values), 'dtype': str(series.dtype)}
+                else:
+                    np.save(os.path.join(tmp_dir, f"{name}.npy"), series.to_numpy())
+                    columns[name] = {'kind': 'array', 'dtype': str(series.dtype)}
+
+            # meta.json last: its presence marks a complete snapshot
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                json.dump({'rows': len(df), 'order': list(df.columns), 'columns': columns}, f)
+
+            try:
+                os.rename(tmp_dir, final_dir)
+            except OSError:
+                # Another process published the same version first
+                return False
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self._remove_old(keep=self._dirname(key))
+        return True
+
+    def _remove_old(self, keep: str):
+        """Delete superseded snapshots; processes still mapping them keep their pages."""
+        for entry in os.listdir(self.path):
+            if entry != keep and not entry.startswith("."):
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    def close(self):
+        """Unmap the loaded snapshot and drop a pending rebuild.
+
+        Frames handed out earlier keep their pages until they are freed; the
+        next load maps the snapshot again.
+        """
+        with self._lock:
+            self._loaded = None
+            self._loaded_key = None
+        self._rebuild_requested.clear()
+
+    def warm(self) -> bool:
+        """Map the snapshot ahead of the first request. Returns True if it was fresh."""
+        return self.load() is not None
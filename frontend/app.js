@@ -75,10 +75,29 @@ class FinanceDashboard {
         
         // Check if data exists and set appropriate default page
         await this.setDefaultPage();
+        this.subscribeToChanges();
         
         console.log('FinanceDashboard initialized successfully');
     }
 
+    // Follow data changes from any tab or client (server-sent events)
+    subscribeToChanges() {
+        if (!window.EventSource) return;
+        const events = new EventSource(`${this.apiBase}/events`);
+        let pending = null;
+        events.addEventListener('change', () => {
+            // Bursts of changes (upload, then auto-categorize) refresh once
+            clearTimeout(pending);
+            pending = setTimeout(async () => {
+                await this.updateStats();
+                // The categorize page isn't reloaded under the user's edits
+                if (this.currentPage === 'analytics') {
+                    await this.loadAnalyticsPageData();
+                }
+            }, 500);
+        });
+    }
+
     async setDefaultPage() {
         try {
             const response = await this.apiCall('/analytics/has-data');
@@ -300,10 +319,50 @@ class FinanceDashboard {
         }
     }
 
+    // Transactions cached in IndexedDB, kept current with /transactions/changes
+    openTransactionCache() {
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open('finance-dashboard', 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore('transactions', { keyPath: 'id' });
+                request.result.createObjectStore('meta');
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    async loadTransactions() {
+        if (!window.indexedDB) return this.apiCall('/transactions/');
+        const done = (request) => new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+        try {
+            const cache = await this.openTransactionCache();
+            const synced = await done(cache.transaction('meta').objectStore('meta').get('sync'));
+            const changes = await this.apiCall(`/transactions/changes?since=${synced ? synced.seq : 0}`);
+            const reset = changes.reset || !synced || synced.instance_id !== changes.instance_id;
+
+            const tx = cache.transaction(['transactions', 'meta'], 'readwrite');
+            const store = tx.objectStore('transactions');
+            if (reset) store.clear();
+            changes.deleted.forEach(id => store.delete(id));
+            changes.transactions.forEach(row => store.put(row));
+            tx.objectStore('meta').put({ instance_id: changes.instance_id, seq: changes.seq }, 'sync');
+            const rows = await done(store.getAll());
+            // Newest first, like /transactions/
+            return rows.sort((a, b) => (a.date < b.date) - (a.date > b.date));
+        } catch (error) {
+            console.warn('Transaction cache unavailable, loading everything:', error);
+            return this.apiCall('/transactions/');
+        }
+    }
+
     // Categorize Page
     async loadCategorizePageData() {
         try {
-            this.transactions = await this.apiCall('/transactions/');
+            this.transactions = await this.loadTransactions();
             this.setupTabNavigation();
             this.updateTabCounts();
             this.renderTransactionTables();
@@ -543,15 +602,15 @@ class FinanceDashboard {
         }
 
         try {
-            // Save all manual updates first
-            for (const update of updates) {
-                await this.apiCall(`/transactions/${update.id}`, {
-                    method: 'PATCH',
-                    body: JSON.stringify({ category: update.category })
-                });
-            }
+            // Save all manual updates first, in a single request
+            const bulkResponse = await this.apiCall('/transactions/bulk-categorize', {
+                method: 'POST',
+                body: JSON.stringify({
+                    updates: updates.map(update => ({ id: Number(update.id), category: update.category }))
+                })
+            });
 
-            this.showToast(`Successfully updated ${updates.length} transactions`, 'success');
+            this.showToast(`Successfully updated ${bulkResponse.updated_count} transactions`, 'success');
             
             // Apply auto-categorization to remaining uncategorized transactions
             try {
@@ -1764,6 +1823,19 @@ class FinanceDashboard {
         });
     }
 
+    async waitForUploadJob(job, uploadStatus) {
+        const finished = ['completed', 'failed', 'cancelled'];
+        while (!finished.includes(job.status)) {
+            await new Promise(resolve => setTimeout(resolve, 500));
+            job = await this.apiCall(`/uploads/jobs/${job.id}`);
+            uploadStatus.innerHTML = `
+                <i class="fas fa-spinner fa-spin"></i>
+                Processing file (${job.phase})... ${job.rows_processed.toLocaleString()} rows
+            `;
+        }
+        return job;
+    }
+
     async handleFileUpload(file) {
         if (!file.name.endsWith('.csv')) {
             this.showToast('Please select a CSV file', 'error');
@@ -1779,7 +1851,8 @@ class FinanceDashboard {
             const formData = new FormData();
             formData.append('file', file);
 
-            const response = await fetch(`${this.apiBase}/uploads/csv`, {
+            // Large files are processed in the background; poll the job for progress
+            const response = await fetch(`${this.apiBase}/uploads/jobs`, {
                 method: 'POST',
                 body: formData
             });
@@ -1788,7 +1861,11 @@ class FinanceDashboard {
                 throw new Error('Upload failed');
             }
 
-            const result = await response.json();
+            const job = await this.waitForUploadJob(await response.json(), uploadStatus);
+            if (job.status !== 'completed') {
+                throw new Error(job.error || `Upload ${job.status}`);
+            }
+            const result = job.result;
             
             uploadStatus.className = 'upload-status success';
             uploadStatus.innerHTML = `
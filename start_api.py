@@ -1,7 +1,14 @@
 #!/usr/bin/env python3
 """
-FastAPI Development Server Startup Script
+FastAPI Server Startup Script
+
+Development: python start_api.py --reload
+Production:  python start_api.py --production [--workers N]
+
+Workers are separate processes sharing the SQLite database (WAL mode); caches
+are invalidated through version counters stored in the database.
 """
+import argparse
 import sys
 import os
 
@@ -10,21 +17,48 @@ project_root = os.path.dirname(os.path.abspath(__file__))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start the Personal Finance Dashboard API server")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    parser.add_argument("--reload", action="store_true",
+                        help="Restart on code changes (development only, slows startup)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: PFIN_WORKERS, or the CPU count with --production, else 1)")
+    parser.add_argument("--production", action="store_true",
+                        help="Production settings: several workers, no access log, warnings only")
+    args = parser.parse_args()
+    
+    if args.workers is None:
+        default_workers = (os.cpu_count() or 1) if args.production else 1
+        args.workers = int(os.environ.get("PFIN_WORKERS", default_workers))
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.reload and (args.workers > 1 or args.production):
+        parser.error("--reload only works with a single development worker")
+    return args
+
+
 if __name__ == "__main__":
     import uvicorn
-    from api.main import app
+    
+    args = parse_args()
     
     print("🚀 Starting Personal Finance Dashboard API Server")
     print("📊 Privacy-first - all data stays on your device")
-    print("🌐 API Documentation: http://127.0.0.1:8000/docs")
+    print(f"🌐 API Documentation: http://{args.host}:{args.port}/docs")
     print("💾 Database: SQLite (local)")
+    print(f"⚙️  Workers: {args.workers}{' (production)' if args.production else ''}")
     print("=" * 50)
     
+    # Import string so the reloader and every worker process import the app themselves
     uvicorn.run(
         "api.main:app",
-        host="127.0.0.1",
-        port=8000,
-        reload=True,
-        reload_dirs=[project_root],
-        log_level="info"
+        host=args.host,
+        port=args.port,
+        reload=args.reload,
+        reload_dirs=[project_root] if args.reload else None,
+        workers=args.workers,
+        log_level="warning" if args.production else "info",
+        access_log=not args.production
     )
@@ -3,14 +3,119 @@
 API Test Script
 Test the FastAPI endpoints without requiring external packages
 """
+import asyncio
+import json
 import sys
 import os
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
 
 # Add the project root to Python path
 project_root = os.path.dirname(os.path.abspath(__file__))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+def _close_open_ledgers():
+    from database.db_manager import ledgers
+    for ledger in ledgers.list_ledgers():
+        if ledger["is_open"]:
+            ledgers.close(ledger["name"])
+
+@contextmanager
+def api_client():
+    """TestClient on a fresh database in a temporary directory, the real data is never touched"""
+    from fastapi.testclient import TestClient
+    from api.main import app
+    from database.db_manager import ledgers
+    
+    previous = (ledgers.default_path, ledgers.ledgers_dir, os.getcwd())
+    _close_open_ledgers()
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as workdir:
+        ledgers.default_path = os.path.join(workdir, "data", "test.db")
+        ledgers.ledgers_dir = os.path.join(workdir, "data", "ledgers")
+        # Upload jobs spool relative to the working directory
+        os.chdir(workdir)
+        try:
+            with TestClient(app) as client:
+                yield client
+        finally:
+            _close_open_ledgers()
+            os.chdir(previous[2])
+            ledgers.default_path, ledgers.ledgers_dir = previous[0], previous[1]
+
+CSV_COLUMNS = ("date", "amount", "description", "account", "payee")
+
+def csv_bytes(rows, columns=CSV_COLUMNS) -> bytes:
+    """CSV file content for rows of the given columns"""
+    lines = [",".join(columns)] + [",".join(f'"{field}"' if "," in str(field) else str(field) for field in row)
+                                   for row in rows]
+    return ("\n".join(lines) + "\n").encode()
+
+def upload_csv(client, rows, mode="replace_all", filename="test.csv", columns=CSV_COLUMNS):
+    """Upload rows as a CSV, by default (date, amount, description, account, payee)"""
+    response = client.post(f"/api/uploads/csv?mode={mode}", files={"file": (filename, csv_bytes(rows, columns))})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def wait_for_job(client, job_id, timeout=30.0):
+    """Poll an upload job until it finished"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/uploads/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Upload job {job_id} did not finish: {job}")
+
+def read_events(app, path, count, headers=()):
+    """First count server-sent events of a stream, read from the ASGI app until it disconnects.
+    
+    TestClient reads a response to its end, which an event stream never reaches.
+    """
+    async def collect():
+        events, buffer = [], ""
+        done = asyncio.Event()
+        
+        async def receive():
+            await done.wait()
+            return {"type": "http.disconnect"}
+        
+        async def send(message):
+            nonlocal buffer
+            if message["type"] != "http.response.body" or done.is_set():
+                return
+            buffer += message.get("body", b"").decode()
+            while "\n\n" in buffer:
+                block, buffer = buffer.split("\n\n", 1)
+                fields = dict(line.split(": ", 1) for line in block.split("\n") if ": " in line)
+                if "event" in fields:
+                    events.append({"event": fields["event"], "id": int(fields["id"]),
+                                   "data": json.loads(fields["data"])})
+            if len(events) >= count:
+                done.set()
+        
+        route, _, query = path.partition("?")
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": route, "raw_path": route.encode(), "root_path": "",
+            "query_string": query.encode(), "headers": [(k.encode(), v.encode()) for k, v in headers],
+            "client": ("testclient", 50000), "server": ("testserver", 80)
+        }
+        await asyncio.wait_for(app(scope, receive, send), 10)
+        return events
+    
+    return asyncio.run(collect())
+
+def run_test(test) -> bool:
+    """Run a test for the summary; failed assertions and errors count as failures"""
+    try:
+        return test()
+    except Exception as e:
+        print(f"❌ {type(e).__name__}: {e}")
+        return False
+
 def test_database_connection():
     """Test basic database functionality"""
     print("🔍 Testing database connection...")
@@ -51,6 +156,83 @@ def test_api_imports():
     print(f"\n📊 Import Results: {success_count}/{len(modules_to_test)} modules successful")
     return success_count == len(modules_to_test)
 
+# Generous budget for importing api.main in a fresh interpreter; FastAPI alone
+# takes a few hundred ms, pulling pandas in eagerly roughly doubles it
+IMPORT_TIME_BUDGET_SECONDS = 2.0
+
+def test_import_time_budget():
+    """Test that importing the app is fast and has no side effects"""
+    print("\n⏱️  Testing api.main import time...")
+    
+    script = (
+        "import sys, time\n"
+        f"sys.path.insert(0, {project_root!r})\n"
+        "start = time.perf_counter()\n"
+        "import api.main\n"
+        "elapsed = time.perf_counter() - start\n"
+        "eager = [name for name in ('pandas', 'numpy') if name in sys.modules]\n"
+        "print(f\"{elapsed}|{','.join(eager)}\")\n"
+    )
+    # Run from an empty directory so any import-time database creation shows up
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=workdir, capture_output=True, text=True, check=True
+        )
+        created = os.listdir(workdir)
+    
+    elapsed_text, eager = result.stdout.strip().splitlines()[-1].split("|")
+    elapsed = float(elapsed_text)
+    print(f"✅ api.main imported in {elapsed * 1000:.0f}ms (budget {IMPORT_TIME_BUDGET_SECONDS * 1000:.0f}ms)")
+    
+    assert elapsed < IMPORT_TIME_BUDGET_SECONDS, f"api.main import took {elapsed:.2f}s"
+    assert not eager, f"Imported eagerly: {eager}"
+    assert not created, f"Import created files: {created}"
+    return True
+
+def test_date_windows():
+    """Test that month windows cover whole calendar months"""
+    print("\n📅 Testing date windows...")
+    
+    from datetime import date
+    from tools.date_ranges import month_window, resolve_date_range
+    
+    assert month_window(1, date(2024, 2, 10)) == (date(2024, 2, 1), date(2024, 2, 29))
+    assert month_window(3, date(2024, 1, 31)) == (date(2023, 11, 1), date(2024, 1, 31))
+    assert month_window(12, date(2024, 12, 1)) == (date(2024, 1, 1), date(2024, 12, 31))
+    # Explicit dates win over a month count
+    assert resolve_date_range(date(2020, 5, 1), None, 3) == (date(2020, 5, 1), None)
+    assert resolve_date_range() == (None, None)
+    try:
+        resolve_date_range(date(2024, 2, 1), date(2024, 1, 1))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("start after end was accepted")
+    print("✅ Month windows are calendar aligned")
+    return True
+
+def test_duplicate_detection():
+    """Test that pending/posted copies are found and unrelated rows are not"""
+    print("\n🔁 Testing duplicate detection...")
+    
+    import pandas as pd
+    from tools.duplicates import find_duplicates
+    
+    df = pd.DataFrame({
+        'id': [1, 2, 3, 4, 5],
+        'date': pd.to_datetime(['2024-03-01', '2024-03-03', '2024-03-01', '2024-03-09', '2024-03-02']),
+        'amount': [-42.5, -42.5, -42.5, -42.5, -19.99],
+        'account': ['Visa', 'Visa', 'Checking', 'Visa', 'Visa'],
+        'payee': ['Amazon', 'Amazon Marketplace', 'Amazon', 'Amazon', 'Amazon'],
+        'description': ['PENDING AMAZON MKTP 123', 'AMAZON MKTP US*2K3', '', '', ''],
+    })
+    pairs = find_duplicates(df)
+    # Other account, too many days apart and other amount are not candidates
+    assert [(df['id'][row.first], df['id'][row.second]) for row in pairs.itertuples()] == [(1, 2)]
+    assert find_duplicates(df, dismissed=[(2, 1)]).empty
+    print("✅ Duplicate candidates found by sliding window")
+    return True
+
 def test_available_categories():
     """Test category system"""
     print("\n📋 Testing category system...")
@@ -65,6 +247,642 @@ def test_available_categories():
         print(f"❌ Category system test failed: {e}")
         return False
 
+def test_category_rules():
+    """Test that rules categorize uploads by priority and that regexes can't break matching"""
+    print("\n🏷️  Testing categorization rules...")
+    
+    with api_client() as client:
+        for rule in (
+            {"field": "payee", "match_type": "substring", "pattern": "coffee", "category": "Eating out, Bars, Social"},
+            # Higher priority wins over the older, broader substring rule
+            {"field": "payee", "match_type": "prefix", "pattern": "coffee beans", "category": "Groceries", "priority": 5},
+            {"field": "description", "match_type": "regex", "pattern": r"(fuel|petrol) \d+", "category": "Transport"},
+        ):
+            assert client.post("/api/categories/rules", json=rule).status_code == 200
+        
+        # Named groups would clash inside the combined alternation
+        rejected = client.post("/api/categories/rules", json={
+            "field": "payee", "match_type": "regex", "pattern": "(?P<x>gym)", "category": "Sports, Wellness, Health"
+        })
+        assert rejected.status_code == 400, rejected.text
+        
+        # Rules saved before that check must not break the rest
+        from database.db_manager import db
+        with db.connect() as conn:
+            conn.executemany(
+                "INSERT INTO category_rules (field, match_type, pattern, category) VALUES ('payee', 'regex', ?, ?)",
+                [("(?P<x>gym)", "Sports, Wellness, Health"), ("(?P<x>cinema)", "Shopping")]
+            )
+        
+        upload_csv(client, [
+            ("2024-03-01", -3.5, "card", "Visa", "Corner Coffee"),
+            ("2024-03-02", -12.0, "card", "Visa", "Coffee Beans Shop"),
+            ("2024-03-03", -60.0, "Fuel 95", "Visa", "Station"),
+            ("2024-03-04", -30.0, "card", "Visa", "City Gym"),
+            ("2024-03-05", -9.0, "card", "Visa", "Cinema"),
+            ("2024-03-06", -5.0, "card", "Visa", "Kiosk"),
+        ])
+        categories = {row["payee"]: row["category"] for row in client.get("/api/transactions/").json()}
+    
+    assert categories == {
+        "Corner Coffee": "Eating out, Bars, Social",
+        "Coffee Beans Shop": "Groceries",
+        "Station": "Transport",
+        "City Gym": "Sports, Wellness, Health",
+        "Cinema": "Shopping",
+        "Kiosk": "Other",
+    }, categories
+    print("✅ Rules applied by priority; clashing regexes are rejected or matched on their own")
+    return True
+
+def test_upload_scores_anomalies():
+    """Test that uploads score anomalies, so GET /anomalies is current right after one"""
+    print("\n🚨 Testing anomaly scoring on upload...")
+    
+    history = [(f"2023-{month:02d}-10", -50 - month % 3, "groceries", "Visa", "Market") for month in range(1, 13)]
+    with api_client() as client:
+        upload_csv(client, history + [("2024-01-10", -400, "groceries", "Visa", "Market")])
+        first = client.get("/api/analytics/anomalies").json()
+        # Appended rows are scored incrementally against the stored baselines
+        upload_csv(client, [("2024-02-10", -52, "groceries", "Visa", "Market"),
+                            ("2024-03-10", -650, "groceries", "Visa", "Market")], mode="append")
+        second = client.get("/api/analytics/anomalies").json()
+        # A payee without history is scored against its category
+        upload_csv(client, [("2024-04-10", -900, "groceries", "Visa", "New Market")], mode="append")
+        third = client.get("/api/analytics/anomalies").json()
+    
+    assert first["scoring"] == {"current": True, "full_rescore_needed": False}, first["scoring"]
+    assert [row["amount"] for row in first["anomalies"]] == [-400], first
+    assert second["scoring"]["current"], second["scoring"]
+    assert sorted(row["amount"] for row in second["anomalies"]) == [-650, -400], second
+    assert third["scoring"]["current"], third["scoring"]
+    newcomer = [row for row in third["anomalies"] if row["payee"] == "New Market"]
+    assert len(newcomer) == 1 and newcomer[0]["baseline"] == "category", third
+    print("✅ Anomalies are scored as uploads are stored")
+    return True
+
+def test_upload_job_resume_and_cancel():
+    """Test that a rerun of an interrupted upload job doesn't duplicate rows, and that queued jobs cancel"""
+    print("\n⏯️  Testing upload job resume and cancel...")
+    from api.upload_jobs import upload_jobs
+    from database.db_manager import db
+    
+    history = [("2024-01-05", -20, "coffee", "Visa", "Cafe"), ("2024-01-06", -30, "lunch", "Visa", "Deli")]
+    statement = [("2024-02-01", -45, "fuel", "Visa", "Station"), ("2024-02-02", -12, "parking", "Visa", "Garage")]
+    with api_client() as client:
+        upload_csv(client, history)
+        response = client.post("/api/uploads/jobs?mode=append", files={"file": ("feb.csv", csv_bytes(statement))})
+        assert response.status_code == 202, response.text
+        job_id = response.json()["id"]
+        assert wait_for_job(client, job_id)["status"] == "completed"
+        
+        # A worker that died after storing the rows but before marking the job completed
+        with open(upload_jobs.spool_path(job_id), "wb") as spool:
+            spool.write(csv_bytes(statement))
+        db.update_upload_job(job_id, status="running", phase="scoring")
+        assert upload_jobs.resume_interrupted() == 1
+        resumed = wait_for_job(client, job_id)
+        transactions = client.get("/api/transactions/").json()
+        imports = client.get("/api/uploads/imports").json()
+        
+        # Queued jobs are cancelled right away
+        db.create_upload_job("queued-job", "mar.csv", upload_jobs.spool_path("queued-job"), 0)
+        cancelled = client.delete("/api/uploads/jobs/queued-job").json()
+        finished = client.delete(f"/api/uploads/jobs/{job_id}")
+    
+    assert resumed["status"] == "completed", resumed
+    assert resumed["result"]["inserted_count"] == 2, resumed
+    assert len(transactions) == 4, transactions
+    assert len(imports) == 2, imports
+    assert cancelled["status"] == "cancelled", cancelled
+    assert finished.status_code == 409, finished.text
+    print("✅ Resumed jobs replace their own import and queued jobs cancel")
+    return True
+
+def test_event_stream():
+    """Test the change events streamed to the frontend after an upload and a recategorization"""
+    print("\n📡 Testing the event stream...")
+    
+    with api_client() as client:
+        upload_csv(client, [("2024-01-05", -20, "coffee", "Visa", "Cafe"),
+                            ("2024-02-06", -30, "lunch", "Visa", "Deli")])
+        lunch = next(row for row in client.get("/api/transactions/").json() if row["payee"] == "Deli")
+        response = client.patch(f"/api/transactions/{lunch['id']}", json={"category": "Eating out, Bars, Social"})
+        assert response.status_code == 200, response.text
+        
+        ready, uploaded, recategorized = read_events(client.app, "/api/events?last_event_id=0", 3)
+        # A client resuming past the newest event has to reload
+        [stale] = read_events(client.app, "/api/events", 1, headers=[("last-event-id", "99")])
+    
+    assert ready["event"] == "ready" and ready["data"] == {"data_version": 2, "reset": False}, ready
+    assert uploaded["event"] == "change" and uploaded["id"] == 1, uploaded
+    assert uploaded["data"]["kind"] == "uploaded" and uploaded["data"]["count"] == 2, uploaded
+    # Replacing everything may touch any month
+    assert uploaded["data"]["months"] is None, uploaded
+    assert recategorized["data"]["kind"] == "recategorized", recategorized
+    assert recategorized["data"]["ids"] == [lunch["id"]], recategorized
+    assert recategorized["data"]["months"] == ["2024-02"], recategorized
+    assert stale["event"] == "ready" and stale["data"]["reset"], stale
+    print("✅ Change events carry kind, ids and months")
+    return True
+
+def test_ledgers():
+    """Test that ledgers keep their data apart, survive eviction and open without blocking each other"""
+    print("\n📒 Testing ledgers...")
+    import threading
+    from database.db_manager import ledgers
+    from database.ledgers import LedgerRegistry
+    
+    statement = [("2024-01-05", -20, "coffee", "Visa", "Cafe"), ("2024-01-06", -30, "lunch", "Visa", "Deli")]
+    with api_client() as client:
+        assert client.post("/api/ledgers", json={"name": "smith"}).status_code == 201
+        response = client.post("/api/uploads/csv", headers={"X-Ledger": "smith"},
+                               files={"file": ("smith.csv", csv_bytes(statement))})
+        assert response.status_code == 200, response.text
+        smith = client.get("/api/ledgers/smith/transactions/").json()
+        default = client.get("/api/transactions/").json()
+        missing = client.get("/api/transactions/", headers={"X-Ledger": "jones"})
+        
+        max_open, ledgers.max_open = ledgers.max_open, 1
+        try:
+            # Opening smith again pushes the default ledger out of the LRU
+            client.get("/api/transactions/", headers={"X-Ledger": "smith"})
+            open_after = {row["name"]: row["is_open"] for row in client.get("/api/ledgers").json()}
+            reopened = client.get("/api/transactions/", headers={"X-Ledger": "smith"}).json()
+        finally:
+            ledgers.max_open = max_open
+    
+    assert len(smith) == 2 and default == [], (smith, default)
+    assert missing.status_code == 404, missing.text
+    assert open_after == {"default": False, "smith": True}, open_after
+    assert len(reopened) == 2, reopened
+    
+    class Manager:
+        def close(self):
+            pass
+    
+    release = threading.Event()
+    calls = []
+    
+    def factory(path):
+        calls.append(os.path.basename(path))
+        if path.endswith("slow.db"):
+            release.wait(10)
+        return Manager()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = LedgerRegistry(factory, workdir, os.path.join(workdir, "default.db"))
+        results = {}
+        openers = [threading.Thread(target=lambda key=key: results.setdefault(key, registry.get("slow", create=True)))
+                   for key in ("first", "second")]
+        for opener in openers:
+            opener.start()
+        while "slow.db" not in calls:
+            time.sleep(0.01)
+        # Another ledger opens while slow is still being opened
+        registry.get("fast", create=True)
+        fast_opened_first = not results
+        release.set()
+        for opener in openers:
+            opener.join(10)
+    
+    assert fast_opened_first, results
+    assert results["first"] is results["second"], results
+    assert calls.count("slow.db") == 1, calls
+    print("✅ Ledgers are isolated, reopen after eviction and open independently")
+    return True
+
+def test_bulk_recategorization():
+    """Test bulk and single recategorization: per-item statuses, mappings and change sequence numbers"""
+    print("\n🏷️  Testing bulk recategorization...")
+    
+    with api_client() as client:
+        upload_csv(client, [("2024-01-05", -4, "coffee", "Visa", "Cafe"), ("2024-01-09", -5, "coffee", "Visa", "Cafe"),
+                            ("2024-01-06", -30, "lunch", "Visa", "Deli"), ("2024-02-01", -45, "fuel", "Visa", "Station")])
+        ids = {(row["payee"], row["date"][:10]): row["id"] for row in client.get("/api/transactions/").json()}
+        cafe, other_cafe, deli = ids[("Cafe", "2024-01-05")], ids[("Cafe", "2024-01-09")], ids[("Deli", "2024-01-06")]
+        synced = client.get("/api/transactions/changes?since=0").json()["seq"]
+        
+        bulk = client.post("/api/transactions/bulk-categorize", json={"updates": [
+            {"id": cafe, "category": "Eating out, Bars, Social"},
+            {"id": 9999, "category": "Groceries"},
+            {"id": deli, "category": "Bogus"}
+        ]}).json()
+        after_bulk = client.get(f"/api/transactions/changes?since={synced}").json()
+        
+        # A missing transaction is a 404 and doesn't count as a change
+        missing = client.patch("/api/transactions/9999", json={"category": "Transport"})
+        unchanged = client.get(f"/api/transactions/changes?since={after_bulk['seq']}").json()
+        patched = client.patch(f"/api/transactions/{deli}", json={"category": "Eating out, Bars, Social"})
+        after_patch = client.get(f"/api/transactions/changes?since={after_bulk['seq']}").json()
+        
+        by_filter = client.post("/api/transactions/bulk-categorize",
+                                json={"filter": {"payee": "Station"}, "category": "Transport"}).json()
+    
+    statuses = {item["id"]: item["status"] for item in bulk["results"]}
+    assert statuses == {cafe: "updated", 9999: "not_found", deli: "invalid_category"}, bulk
+    # The saved Visa/Cafe mapping recategorized the other coffee too
+    assert bulk["updated_count"] == 1 and bulk["mappings_saved"] == 1 and bulk["mappings_applied"] == 1, bulk
+    assert after_bulk["seq"] > synced and not after_bulk["reset"], after_bulk
+    assert {(row["id"], row["category"]) for row in after_bulk["transactions"]} == {
+        (cafe, "Eating out, Bars, Social"), (other_cafe, "Eating out, Bars, Social")
+    }, after_bulk
+    assert missing.status_code == 404, missing.text
+    assert unchanged["seq"] == after_bulk["seq"] and unchanged["transactions"] == [], unchanged
+    assert patched.status_code == 200, patched.text
+    assert [row["id"] for row in after_patch["transactions"]] == [deli], after_patch
+    assert by_filter["updated_count"] == 1, by_filter
+    print("✅ Recategorization reports each item and only bumps the sequence for real changes")
+    return True
+
+def test_mappings_apply_to_existing():
+    """Test that new mappings recategorize matching transactions right away, except manual ones"""
+    print("\n🗺️  Testing retroactive category mappings...")
+    
+    with api_client() as client:
+        upload_csv(client, [("2024-01-05", -4, "coffee", "Visa", "Cafe"), ("2024-01-06", -30, "lunch", "Visa", "Deli"),
+                            ("2024-01-07", -30, "lunch", "Amex", "Deli"), ("2024-02-01", -45, "fuel", "Visa", "Station"),
+                            ("2024-02-03", -9, "snack", "Visa", "Kiosk")])
+        kiosk = next(row["id"] for row in client.get("/api/transactions/").json() if row["payee"] == "Kiosk")
+        client.patch(f"/api/transactions/{kiosk}", json={"category": "Groceries"})
+        
+        # Matching ignores case
+        single = client.post("/api/categories/mappings",
+                             json={"account": "visa", "payee": "cafe", "category": "Eating out, Bars, Social"}).json()
+        bulk = client.post("/api/categories/mappings/bulk", json=[
+            {"account": "Visa", "payee": "Deli", "category": "Groceries"},
+            {"account": "Visa", "payee": "Station", "category": "Transport"},
+            {"account": "Visa", "payee": "Kiosk", "category": "Shopping"},
+            {"account": "Visa", "payee": "Nowhere", "category": "Transport"}
+        ]).json()
+        categories = {(row["account"], row["payee"]): row["category"] for row in client.get("/api/transactions/").json()}
+    
+    assert single["data"] == {"transactions_updated": 1}, single
+    assert bulk["data"] == {"mappings_saved": 4, "transactions_updated": 2}, bulk
+    assert categories == {
+        ("Visa", "Cafe"): "Eating out, Bars, Social",
+        ("Visa", "Deli"): "Groceries",
+        ("Amex", "Deli"): "Other",
+        ("Visa", "Station"): "Transport",
+        ("Visa", "Kiosk"): "Groceries"
+    }, categories
+    print("✅ Mappings apply to existing transactions of their account and payee")
+    return True
+
+def test_import_history():
+    """Test import modes, replacing one import and rolling one back, each scoped to its own rows"""
+    print("\n📥 Testing import history...")
+    
+    visa = [("2024-01-05", -4, "coffee", "Visa", "Cafe"), ("2024-01-06", -30, "lunch", "Visa", "Deli")]
+    amex = [("2024-01-07", -60, "shoes", "Amex", "Shop")]
+    bank = [("2024-01-02", 2500, "salary", "Bank", "Employer")]
+    
+    def payees(client):
+        return sorted(row["payee"] for row in client.get("/api/transactions/").json())
+    
+    with api_client() as client:
+        upload_csv(client, visa, filename="visa-jan.csv")
+        upload_csv(client, amex, mode="append", filename="amex-jan.csv")
+        upload_csv(client, bank, mode="append", filename="bank-jan.csv")
+        # A corrected Visa statement replaces the Visa rows only
+        upload_csv(client, [visa[0], ("2024-01-08", -12, "bus", "Visa", "Transit")],
+                   mode="replace_account", filename="visa-jan-fixed.csv")
+        after_account = payees(client)
+        imports = {row["filename"]: row for row in client.get("/api/uploads/imports").json()}
+        
+        amex_id = imports["amex-jan.csv"]["id"]
+        replaced = client.post(f"/api/uploads/imports/{amex_id}/replace",
+                               files={"file": ("amex-jan-v2.csv", csv_bytes([("2024-01-07", -65, "boots", "Amex", "Shop")]))})
+        after_replace = payees(client)
+        
+        bank_id = next(row["id"] for row in client.get("/api/uploads/imports").json() if row["account"] == "Bank")
+        rolled_back = client.delete(f"/api/uploads/imports/{bank_id}")
+        after_rollback = payees(client)
+        filenames = [row["filename"] for row in client.get("/api/uploads/imports").json()]
+        
+        missing = client.post("/api/uploads/imports/9999/replace", files={"file": ("x.csv", csv_bytes(amex))})
+        invalid_mode = client.post("/api/uploads/csv?mode=bogus", files={"file": ("x.csv", csv_bytes(visa))})
+        replaced_all = upload_csv(client, amex, filename="fresh.csv")
+        after_all = [row["filename"] for row in client.get("/api/uploads/imports").json()]
+    
+    assert after_account == ["Cafe", "Employer", "Shop", "Transit"], after_account
+    # The emptied Visa import is dropped from the history
+    assert sorted(imports) == ["amex-jan.csv", "bank-jan.csv", "visa-jan-fixed.csv"], imports
+    visa_import = imports["visa-jan-fixed.csv"]
+    assert (visa_import["account"], visa_import["row_count"], visa_import["min_date"], visa_import["max_date"]) == \
+        ("Visa", 2, "2024-01-05", "2024-01-08"), visa_import
+    assert replaced.status_code == 200 and replaced.json()["inserted_count"] == 1, replaced.text
+    assert after_replace == after_account, after_replace
+    assert rolled_back.status_code == 200 and rolled_back.json()["data"] == {"deleted_count": 1}, rolled_back.text
+    assert after_rollback == ["Cafe", "Shop", "Transit"], after_rollback
+    assert sorted(filenames) == ["amex-jan-v2.csv", "visa-jan-fixed.csv"], filenames
+    assert missing.status_code == 404, missing.text
+    assert invalid_mode.status_code == 400, invalid_mode.text
+    assert replaced_all["inserted_count"] == 1 and after_all == ["fresh.csv"], after_all
+    print("✅ Imports are replaced and rolled back without touching other statements")
+    return True
+
+def test_columnar_round_trip():
+    """Test that Parquet and Arrow exports upload again unchanged, validated like CSV"""
+    print("\n🧱 Testing Parquet and Arrow import/export...")
+    
+    statement = [("2024-01-05", -4.5, "coffee", "Visa", "Cafe"), ("2024-01-06", 2500, "salary", "Bank", "Employer")]
+    
+    def rows(client):
+        return sorted((row["date"], row["amount"], row["description"], row["account"], row["payee"])
+                      for row in client.get("/api/transactions/").json())
+    
+    with api_client() as client:
+        upload_csv(client, statement)
+        original = rows(client)
+        parquet = client.get("/api/transactions/export/parquet")
+        if parquet.status_code == 501:
+            print("⚠️  pyarrow is not installed, skipping")
+            return True
+        arrow = client.get("/api/transactions/export/arrow")
+        
+        from_parquet = client.post("/api/uploads/parquet", files={"file": ("backup.parquet", parquet.content)}).json()
+        after_parquet = rows(client)
+        from_arrow = client.post("/api/uploads/arrow?mode=append", files={"file": ("backup.arrow", arrow.content)}).json()
+        after_arrow = rows(client)
+        
+        import pyarrow as pa
+        import pyarrow.parquet
+        # Columns missing from the file fail like a CSV without them
+        sink = pa.BufferOutputStream()
+        pa.parquet.write_table(pa.table({"date": ["2024-01-05"], "description": ["coffee"]}), sink)
+        missing_amount = client.post("/api/uploads/parquet", files={"file": ("bad.parquet", sink.getvalue().to_pybytes())})
+        wrong_extension = client.post("/api/uploads/arrow", files={"file": ("backup.csv", arrow.content)})
+    
+    assert parquet.headers["content-type"].startswith("application/vnd.apache.parquet"), parquet.headers
+    assert from_parquet["inserted_count"] == 2 and after_parquet == original, after_parquet
+    assert from_arrow["inserted_count"] == 2 and after_arrow == sorted(original * 2), after_arrow
+    assert missing_amount.status_code == 400, missing_amount.text
+    assert wrong_extension.status_code == 400, wrong_extension.text
+    print("✅ Columnar exports round-trip through the columnar uploads")
+    return True
+
+def test_snapshot_freshness():
+    """Test that analytics use the snapshot only while it is current, and that range loads slice it"""
+    print("\n🗃️  Testing the columnar snapshot...")
+    from datetime import date
+    from database import snapshot as snapshot_module
+    from database.db_manager import db
+    
+    history = [("2024-01-15", -10, "a", "Visa", "A"), ("2024-02-15", -20, "b", "Visa", "B"),
+               ("2024-03-15", -30, "c", "Visa", "C"), ("2024-04-15", 1000, "d", "Bank", "D")]
+    window = "/api/analytics/overview?start_date=2024-02-01&end_date=2024-03-31"
+    # Rebuilds are run by the test, not by the background thread
+    delay, snapshot_module.REBUILD_DELAY_SECONDS = snapshot_module.REBUILD_DELAY_SECONDS, 3600
+    try:
+        with api_client() as client:
+            upload_csv(client, history)
+            db.snapshot.rebuild()
+            fresh = db.snapshot.load(low=date(2024, 2, 1), high=date(2024, 3, 31))
+            from_snapshot = client.get(window).json()
+            
+            upload_csv(client, [("2024-03-20", -5, "e", "Visa", "E")], mode="append")
+            # A write makes the snapshot stale until it is rebuilt; SQLite answers meanwhile
+            stale = db.snapshot.load()
+            from_sqlite = client.get(window).json()
+            db.snapshot.rebuild()
+            rebuilt = db.snapshot.load(low=date(2024, 2, 1), high=date(2024, 3, 31))
+            from_rebuilt = client.get(window).json()
+    finally:
+        snapshot_module.REBUILD_DELAY_SECONDS = delay
+    
+    assert sorted(fresh["payee"]) == ["B", "C"], fresh
+    assert (from_snapshot["total_transactions"], from_snapshot["total_expenses"]) == (2, 50), from_snapshot
+    assert stale is None, stale
+    assert (from_sqlite["total_transactions"], from_sqlite["total_expenses"]) == (3, 55), from_sqlite
+    assert sorted(rebuilt["payee"]) == ["B", "C", "E"], rebuilt
+    assert from_rebuilt == from_sqlite, from_rebuilt
+    print("✅ Stale snapshots are skipped and range loads return the requested dates")
+    return True
+
+def test_search():
+    """Test that full-text search and its LIKE fallback find the same transactions"""
+    print("\n🔎 Testing transaction search...")
+    from database.db_manager import ledgers
+    
+    rows = [("2024-01-05", -4, "coffee to go", "Visa", "Cafe Central"), ("2024-01-09", -5, "espresso", "Visa", "Coffee Corner"),
+            ("2024-02-06", -30, "lunch with coffee", "Visa", "Deli"), ("2024-02-07", -3, "50% off croissant", "Visa", "Bakery"),
+            ("2024-03-01", -45, "fuel", "Visa", "Station")]
+    queries = ["coffee", "COFFEE deli", "caf", "co", "50%", "off croissant"]
+    
+    def search(client, q, **params):
+        response = client.get("/api/transactions/search", params={"q": q, **params})
+        assert response.status_code == 200, response.text
+        return response.json()
+    
+    def payees(found):
+        return [row["payee"] for row in found["results"]]
+    
+    with api_client() as client:
+        upload_csv(client, rows)
+        manager = ledgers.current()
+        fts_available = manager.fts_enabled
+        found = {q: payees(search(client, q)) for q in queries}
+        relevance = payees(search(client, "coffee", sort="relevance"))
+        filtered = payees(search(client, "coffee", start_date="2024-02-01"))
+        page = search(client, "coffee", limit=1, offset=1)
+        invalid_sort = client.get("/api/transactions/search", params={"q": "coffee", "sort": "random"})
+        
+        # Without FTS5 every term is a LIKE scan
+        manager.fts_enabled = False
+        try:
+            fallback = {q: payees(search(client, q)) for q in queries}
+        finally:
+            manager.fts_enabled = fts_available
+    
+    assert found == {
+        "coffee": ["Deli", "Coffee Corner", "Cafe Central"],
+        "COFFEE deli": ["Deli"],
+        "caf": ["Cafe Central"],
+        "co": ["Deli", "Coffee Corner", "Cafe Central"],
+        "50%": ["Bakery"],
+        "off croissant": ["Bakery"]
+    }, found
+    assert fallback == found, fallback
+    if fts_available:
+        # Payee hits weigh double
+        assert relevance[0] == "Coffee Corner", relevance
+    assert filtered == ["Deli"], filtered
+    assert page["total"] == 3 and payees(page) == ["Coffee Corner"], page
+    assert invalid_sort.status_code == 400, invalid_sort.text
+    print(f"✅ Search finds the same rows {'with FTS5 and' if fts_available else 'without FTS5, only'} with LIKE")
+    return True
+
+def months_ago(months: int, day: int):
+    """Date on a given day of the calendar month some months before this one"""
+    from datetime import date
+    today = date.today()
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    return date(year, month + 1, day)
+
+def test_recurring_payments():
+    """Test recurring series detection: periods, costs, next dates, inactive series and caching"""
+    print("\n🔁 Testing recurring payment detection...")
+    from datetime import date, timedelta
+    
+    today = date.today()
+    # Monthly on today's day of the month, so the series is active on any day the test runs
+    day = min(today.day, 28)
+    # Payee spellings differing in case and digits are one series
+    rows = [(months_ago(k, day).isoformat(), -12.99, "streaming", "Visa", "NETFLIX.COM 8472" if k % 2 else "Netflix.com 1190")
+            for k in range(1, 7)]
+    rows += [((today - timedelta(days=3 + 7 * k)).isoformat(), -9.5, "gym", "Visa", "Gym") for k in range(8)]
+    rows += [(months_ago(k, 10).isoformat(), -5, "magazine", "Visa", "Magazine") for k in range(24, 29)]
+    rows += [((today - timedelta(days=days)).isoformat(), amount, "tools", "Visa", "Hardware")
+             for days, amount in ((5, -20), (45, -80), (56, -7))]
+    
+    with api_client() as client:
+        upload_csv(client, rows)
+        active = client.get("/api/analytics/recurring").json()
+        everything = client.get("/api/analytics/recurring?include_inactive=true").json()
+        upload_csv(client, [(months_ago(0, day).isoformat(), -12.99, "streaming", "Visa", "Netflix.com 5521")], mode="append")
+        # The cached detection is dropped when transactions change
+        after_append = client.get("/api/analytics/recurring").json()
+    
+    series = {row["period"]: row for row in active["series"]}
+    assert sorted(series) == ["monthly", "weekly"], active
+    netflix, gym = series["monthly"], series["weekly"]
+    assert (netflix["occurrences"], netflix["amount"], netflix["monthly_cost"]) == (6, 12.99, 12.99), netflix
+    assert netflix["last_date"] == months_ago(1, day).isoformat(), netflix
+    assert netflix["next_expected"] == months_ago(0, day).isoformat(), netflix
+    assert (gym["payee"], gym["occurrences"], gym["monthly_cost"]) == ("Gym", 8, 41.17), gym
+    assert gym["next_expected"] == (today + timedelta(days=4)).isoformat(), gym
+    assert active["total_monthly_cost"] == 54.16, active
+    inactive = [row for row in everything["series"] if not row["active"]]
+    assert [row["payee"] for row in inactive] == ["Magazine"], everything
+    assert everything["total_monthly_cost"] == active["total_monthly_cost"], everything
+    monthly = next(row for row in after_append["series"] if row["period"] == "monthly")
+    assert monthly["occurrences"] == 7, after_append
+    print("✅ Recurring series are detected with their period, cost and next date")
+    return True
+
+def test_forecast():
+    """Test month-end projections from stored day-of-month profiles, and budget statuses"""
+    print("\n🔮 Testing the month-end forecast...")
+    from datetime import date
+    
+    today = date.today()
+    columns = CSV_COLUMNS + ("category",)
+    rows = []
+    for k in range(1, 13):
+        rows += [(months_ago(k, 1).isoformat(), -1000, "rent", "Bank", "Landlord", "Living"),
+                 (months_ago(k, 28).isoformat(), -100, "groceries", "Visa", "Market", "Groceries"),
+                 (months_ago(k, 15).isoformat(), 3000, "salary", "Bank", "Employer", "Income"),
+                 (months_ago(k, 15).isoformat(), -500, "etf", "Bank", "Broker", "Investment")]
+    rows.append((months_ago(0, 1).isoformat(), -1000, "rent", "Bank", "Landlord", "Living"))
+    
+    with api_client() as client:
+        upload_csv(client, rows, columns=columns)
+        for category, amount in (("Living", 900), ("Groceries", 200), ("Transport", 50)):
+            assert client.post("/api/analytics/budgets", json={"category": category, "amount": amount}).status_code == 200
+        forecast = client.get("/api/analytics/forecast").json()
+        # A bigger grocery month in the window shows up once the stored profiles are rebuilt
+        upload_csv(client, [(months_ago(1, 28).isoformat(), -120, "groceries", "Visa", "Market", "Groceries")],
+                   mode="append", columns=columns)
+        rebuilt = client.get("/api/analytics/forecast").json()
+    
+    by_category = {item["category"]: item for item in forecast["categories"]}
+    assert sorted(by_category) == ["Groceries", "Living", "Transport"], forecast
+    living, groceries, transport = by_category["Living"], by_category["Groceries"], by_category["Transport"]
+    assert (living["spent_to_date"], living["projected"], living["status"]) == (1000, 1000, "over"), living
+    # Groceries come on the 28th, so the usual month is still ahead until then
+    expected_groceries = 100.0 if today.day < 28 else 0.0
+    assert (groceries["typical_monthly"], groceries["projected"]) == (100, expected_groceries), groceries
+    assert groceries["status"] == "on_track" and groceries["budget_remaining"] == 200 - expected_groceries, groceries
+    assert (transport["projected"], transport["status"]) == (0, "on_track"), transport
+    assert forecast["month"] == today.strftime("%Y-%m") and forecast["total_budget"] == 1150, forecast
+    assert forecast["total_projected"] == 1000 + expected_groceries, forecast
+    rebuilt_groceries = next(item for item in rebuilt["categories"] if item["category"] == "Groceries")
+    assert rebuilt_groceries["typical_monthly"] == 110, rebuilt_groceries
+    print("✅ Forecasts combine this month's spending with the stored profiles")
+    return True
+
+def test_delta_sync():
+    """Test /changes: deltas with tombstones between syncs, and resets when the copy can't be patched"""
+    print("\n🔄 Testing delta sync...")
+    
+    def changes(client, since):
+        response = client.get(f"/api/transactions/changes?since={since}")
+        assert response.status_code == 200, response.text
+        return response.json()
+    
+    def payees(delta):
+        return sorted(row["payee"] for row in delta["transactions"])
+    
+    with api_client() as client:
+        upload_csv(client, [("2024-01-05", -4, "coffee", "Visa", "Cafe"), ("2024-01-06", -30, "lunch", "Visa", "Deli")])
+        initial = changes(client, 0)
+        ids = {row["payee"]: row["id"] for row in initial["transactions"]}
+        
+        upload_csv(client, [("2024-01-07", -60, "shoes", "Amex", "Shop")], mode="append")
+        appended = changes(client, initial["seq"])
+        unchanged = changes(client, appended["seq"])
+        
+        amex = next(row["id"] for row in client.get("/api/uploads/imports").json() if row["account"] == "Amex")
+        client.delete(f"/api/uploads/imports/{amex}")
+        rolled_back = changes(client, appended["seq"])
+        
+        upload_csv(client, [("2024-01-09", -6, "coffee", "Visa", "Cafe")], mode="replace_account")
+        replaced = changes(client, rolled_back["seq"])
+        
+        client.delete("/api/uploads/clear-data")
+        cleared = changes(client, replaced["seq"])
+        # A seq this database never handed out, e.g. a copy synced from another one
+        foreign = changes(client, cleared["seq"] + 100)
+    
+    assert initial["reset"] and payees(initial) == ["Cafe", "Deli"], initial
+    assert not appended["reset"] and payees(appended) == ["Shop"] and appended["deleted"] == [], appended
+    assert appended["seq"] > initial["seq"], appended
+    assert unchanged["seq"] == appended["seq"] and unchanged["transactions"] == [], unchanged
+    shop = appended["transactions"][0]["id"]
+    assert not rolled_back["reset"] and rolled_back["deleted"] == [shop] and rolled_back["transactions"] == [], rolled_back
+    assert not replaced["reset"] and payees(replaced) == ["Cafe"], replaced
+    assert sorted(replaced["deleted"]) == sorted(ids.values()), replaced
+    assert cleared["reset"] and cleared["transactions"] == [] and cleared["deleted"] == [], cleared
+    assert foreign["reset"], foreign
+    assert len({delta["instance_id"] for delta in (initial, appended, cleared, foreign)}) == 1
+    print("✅ Deltas carry new rows and tombstones; wiped or unknown history resets")
+    return True
+
+def test_static_assets():
+    """Test fingerprinted asset URLs, their cache headers, precompression and 304 revalidation"""
+    print("\n📦 Testing frontend assets...")
+    import re
+    from api.static_assets import IMMUTABLE_CACHE_CONTROL, INDEX_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+    
+    with open(os.path.join(project_root, "frontend", "app.js"), "rb") as f:
+        app_js = f.read()
+    with api_client() as client:
+        index = client.get("/", headers={"Accept-Encoding": "gzip"})
+        fingerprinted = re.search(r'src="(/static/app\.[0-9a-f]{12}\.js)"', index.text).group(1)
+        script = client.get(fingerprinted, headers={"Accept-Encoding": "gzip"})
+        revalidated = client.get(fingerprinted, headers={"Accept-Encoding": "gzip", "If-None-Match": script.headers["etag"]})
+        plain = client.get(fingerprinted, headers={"Accept-Encoding": "identity"})
+        unversioned = client.get("/static/app.js")
+        outdated = client.get("/static/app.000000000000.js")
+        missing = client.get("/static/missing.js")
+    
+    assert index.status_code == 200 and index.headers["cache-control"] == INDEX_CACHE_CONTROL, index.headers
+    assert 'href="/static/styles.' in index.text and 'src="/static/app.js"' not in index.text, index.text[:500]
+    assert script.status_code == 200 and script.content == app_js, script.status_code
+    assert script.headers["content-encoding"] == "gzip", script.headers
+    assert script.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL, script.headers
+    assert "Accept-Encoding" in script.headers["vary"], script.headers
+    assert revalidated.status_code == 304 and revalidated.content == b"", revalidated.status_code
+    assert plain.content == app_js and "content-encoding" not in plain.headers, plain.headers
+    # Each encoding is its own representation
+    assert plain.headers["etag"] != script.headers["etag"], plain.headers
+    assert unversioned.headers["cache-control"] == REVALIDATE_CACHE_CONTROL, unversioned.headers
+    assert outdated.status_code == 200 and outdated.headers["cache-control"] == REVALIDATE_CACHE_CONTROL, outdated.headers
+    assert missing.status_code == 404, missing.status_code
+    print("✅ Fingerprinted assets are cached for good, others revalidate")
+    return True
+
 def generate_installation_guide():
     """Generate installation guide for missing packages"""
     print("\n📚 Installation Guide:")
@@ -95,14 +913,60 @@ def main():
     # Test imports (will show missing FastAPI packages)
     imports_ok = test_api_imports()
     
+    # Test import time
+    try:
+        import_time_ok = test_import_time_budget()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        import_time_ok = False
+    
+    # Test date windows
+    try:
+        date_windows_ok = test_date_windows()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        date_windows_ok = False
+    
+    # Test duplicate detection
+    try:
+        duplicates_ok = test_duplicate_detection()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        duplicates_ok = False
+    
     # Test categories
     categories_ok = test_available_categories()
     
+    # End-to-end checks against a temporary database
+    end_to_end = [
+        ("Category Rules", test_category_rules),
+        ("Bulk Recategorization", test_bulk_recategorization),
+        ("Retroactive Mappings", test_mappings_apply_to_existing),
+        ("Import History", test_import_history),
+        ("Parquet and Arrow", test_columnar_round_trip),
+        ("Snapshot", test_snapshot_freshness),
+        ("Search", test_search),
+        ("Recurring Payments", test_recurring_payments),
+        ("Forecast", test_forecast),
+        ("Delta Sync", test_delta_sync),
+        ("Static Assets", test_static_assets),
+        ("Anomalies on Upload", test_upload_scores_anomalies),
+        ("Upload Job Resume", test_upload_job_resume_and_cancel),
+        ("Event Stream", test_event_stream),
+        ("Ledgers", test_ledgers),
+    ]
+    end_to_end_results = [(name, run_test(test)) for name, test in end_to_end]
+    
     # Summary
     print(f"\n📋 Test Summary:")
     print(f"   Database: {'✅' if db_ok else '❌'}")
     print(f"   API Modules: {'✅' if imports_ok else '❌'}")
+    print(f"   Import Time: {'✅' if import_time_ok else '❌'}")
+    print(f"   Date Windows: {'✅' if date_windows_ok else '❌'}")
+    print(f"   Duplicates: {'✅' if duplicates_ok else '❌'}")
     print(f"   Categories: {'✅' if categories_ok else '❌'}")
+    for name, ok in end_to_end_results:
+        print(f"   {name}: {'✅' if ok else '❌'}")
     
     if not imports_ok:
         generate_installation_guide()
@@ -0,0 +1,78 @@
+"""
+Spread recurring costs over the period they pay for.
+
+Rent paid on the 1st covers the whole month, an annual fee the whole year.
+amortize replaces each flagged transaction with equal slices, one per day or
+per month of its period, starting on the first of the month it was booked in.
+The slices for the whole frame come from one np.repeat over the flagged rows,
+so the cost doesn't depend on how many transactions are flagged.
+
+Which transactions are recurring, and for how many months, comes from
+amortization rules keyed by account and payee, matched case-insensitively like
+category mappings.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, Tuple
+
+from tools.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+# Slices per day ('D') or per calendar month ('M')
+AMORTIZATION_FREQUENCIES = ('D', 'M')
+
+
+def period_months(df: pd.DataFrame, rules: Iterable[Tuple[str, str, int]]) -> np.ndarray:
+    """Months each transaction pays for according to (account, payee, months) rules; 0 if none."""
+    lookup = {(account.lower(), payee.lower()): months for account, payee, months in rules}
+    if df.empty or not lookup:
+        return np.zeros(len(df), dtype=np.int64)
+    # Look up each distinct account+payee pair once instead of every row
+    account_codes, accounts = pd.factorize(df['account'].fillna(''))
+    payee_codes, payees = pd.factorize(df['payee'].fillna(''))
+    pair_codes, pairs = pd.factorize(account_codes * len(payees) + payee_codes)
+    pair_months = np.array([
+        lookup.get((accounts[pair // len(payees)].lower(), payees[pair % len(payees)].lower()), 0)
+        for pair in pairs
+    ], dtype=np.int64)
+    return pair_months[pair_codes]
+
+
+def amortize(df: pd.DataFrame, months: np.ndarray, freq: str = 'D') -> pd.DataFrame:
+    """Replace transactions with months > 0 by equal slices over their period.
+
+    Slices keep the other columns of their transaction and get the slice date
+    and amount. An `amortized` column tells slices from untouched rows. Slices
+    come after the untouched rows, so the result isn't sorted by date.
+    """
+    if freq not in AMORTIZATION_FREQUENCIES:
+        raise ValueError(f"Invalid frequency '{freq}', expected one of: {', '.join(AMORTIZATION_FREQUENCIES)}")
+    months = np.asarray(months, dtype=np.int64)
+    flagged = months > 0
+    if not flagged.any():
+        return df.assign(amortized=False)
+
+    source = df[flagged]
+    spans = months[flagged]
+    first_month = source['date'].to_numpy().astype('datetime64[M]')
+    # Slice dates in units of freq: days or months
+    first = first_month.astype(f'datetime64[{freq}]')
+    if freq == 'D':
+        lengths = ((first_month + spans).astype('datetime64[D]') - first).astype(np.int64)
+    else:
+        lengths = spans
+
+    # Row i of source becomes lengths[i] slices numbered 0..lengths[i]-1
+    rows = np.repeat(np.arange(len(source)), lengths)
+    step = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    dates = first[rows] + step.astype(f'timedelta64[{freq}]')
+
+    slices = source.iloc[rows].assign(
+        date=dates.astype('datetime64[D]').astype(df['date'].dtype),
+        amount=(source['amount'].to_numpy() / lengths)[rows],
+        amortized=True
+    )
+    return pd.concat([df[~flagged].assign(amortized=False), slices], ignore_index=True)
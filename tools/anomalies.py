@@ -0,0 +1,163 @@
+"""
+Unusually large expenses, scored against what a payee or category normally costs.
+
+Each expense is compared with the expenses of the same (normalized) payee and
+of the same category over the BASELINE_WINDOW before it. Amounts are compared
+on a log scale, since spending is skewed, with the median as the typical value
+and the interquartile range as a robust spread. The score is a robust z-score,
+(log amount - median) / spread, against the payee's baseline if it has enough
+history and the category's otherwise.
+
+Scoring the history uses grouped time-based rolling windows, so every row gets
+the baseline of its own past in one vectorized pass. The baselines as of the
+newest rows are kept as well; new rows are scored against those, and only the
+baselines of the payees and categories they touch are recomputed.
+"""
+from __future__ import annotations
+
+from tools.duplicates import normalize_texts
+from tools.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+# Trailing period each expense is compared against
+BASELINE_WINDOW = '365D'
+
+# Baselines with fewer expenses than this don't score; small samples give
+# unstable quartiles and flag far too much
+MIN_SAMPLES = 10
+
+# Smallest spread on the log scale (about 10%), so fixed-price series don't
+# flag every cent of difference
+MIN_SPREAD = 0.1
+
+# IQR of a normal distribution in standard deviations
+_IQR_TO_SIGMA = 1.349
+
+DEFAULT_THRESHOLD = 3.5
+
+# Lowest score worth storing; requests can't ask for a lower threshold
+MIN_STORED_SCORE = 2.0
+
+# (baseline kind, column of the prepared frame it groups by), most specific first
+BASELINE_KINDS = (('payee', 'payee_key'), ('category', 'category'))
+
+BASELINE_COLUMNS = ['kind', 'key', 'median', 'spread', 'samples']
+SCORE_COLUMNS = ['id', 'score', 'baseline', 'expected']
+
+
+def prepare_expenses(df: pd.DataFrame) -> pd.DataFrame:
+    """Expenses with the columns scoring needs: id, date, log_amount, payee_key, category."""
+    expenses = df[(df['amount'] < 0) & df['date'].notna()]
+    codes, payees = pd.factorize(expenses['payee'].fillna(''))
+    payee_keys = normalize_texts(pd.Series(payees, dtype=str)).to_numpy()
+    return pd.DataFrame({
+        'id': expenses['id'].to_numpy(),
+        'date': expenses['date'].to_numpy(),
+        'log_amount': np.log1p(-expenses['amount'].to_numpy(dtype=np.float64)),
+        'payee_key': payee_keys[codes] if len(codes) else np.array([], dtype=object),
+        'category': expenses['category'].fillna('Other').to_numpy(),
+    })
+
+
+def _robust_z(log_amount, median, spread, samples) -> np.ndarray:
+    spread = np.maximum(np.asarray(spread, dtype=np.float64), MIN_SPREAD)
+    z = (np.asarray(log_amount) - np.asarray(median, dtype=np.float64)) / spread
+    return np.where(np.asarray(samples) >= MIN_SAMPLES, z, np.nan)
+
+
+def _most_specific(expenses: pd.DataFrame, per_kind) -> pd.DataFrame:
+    """Per row, the score of the first baseline in BASELINE_KINDS order that could score it.
+
+    Rows no baseline could score are dropped.
+    """
+    z = np.column_stack([z for z, _ in per_kind])
+    # Stored baselines read back empty for a kind come as object columns
+    medians = np.column_stack([np.asarray(median, dtype=np.float64) for _, median in per_kind])
+    scored = ~np.isnan(z)
+    scorable = scored.any(axis=1)
+    z, medians = z[scorable], medians[scorable]
+    best = scored[scorable].argmax(axis=1)
+    rows = np.arange(len(z))
+    kinds = np.array([kind for kind, _ in BASELINE_KINDS], dtype=object)
+    return pd.DataFrame({
+        'id': expenses['id'].to_numpy()[scorable],
+        'score': z[rows, best].round(2),
+        'baseline': kinds[best],
+        'expected': np.expm1(medians[rows, best]).round(2),
+    })
+
+
+def score_history(expenses: pd.DataFrame) -> pd.DataFrame:
+    """Score every expense against its payee and category over the window before it."""
+    if expenses.empty:
+        return pd.DataFrame(columns=SCORE_COLUMNS)
+    per_kind = []
+    for _, column in BASELINE_KINDS:
+        ordered = expenses.sort_values([column, 'date'], kind='stable')
+        # closed='left': the window ends just before the row's own day
+        rolling = ordered.groupby(column, sort=False).rolling(
+            BASELINE_WINDOW, on='date', closed='left'
+        )['log_amount']
+        stats = pd.DataFrame({
+            'median': rolling.median().to_numpy(),
+            'q1': rolling.quantile(0.25).to_numpy(),
+            'q3': rolling.quantile(0.75).to_numpy(),
+            'samples': rolling.count().to_numpy(),
+        }, index=ordered.index).reindex(expenses.index)
+        per_kind.append((
+            _robust_z(expenses['log_amount'], stats['median'],
+                      (stats['q3'] - stats['q1']) / _IQR_TO_SIGMA, stats['samples'].fillna(0)),
+            stats['median'].to_numpy()
+        ))
+    return _most_specific(expenses, per_kind)
+
+
+def current_baselines(expenses: pd.DataFrame, kinds=BASELINE_KINDS) -> pd.DataFrame:
+    """Baseline of each payee and category over the window ending with its newest expense."""
+    frames = []
+    for kind, column in kinds:
+        newest = expenses.groupby(column)['date'].transform('max')
+        recent = expenses[expenses['date'] > newest - pd.Timedelta(BASELINE_WINDOW)]
+        if recent.empty:
+            continue
+        grouped = recent.groupby(column)['log_amount']
+        stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+        frames.append(pd.DataFrame({
+            'kind': kind,
+            'key': stats.index.to_numpy(),
+            'median': stats[0.5].to_numpy(),
+            'spread': ((stats[0.75] - stats[0.25]) / _IQR_TO_SIGMA).to_numpy(),
+            'samples': grouped.count().reindex(stats.index).to_numpy(),
+        }))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=BASELINE_COLUMNS)
+
+
+def score_new(expenses: pd.DataFrame, baselines: pd.DataFrame) -> pd.DataFrame:
+    """Score expenses against stored baselines (BASELINE_COLUMNS) instead of their own past."""
+    if expenses.empty:
+        return pd.DataFrame(columns=SCORE_COLUMNS)
+    per_kind = []
+    for kind, column in BASELINE_KINDS:
+        stats = baselines[baselines['kind'] == kind].set_index('key')
+        matched = stats.reindex(expenses[column].to_numpy())
+        per_kind.append((
+            _robust_z(expenses['log_amount'], matched['median'], matched['spread'],
+                      matched['samples'].fillna(0)),
+            matched['median'].to_numpy()
+        ))
+    return _most_specific(expenses, per_kind)
+
+
+def refresh_baselines(expenses: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Baselines of the payees and categories of new, from expenses that include new.
+
+    expenses needs to reach back BASELINE_WINDOW before the oldest new row.
+    """
+    frames = []
+    for kind, column in BASELINE_KINDS:
+        touched = expenses[expenses[column].isin(set(new[column]))]
+        frames.append(current_baselines(touched, kinds=((kind, column),)))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,50 @@
+"""
+Date windows for analytics and transaction reads.
+
+Requests either give explicit start/end dates or a number of calendar months.
+A month window always covers whole months, ending with the current one, so
+"3 months" in March means January 1st to March 31st regardless of month
+lengths. Both bounds are inclusive, matching SQL BETWEEN on the date column.
+"""
+import calendar
+from datetime import date
+from typing import NamedTuple, Optional
+
+
+class DateRange(NamedTuple):
+    """Inclusive date bounds; None leaves that side open."""
+    start: Optional[date] = None
+    end: Optional[date] = None
+
+    @property
+    def is_bounded(self) -> bool:
+        return self.start is not None or self.end is not None
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    """First day of the month offset months after (or before, if negative) day's month."""
+    month_index = day.year * 12 + day.month - 1 + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def month_window(months: int, today: Optional[date] = None) -> DateRange:
+    """First day of the month months-1 before today's month through the end of today's month."""
+    if months < 1:
+        raise ValueError("months must be at least 1")
+    today = today or date.today()
+    start = month_start(today, -(months - 1))
+    end = date(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
+    return DateRange(start, end)
+
+
+def resolve_date_range(start: Optional[date] = None, end: Optional[date] = None,
+                       months: Optional[int] = None, today: Optional[date] = None) -> DateRange:
+    """Pick the window of a request: explicit dates win over a month count.
+
+    Raises ValueError if start is after end.
+    """
+    if start is None and end is None:
+        return month_window(months, today) if months is not None else DateRange()
+    if start is not None and end is not None and start > end:
+        raise ValueError(f"start ({start}) must not be after end ({end})")
+    return DateRange(start, end)
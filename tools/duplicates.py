@@ -0,0 +1,171 @@
+"""
+Near-duplicate transactions.
+
+Overlapping statement exports import the same rows twice, and a pending card
+charge often shows up again when it posts, a day or two later and with a
+slightly different description. Neither is an exact copy, so candidates are
+pairs in the same account with the same amount booked at most window_days
+apart.
+
+Rows are sorted by (account, amount, date), which puts every candidate pair
+close together. Comparing each row with the next one, then the one after that
+and so on finds all pairs in a sliding window; a row drops out as soon as its
+k-th neighbour is out of reach, so the work grows with the number of
+candidates, not with N².
+
+Candidates are scored by how alike their payee and description are and how
+close their dates are. Text similarity is the share of the shorter text's
+trigrams found in the other one, ignoring digits and punctuation, which differ
+between pending and posted versions; banks often append to the pending text,
+so "Amazon" fully matches "Amazon Marketplace".
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, FrozenSet, Iterable, Set, Tuple
+
+from tools.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+DEFAULT_WINDOW_DAYS = 3
+DEFAULT_MIN_SCORE = 0.6
+
+# Share of the score from text similarity; the rest comes from date proximity
+TEXT_WEIGHT = 0.7
+
+_NOISE = re.compile(r"[\d\W_]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text with digits and punctuation removed, e.g. for matching payee variants."""
+    return " ".join(_NOISE.sub(" ", text.lower()).split())
+
+
+def normalize_texts(values: pd.Series) -> pd.Series:
+    """normalize_text for a whole column in one vectorized pass."""
+    return (values.fillna('').astype(str).str.lower()
+            .str.replace(_NOISE.pattern, " ", regex=True).str.strip())
+
+
+def _trigrams(normalized: str) -> FrozenSet[str]:
+    if len(normalized) < 3:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + 3] for i in range(len(normalized) - 2))
+
+
+def text_similarity(a: str, b: str) -> float:
+    """Share of the trigrams of the shorter text found in the longer one, 0..1.
+
+    Two empty texts count as equal, an empty and a non-empty one as unrelated.
+    """
+    return _overlap(_trigrams(normalize_text(a)), _trigrams(normalize_text(b)))
+
+
+def _overlap(grams_a: FrozenSet[str], grams_b: FrozenSet[str]) -> float:
+    if not grams_a or not grams_b:
+        return 0.0 if grams_a or grams_b else 1.0
+    return len(grams_a & grams_b) / min(len(grams_a), len(grams_b))
+
+
+def candidate_pairs(df: pd.DataFrame, window_days: int = DEFAULT_WINDOW_DAYS) -> Tuple[np.ndarray, np.ndarray]:
+    """Row positions (first, second) of rows with equal account and amount at most window_days apart.
+
+    first is always the row with the lower id, so it is the one imported earlier.
+    """
+    if window_days < 0:
+        raise ValueError("window_days must not be negative")
+    if len(df) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    account = pd.factorize(df['account'].fillna(''))[0]
+    cents = np.rint(df['amount'].to_numpy(dtype=np.float64) * 100).astype(np.int64)
+    day = df['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    order = np.lexsort((day, cents, account))
+    account, cents, day = account[order], cents[order], day[order]
+
+    # Rows whose k-th neighbour in sort order is still a candidate; if it isn't,
+    # no later neighbour can be, because dates only grow within a key
+    active = np.arange(len(order) - 1)
+    firsts, seconds = [], []
+    k = 1
+    while len(active):
+        other = active + k
+        match = (
+            (account[active] == account[other])
+            & (cents[active] == cents[other])
+            & (day[other] - day[active] <= window_days)
+        )
+        active = active[match]
+        firsts.append(order[active])
+        seconds.append(order[active + k])
+        k += 1
+        active = active[active + k < len(order)]
+
+    first = np.concatenate(firsts)
+    second = np.concatenate(seconds)
+    ids = df['id'].to_numpy()
+    swap = ids[first] > ids[second]
+    first[swap], second[swap] = second[swap], first[swap]
+    return first, second
+
+
+def _pair_similarity(left: pd.Series, right: pd.Series) -> np.ndarray:
+    """text_similarity of left[i] and right[i], computed once per distinct pair of texts."""
+    codes, uniques = pd.factorize(pd.concat([left, right], ignore_index=True).fillna(''))
+    texts = normalize_texts(pd.Series(uniques, dtype=str)).tolist()
+    left_codes, right_codes = codes[:len(left)], codes[len(left):]
+    pair_codes, pairs = pd.factorize(left_codes.astype(np.int64) * len(texts) + right_codes)
+    grams: Dict[int, FrozenSet[str]] = {}
+    similarity = np.empty(len(pairs), dtype=np.float64)
+    for index, pair in enumerate(pairs):
+        a, b = divmod(int(pair), len(texts))
+        if a == b or texts[a] == texts[b]:
+            similarity[index] = 1.0
+            continue
+        if a not in grams:
+            grams[a] = _trigrams(texts[a])
+        if b not in grams:
+            grams[b] = _trigrams(texts[b])
+        similarity[index] = _overlap(grams[a], grams[b])
+    return similarity[pair_codes]
+
+
+def find_duplicates(df: pd.DataFrame, window_days: int = DEFAULT_WINDOW_DAYS,
+                    min_score: float = DEFAULT_MIN_SCORE,
+                    dismissed: Iterable[Tuple[int, int]] = ()) -> pd.DataFrame:
+    """Scored duplicate candidates among transactions, best first.
+
+    Returns one row per pair with the row positions first/second (first imported
+    earlier), days_apart and score, where score is TEXT_WEIGHT times the better
+    of payee and description similarity plus the rest for closeness in time
+    (1 on the same day, falling to 0 just past window_days). Pairs of ids in
+    dismissed are left out.
+    """
+    first, second = candidate_pairs(df, window_days)
+    ids = df['id'].to_numpy()
+    dismissed_pairs: Set[Tuple[int, int]] = {(min(a, b), max(a, b)) for a, b in dismissed}
+    if dismissed_pairs and len(first):
+        keep = np.array([
+            (int(a), int(b)) not in dismissed_pairs for a, b in zip(ids[first], ids[second])
+        ], dtype=bool)
+        first, second = first[keep], second[keep]
+
+    day = df['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    days_apart = np.abs(day[second] - day[first])
+    text = _pair_similarity(df['payee'].iloc[first], df['payee'].iloc[second])
+    # Descriptions only matter where the payees aren't already equal
+    unsure = np.flatnonzero(text < 1)
+    text[unsure] = np.maximum(text[unsure], _pair_similarity(
+        df['description'].iloc[first[unsure]], df['description'].iloc[second[unsure]]
+    ))
+    score = TEXT_WEIGHT * text + (1 - TEXT_WEIGHT) * (1 - days_apart / (window_days + 1))
+
+    pairs = pd.DataFrame({
+        'first': first, 'second': second, 'days_apart': days_apart, 'score': score.round(3)
+    })
+    pairs = pairs[pairs['score'] >= min_score]
+    return pairs.sort_values(['score', 'days_apart'], ascending=[False, True], kind='stable',
+                             ignore_index=True)
@@ -0,0 +1,130 @@
+"""
+Month-end spending forecast per category.
+
+A spending profile says how a category's spending is spread over the month:
+shares[d - 1] is the part of a month's spending that is usually spent by day
+d (rent is all spent on day 1, groceries build up evenly). Profiles come from
+the last PROFILE_MONTHS full months, weighted by spending, in one groupby over
+(category, day of month).
+
+The forecast adds what is still to come to what was spent so far:
+
+    projected = spent_to_date + (1 - shares[today - 1]) * typical_monthly
+
+so early in the month it leans on the typical month and late in the month on
+the actual spending, and a category that already exceeded its usual month
+still gets the rest of its usual spending on top.
+"""
+from __future__ import annotations
+
+import calendar
+from datetime import date
+from typing import Dict, List, Optional
+
+from tools.date_ranges import month_start
+from tools.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+# Full months before the current one that profiles are built from
+PROFILE_MONTHS = 12
+
+# Categories that aren't spending
+EXCLUDED_CATEGORIES = ('Income', 'Investment')
+
+# Share of a budget from which a projection counts as at risk
+AT_RISK_SHARE = 0.9
+
+
+def profile_window(today: Optional[date] = None) -> tuple:
+    """First and last day of the PROFILE_MONTHS full months before today's month."""
+    current = month_start(today or date.today())
+    first = month_start(current, -PROFILE_MONTHS)
+    return first, date.fromordinal(current.toordinal() - 1)
+
+
+def spending_profiles(df: pd.DataFrame, months: int = PROFILE_MONTHS,
+                      end: Optional[date] = None) -> List[Dict]:
+    """Profiles of the transactions in df, a window of `months` full months ending on `end`.
+
+    Returns one dict per category with typical_monthly (mean spending per
+    month, counting months without spending), months and shares (31 cumulative
+    shares by day of month, the last one 1.0). A ledger with less history than
+    the window is averaged over the months from its first transaction on.
+    """
+    expenses = df[(df['amount'] < 0) & ~df['category'].isin(EXCLUDED_CATEGORIES) & df['date'].notna()]
+    if expenses.empty:
+        return []
+    first = df['date'].min()
+    last = pd.Timestamp(end) if end is not None else df['date'].max()
+    months = max(1, min(months, (last.year - first.year) * 12 + last.month - first.month + 1))
+    by_day = (
+        (-expenses['amount']).groupby([expenses['category'], expenses['date'].dt.day]).sum()
+        .unstack(fill_value=0.0)
+        .reindex(columns=range(1, 32), fill_value=0.0)
+    )
+    cumulative = by_day.to_numpy().cumsum(axis=1)
+    totals = cumulative[:, -1]
+    shares = cumulative / np.where(totals > 0, totals, 1.0)[:, None]
+    return [
+        {
+            "category": category,
+            "typical_monthly": round(float(total) / months, 2),
+            "months": months,
+            "shares": [round(float(share), 4) for share in row],
+        }
+        for category, total, row in zip(by_day.index, totals, shares)
+        if total > 0
+    ]
+
+
+def forecast_month(spent_to_date: Dict[str, float], profiles: List[Dict],
+                   budgets: Dict[str, float], today: Optional[date] = None) -> Dict:
+    """Project month-end spending per category from this month's spending so far.
+
+    Every category with a profile, spending this month or a budget is listed.
+    Costs O(categories); the history is only read when profiles are built.
+    """
+    today = today or date.today()
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    by_category = {profile["category"]: profile for profile in profiles}
+
+    categories = []
+    for category in sorted(set(by_category) | set(spent_to_date) | set(budgets)):
+        spent = round(spent_to_date.get(category, 0.0), 2)
+        profile = by_category.get(category)
+        typical = profile["typical_monthly"] if profile else 0.0
+        # In short months the last days' share comes due on the last day
+        share = profile["shares"][today.day - 1] if profile and today.day < days_in_month else 1.0
+        projected = round(spent + (1 - share) * typical, 2)
+        budget = budgets.get(category)
+        if budget is None:
+            status = None
+        elif spent > budget:
+            status = "over"
+        elif projected > AT_RISK_SHARE * budget:
+            status = "at_risk"
+        else:
+            status = "on_track"
+        categories.append({
+            "category": category,
+            "spent_to_date": spent,
+            "projected": projected,
+            "typical_monthly": typical,
+            "budget": budget,
+            "budget_remaining": round(budget - projected, 2) if budget is not None else None,
+            "status": status,
+        })
+    categories.sort(key=lambda item: item["projected"], reverse=True)
+
+    return {
+        "month": today.strftime('%Y-%m'),
+        "as_of": today.isoformat(),
+        "days_in_month": days_in_month,
+        "categories": categories,
+        "total_spent_to_date": round(sum(item["spent_to_date"] for item in categories), 2),
+        "total_projected": round(sum(item["projected"] for item in categories), 2),
+        "total_budget": round(sum(budgets.values()), 2) if budgets else None,
+    }
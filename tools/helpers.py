@@ -21,23 +21,20 @@ def get_days_in_month(date):
     return calendar.monthrange(date.year, date.month)[1]
 
 def create_daily_transactions(row, days_in_month):
-    """Create daily transactions for a given monthly transaction"""
-    daily_amount = row['_amount'] / days_in_month
-    month_start = row['_date'].replace(day=1)
+    """Create daily transactions for a given monthly transaction
     
-    # Create a date range for all days in the month
-    date_range = pd.date_range(start=month_start, periods=days_in_month, freq='D')
+    For whole tables use tools.amortization.amortize, which spreads every
+    flagged transaction at once.
+    """
+    month_start = row['_date'].replace(day=1)
     
-    # Create a list of daily transactions
-    daily_transactions = []
-    for date in date_range:
-        daily_row = row.copy()
-        daily_row['_date'] = date
-        daily_row['_amount'] = daily_amount
-        daily_row['_is_daily_mrr'] = True
-        daily_transactions.append(daily_row)
+    # One row per day of the month, built column-wise instead of copying the row per day
+    daily_transactions = pd.DataFrame([row.to_dict()] * days_in_month)
+    daily_transactions['_date'] = pd.date_range(start=month_start, periods=days_in_month, freq='D')
+    daily_transactions['_amount'] = row['_amount'] / days_in_month
+    daily_transactions['_is_daily_mrr'] = True
     
-    return pd.DataFrame(daily_transactions)
+    return daily_transactions
 
 def load_config(config_path):
     """Load configuration from a YAML file"""
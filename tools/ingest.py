@@ -0,0 +1,391 @@
+"""
+Transaction ingestion helpers shared by the synchronous upload endpoints,
+background upload jobs and exports.
+
+CSV exports differ by bank and country: German banks write `1.234,56` with
+`;` as separator and `31.12.2024` dates. An ingest profile describes such a
+format, and whole columns are converted with vectorized string operations and
+one explicit date format instead of per-value parsing or format inference.
+
+detect_profile works the profile out from the first few KB of a file:
+encoding, delimiter, which headers hold date/amount/description, and the
+number and date formats of the sample rows. Profiles are cached per header
+signature, so files from a known bank skip detection.
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import hashlib
+import io
+import re
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from tools.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+
+REQUIRED_COLUMNS = ['date', 'amount', 'description']
+OPTIONAL_COLUMNS = ['account', 'payee', 'category']
+
+
+class IngestProfile(NamedTuple):
+    """How a CSV export writes its fields."""
+    delimiter: str = ','
+    decimal: str = '.'
+    thousands: str = ''
+    # strftime format of the date column; None infers it from the first value
+    date_format: Optional[str] = None
+    encoding: str = 'utf-8'
+    # File header -> transaction column, for exports that don't use our names
+    columns: Optional[Dict[str, str]] = None
+
+
+# Built-in profiles by locale
+INGEST_PROFILES = {
+    'default': IngestProfile(),
+    'de': IngestProfile(delimiter=';', decimal=',', thousands='.', date_format='%d.%m.%Y'),
+    'at': IngestProfile(delimiter=';', decimal=',', thousands='.', date_format='%d.%m.%Y'),
+    'ch': IngestProfile(delimiter=';', decimal='.', thousands="'", date_format='%d.%m.%Y'),
+    'fr': IngestProfile(delimiter=';', decimal=',', thousands=' ', date_format='%d/%m/%Y'),
+    'es': IngestProfile(delimiter=';', decimal=',', thousands='.', date_format='%d/%m/%Y'),
+    'it': IngestProfile(delimiter=';', decimal=',', thousands='.', date_format='%d/%m/%Y'),
+    'nl': IngestProfile(delimiter=';', decimal=',', thousands='.', date_format='%d-%m-%Y'),
+    'uk': IngestProfile(delimiter=',', decimal='.', thousands=',', date_format='%d/%m/%Y'),
+    'us': IngestProfile(delimiter=',', decimal='.', thousands=',', date_format='%m/%d/%Y'),
+}
+
+# Bytes of a file looked at by detect_profile
+DETECTION_SAMPLE_BYTES = 16 * 1024
+
+# Header names used by bank exports, lowercased, per transaction column
+HEADER_SYNONYMS = {
+    'date': ['date', 'datum', 'buchungstag', 'buchungsdatum', 'booking date', 'transaction date',
+             'posted date', 'date operation', 'date opération', 'fecha', 'fecha operación',
+             'data', 'data operazione', 'transactiedatum', 'valutadatum', 'valuta', 'wertstellung'],
+    'amount': ['amount', 'betrag', 'betrag (eur)', 'betrag (€)', 'umsatz', 'montant', 'montant (eur)',
+               'importe', 'importo', 'bedrag', 'bedrag (eur)', 'value'],
+    'description': ['description', 'verwendungszweck', 'buchungstext', 'beschreibung', 'memo',
+                    'details', 'reference', 'libellé', 'libelle', 'concepto', 'descrizione',
+                    'omschrijving', 'mededelingen'],
+    'payee': ['payee', 'empfänger', 'zahlungsempfänger', 'auftraggeber/empfänger',
+              'beguenstigter/zahlungspflichtiger', 'name', 'counterparty', 'merchant',
+              'bénéficiaire', 'beneficiario', 'naam / omschrijving', 'tegenpartij'],
+    'account': ['account', 'konto', 'auftragskonto', 'iban', 'compte', 'cuenta', 'conto', 'rekening'],
+    'category': ['category', 'kategorie', 'catégorie', 'categoría', 'categoria', 'categorie'],
+}
+
+# Tried in order; day-first before month-first for ambiguous samples
+DATE_FORMATS = [
+    '%Y-%m-%d', '%d.%m.%Y', '%d.%m.%y', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y',
+    '%Y/%m/%d', '%d/%m/%y', '%m/%d/%y', '%Y%m%d',
+]
+
+_DELIMITERS = ';,\t|'
+
+# Characters dropped from amounts besides the thousands separator: currency
+# symbols and spaces, including the non-breaking ones French exports use
+_AMOUNT_NOISE = " \t\u00a0\u202f€$£"
+
+
+def resolve_profile(name: str = 'default', **overrides) -> IngestProfile:
+    """Built-in profile by name with individual fields replaced; None overrides are ignored.
+
+    Raises ValueError for unknown names and inconsistent settings.
+    """
+    if name not in INGEST_PROFILES:
+        raise ValueError(f"Unknown ingest profile '{name}', expected one of: {', '.join(INGEST_PROFILES)}")
+    profile = INGEST_PROFILES[name]._replace(
+        **{field: value for field, value in overrides.items() if value is not None}
+    )
+    validate_profile(profile)
+    return profile
+
+
+def validate_profile(profile: IngestProfile):
+    """Raise ValueError if a profile can't be used to parse a file."""
+    if len(profile.delimiter) != 1:
+        raise ValueError("Delimiter must be a single character")
+    if profile.decimal not in ('.', ','):
+        raise ValueError("Decimal separator must be '.' or ','")
+    if len(profile.thousands) > 1 or profile.thousands == profile.decimal:
+        raise ValueError("Thousands separator must be a single character other than the decimal separator")
+    try:
+        codecs.lookup(profile.encoding)
+    except LookupError:
+        raise ValueError(f"Unknown encoding '{profile.encoding}'")
+
+
+def read_csv(source, profile: IngestProfile = INGEST_PROFILES['default'], **kwargs) -> pd.DataFrame:
+    """Read a CSV path or file-like object with the profile's separator and encoding.
+
+    Amounts and dates stay text here; prepare_transactions converts them.
+    """
+    encoding = profile.encoding
+    if codecs.lookup(encoding).name == 'utf-8':
+        # Excel writes a byte order mark that would end up in the first header
+        encoding = 'utf-8-sig'
+    # Without this pandas guesses a type per chunk and parses "1.234" as 1.234
+    amount_headers = ['amount'] + [header for header, column in (profile.columns or {}).items()
+                                   if column == 'amount']
+    kwargs.setdefault('dtype', {header: str for header in amount_headers})
+    return pd.read_csv(source, sep=profile.delimiter, encoding=encoding, **kwargs)
+
+
+def header_signature(sample: bytes) -> str:
+    """Fingerprint of a file's header line, identifying the bank export it came from."""
+    header = sample.split(b'\n', 1)[0].strip(b'\r').removeprefix(codecs.BOM_UTF8)
+    return hashlib.sha1(header).hexdigest()
+
+
+def _decode_sample(sample: bytes) -> Tuple[str, str]:
+    """Decode the start of a file, returning (text, encoding)."""
+    if sample.startswith(codecs.BOM_UTF8):
+        sample = sample[len(codecs.BOM_UTF8):]
+    try:
+        # The sample may end in the middle of a character
+        return codecs.getincrementaldecoder('utf-8')().decode(sample, final=False), 'utf-8'
+    except UnicodeDecodeError:
+        # Windows exports; every byte decodes, so this can't fail
+        return sample.decode('cp1252', errors='replace'), 'cp1252'
+
+
+def _detect_delimiter(lines: List[str]) -> str:
+    try:
+        return csv.Sniffer().sniff("\n".join(lines), delimiters=_DELIMITERS).delimiter
+    except csv.Error:
+        # The candidate splitting the header into the most fields
+        return max(_DELIMITERS, key=lambda delimiter: lines[0].count(delimiter))
+
+
+def _map_columns(headers: List[str]) -> Dict[str, str]:
+    """File header -> transaction column; earlier synonyms win, e.g. Verwendungszweck over Buchungstext."""
+    normalized = {header.strip().lower(): header for header in reversed(headers)}
+    mapping = {}
+    for target, synonyms in HEADER_SYNONYMS.items():
+        for synonym in synonyms:
+            header = normalized.get(synonym)
+            if header is not None and header not in mapping:
+                mapping[header] = target
+                break
+    return mapping
+
+
+def _detect_number_format(values: List[str]) -> Tuple[str, str]:
+    """(decimal, thousands) of sample amounts."""
+    values = [re.sub(f"[{re.escape(_AMOUNT_NOISE)}]", "", value) for value in values if value.strip()]
+    if any(re.search(r",\d{1,2}-?$", value) for value in values):
+        # Later rows may have thousands the sample didn't; '.' is the usual one with a decimal comma
+        return ',', '.'
+    if any(re.search(r",\d{3}", value) for value in values):
+        return '.', ','
+    return '.', ''
+
+
+def _detect_date_format(values: List[str]) -> Optional[str]:
+    """First format that parses every sample date, None to let pandas infer."""
+    values = [value.strip() for value in values if value.strip()]
+    if not values:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            for value in values:
+                datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        return date_format
+    return None
+
+
+def detect_profile(sample: bytes) -> IngestProfile:
+    """Work out the ingest profile of a CSV from its first few KB.
+
+    Raises ValueError if the sample doesn't look like a CSV with a header.
+    """
+    text, encoding = _decode_sample(sample[:DETECTION_SAMPLE_BYTES])
+    lines = text.splitlines()
+    if len(sample) > DETECTION_SAMPLE_BYTES or not text.endswith(('\n', '\r')):
+        # The last line is probably cut off
+        lines = lines[:-1] or lines
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        raise ValueError("File is empty")
+
+    delimiter = _detect_delimiter(lines)
+    rows = list(csv.reader(io.StringIO("\n".join(lines)), delimiter=delimiter))
+    headers, records = rows[0], rows[1:]
+    mapping = _map_columns(headers)
+
+    def sample_values(target: str) -> List[str]:
+        header = next((header for header, mapped in mapping.items() if mapped == target), None)
+        if header is None:
+            return []
+        index = headers.index(header)
+        return [record[index] for record in records if index < len(record)]
+
+    decimal, thousands = _detect_number_format(sample_values('amount'))
+    if decimal == delimiter:
+        decimal, thousands = '.', ''
+    return IngestProfile(
+        delimiter=delimiter,
+        decimal=decimal,
+        thousands=thousands,
+        date_format=_detect_date_format(sample_values('date')),
+        encoding=encoding,
+        # Only renames are stored; headers already named like our columns map to themselves
+        columns={header: target for header, target in mapping.items() if header != target} or None
+    )
+
+
+def parse_amounts(values: pd.Series, decimal: str = '.', thousands: str = '') -> pd.Series:
+    """Convert a column of formatted amounts to floats; unparseable values become NaN.
+
+    Handles thousands separators, a decimal comma, currency symbols and the
+    trailing minus some banks write ("12,50-").
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    text = values.astype(str).str.replace(f"[{re.escape(_AMOUNT_NOISE + thousands)}]", "", regex=True)
+    if decimal != '.':
+        text = text.str.replace(decimal, '.', regex=False)
+    trailing_minus = text.str.endswith('-')
+    if trailing_minus.any():
+        text = text.where(~trailing_minus, '-' + text.str[:-1])
+    pa = _optional_pyarrow()
+    if pa is not None:
+        try:
+            # Several times faster than to_numeric; any bad value falls through to it
+            return pd.Series(pa.compute.cast(pa.array(text), pa.float64()).to_numpy(), index=values.index)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    return pd.to_numeric(text, errors='coerce')
+
+
+def parse_dates(values: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    """Convert a date column with one explicit format; unparseable values become NaT."""
+    if date_format is None:
+        return pd.to_datetime(values, errors='coerce')
+    text = values.astype(str).str.strip()
+    pa = _optional_pyarrow()
+    if pa is not None:
+        try:
+            # pandas runs strptime value by value for non-ISO formats; Arrow does the column at once
+            parsed = pa.compute.strptime(pa.array(text), format=date_format, unit='us', error_is_null=True)
+            return pd.Series(parsed.to_numpy(zero_copy_only=False), index=values.index)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    return pd.to_datetime(text, format=date_format, errors='coerce')
+
+
+def prepare_transactions(df: pd.DataFrame,
+                         profile: IngestProfile = INGEST_PROFILES['default']) -> Tuple[pd.DataFrame, bool]:
+    """Validate and normalize an uploaded transactions frame.
+
+    Text amounts and dates are parsed according to the profile. Returns the
+    cleaned frame and whether it carried a meaningful category column.
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    if profile.columns:
+        df = df.rename(columns=profile.columns)
+
+    # Validate required columns
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    # Check for optional columns
+    df = df.copy()
+    for col in OPTIONAL_COLUMNS:
+        if col not in df.columns:
+            df[col] = ''
+
+    # Detect if category column has meaningful data
+    has_category_column = not df['category'].isin(['', 'Other', None]).all()
+
+    # Process dates
+    df['date'] = parse_dates(df['date'], profile.date_format)
+    if df['date'].isna().any():
+        expected = f" (expected {profile.date_format})" if profile.date_format else ""
+        raise ValueError(f"Error parsing dates: Invalid date format{expected}")
+
+    # Process amounts
+    df['amount'] = parse_amounts(df['amount'], profile.decimal, profile.thousands)
+    if df['amount'].isna().any():
+        raise ValueError("Error parsing amounts: Invalid amount format")
+
+    # Clean text fields
+    df['description'] = df['description'].astype(str).fillna('')
+    df['account'] = df['account'].astype(str).fillna('')
+    df['payee'] = df['payee'].astype(str).fillna('')
+
+    # Handle category column
+    if has_category_column:
+        df['category'] = df['category'].astype(str).fillna('Other')
+        # Replace empty strings with 'Other'
+        df.loc[df['category'] == '', 'category'] = 'Other'
+    else:
+        df['category'] = 'Other'
+
+    return df, has_category_column
+
+
+# Columnar formats handled by read_columnar/write_columnar
+COLUMNAR_FORMATS = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+
+def _optional_pyarrow():
+    """pyarrow with its compute module if installed, else None."""
+    try:
+        import pyarrow
+        import pyarrow.compute
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _import_pyarrow():
+    """Import pyarrow, which is only needed for Parquet/Arrow support."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet/Arrow support requires pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def read_columnar(contents: bytes, fmt: str) -> pd.DataFrame:
+    """Read a Parquet file or Arrow IPC file/stream into a frame, column by column."""
+    pa = _import_pyarrow()
+    source = pa.BufferReader(contents)
+    if fmt == 'parquet':
+        table = pa.parquet.read_table(source)
+    elif fmt == 'arrow':
+        try:
+            table = pa.ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            # Not the file format; accept the streaming format too
+            table = pa.ipc.open_stream(pa.BufferReader(contents)).read_all()
+    else:
+        raise ValueError(f"Unsupported format '{fmt}'")
+    return table.to_pandas()
+
+
+def write_columnar(df: pd.DataFrame, fmt: str) -> bytes:
+    """Serialize a frame to Parquet or an Arrow IPC file."""
+    pa = _import_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    if fmt == 'parquet':
+        pa.parquet.write_table(table, sink)
+    elif fmt == 'arrow':
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f"Unsupported format '{fmt}'")
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,32 @@
+"""
+Deferred imports for heavy modules.
+
+pandas and numpy take most of the API's import time but are only needed once a
+request touches data. lazy_import returns a placeholder module right away and
+runs the real import on first attribute access, so importing the API (tests,
+CLI tools, worker start-up) stays cheap. Modules using it should postpone
+annotations (``from __future__ import annotations``) so signatures like
+``-> pd.DataFrame`` don't trigger the import.
+"""
+import importlib
+import importlib.util
+from types import ModuleType
+
+
+class _LazyModule(ModuleType):
+    """Placeholder that imports the real module on first attribute access."""
+
+    def __getattr__(self, attr):
+        # The regular import machinery serializes concurrent first imports, so
+        # threads never see a half-initialized module
+        module = importlib.import_module(self.__name__)
+        # Later lookups hit the copied attributes directly
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return a module that is imported on first use."""
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+    return _LazyModule(name)
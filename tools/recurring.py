@@ -0,0 +1,151 @@
+"""
+Recurring payments: subscriptions, rent, insurance, memberships.
+
+Expenses are grouped by normalized payee (case, digits and punctuation
+ignored, so "NETFLIX.COM 8472" and "Netflix.com 1190" are one series). Within
+a group, sorted by date, the gaps between payments say how regular it is: the
+median gap is the period, their spread is the jitter, and the spread of the
+amounts says whether it's a fixed price. All of it comes from one sort and one
+groupby aggregation over the whole history.
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import Optional
+
+from tools.duplicates import normalize_texts
+from tools.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+# name: (shortest median gap, longest median gap, months per step, payments per month)
+PERIODS = {
+    'weekly': (6, 8, 0, 52 / 12),
+    'biweekly': (13, 16, 0, 26 / 12),
+    'monthly': (27, 34, 1, 1.0),
+    'quarterly': (85, 97, 3, 1 / 3),
+    'yearly': (355, 375, 12, 1 / 12),
+}
+
+DEFAULT_MIN_OCCURRENCES = 3
+
+# Largest gap standard deviation, relative to the period
+MAX_JITTER = 0.2
+
+# Largest amount standard deviation, relative to the typical amount
+MAX_AMOUNT_VARIATION = 0.25
+
+# A series is active until this many periods have passed without a payment
+ACTIVE_PERIODS = 1.5
+
+SERIES_COLUMNS = [
+    'payee', 'account', 'category', 'period', 'period_days', 'occurrences',
+    'first_date', 'last_date', 'next_expected', 'amount', 'amount_variation',
+    'jitter_days', 'monthly_cost'
+]
+
+
+def _next_dates(last: np.ndarray, period_days: np.ndarray, step_months: np.ndarray) -> np.ndarray:
+    """last plus one period: whole calendar months where step_months > 0, else days.
+
+    Month steps keep the day of month, clipped to the length of the target month.
+    """
+    last = last.astype('datetime64[D]')
+    month = last.astype('datetime64[M]')
+    day_of_month = last - month.astype('datetime64[D]')
+    target = month + step_months
+    month_length = (target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')
+    by_month = target.astype('datetime64[D]') + np.minimum(day_of_month, month_length - 1)
+    by_days = last + np.rint(period_days).astype('timedelta64[D]')
+    return np.where(step_months > 0, by_month, by_days)
+
+
+def detect_recurring(df: pd.DataFrame, min_occurrences: int = DEFAULT_MIN_OCCURRENCES,
+                     max_jitter: float = MAX_JITTER,
+                     max_amount_variation: float = MAX_AMOUNT_VARIATION) -> pd.DataFrame:
+    """Recurring expense series in transactions, largest monthly cost first.
+
+    Returns one row per series with SERIES_COLUMNS. Payee, account and category
+    are those of the latest payment; amount is the median payment and
+    monthly_cost that amount times payments per month, both positive.
+    """
+    expenses = df[(df['amount'] < 0) & df['date'].notna()]
+    # Normalize each distinct payee once, then group rows by normalized payee
+    raw_codes, raw_payees = pd.factorize(expenses['payee'].fillna(''))
+    normalized_codes, normalized = pd.factorize(normalize_texts(pd.Series(raw_payees, dtype=str)))
+    key = normalized_codes[raw_codes] if len(raw_codes) else raw_codes
+    named = ~np.isin(key, np.flatnonzero(normalized == ''))
+    expenses, key = expenses[named], key[named]
+    if expenses.empty:
+        return pd.DataFrame(columns=SERIES_COLUMNS)
+
+    day = expenses['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    order = np.lexsort((day, key))
+    key, day = key[order], day[order]
+    gap = np.diff(day, prepend=day[0]).astype(np.float64)
+    # The first payment of each series has no gap
+    gap[np.r_[True, key[1:] != key[:-1]]] = np.nan
+
+    stats = pd.DataFrame({
+        'key': key,
+        'gap': gap,
+        'day': day,
+        'amount': -expenses['amount'].to_numpy()[order],
+        'row': order,
+    }).groupby('key', sort=False).agg(
+        occurrences=('day', 'size'),
+        first_day=('day', 'first'),
+        last_day=('day', 'last'),
+        period_days=('gap', 'median'),
+        jitter_days=('gap', 'std'),
+        amount=('amount', 'median'),
+        amount_std=('amount', 'std'),
+        row=('row', 'last'),
+    )
+    stats['jitter_days'] = stats['jitter_days'].fillna(0.0)
+    stats['amount_variation'] = (stats['amount_std'].fillna(0.0) / stats['amount']).round(3)
+
+    names = list(PERIODS)
+    bounds = np.array([PERIODS[name][:2] for name in names])
+    period_days = stats['period_days'].to_numpy()
+    in_range = (period_days[:, None] >= bounds[:, 0]) & (period_days[:, None] <= bounds[:, 1])
+    stats['period'] = np.where(in_range.any(axis=1), np.array(names, dtype=object)[in_range.argmax(axis=1)], None)
+
+    stats = stats[
+        (stats['occurrences'] >= min_occurrences)
+        & stats['period'].notna()
+        & (stats['jitter_days'] <= max_jitter * stats['period_days'])
+        & (stats['amount_variation'] <= max_amount_variation)
+    ]
+    if stats.empty:
+        return pd.DataFrame(columns=SERIES_COLUMNS)
+
+    latest = expenses.iloc[stats['row'].to_numpy()]
+    step_months = stats['period'].map(lambda name: PERIODS[name][2]).to_numpy(dtype=np.int64)
+    per_month = stats['period'].map(lambda name: PERIODS[name][3]).to_numpy(dtype=np.float64)
+    last = stats['last_day'].to_numpy().astype('datetime64[D]')
+    series = pd.DataFrame({
+        'payee': latest['payee'].to_numpy(),
+        'account': latest['account'].to_numpy(),
+        'category': latest['category'].to_numpy(),
+        'period': stats['period'].to_numpy(),
+        'period_days': stats['period_days'].to_numpy(),
+        'occurrences': stats['occurrences'].to_numpy(),
+        'first_date': stats['first_day'].to_numpy().astype('datetime64[D]'),
+        'last_date': last,
+        'next_expected': _next_dates(last, stats['period_days'].to_numpy(), step_months),
+        'amount': stats['amount'].round(2).to_numpy(),
+        'amount_variation': stats['amount_variation'].to_numpy(),
+        'jitter_days': stats['jitter_days'].round(1).to_numpy(),
+        'monthly_cost': (stats['amount'].to_numpy() * per_month).round(2),
+    })
+    return series.sort_values('monthly_cost', ascending=False, ignore_index=True)
+
+
+def active_series(series: pd.DataFrame, today: Optional[date] = None) -> pd.Series:
+    """Whether each series had a payment within ACTIVE_PERIODS periods before today."""
+    today = pd.Timestamp(today or date.today())
+    overdue = (today - pd.to_datetime(series['last_date'])).dt.days
+    return overdue <= ACTIVE_PERIODS * series['period_days'].astype(float)
@@ -0,0 +1,68 @@
+"""
+Per-request time breakdown, reported in the Server-Timing header.
+
+api.middleware.ServerTimingMiddleware puts a RequestTimings in the context of
+each request; code anywhere below it (the database manager, route handlers)
+adds to it with measure(). Outside a timed request measure() does nothing,
+so instrumented code costs a context variable lookup when timing is off.
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class RequestTimings:
+    """Seconds spent per phase of one request.
+
+    Nested measurements of the same phase count once, so a database call
+    made while another one is open isn't counted twice.
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self._depth: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def start(self, name: str) -> Optional[float]:
+        """Begin a phase; returns the start time, or None if it was already open."""
+        with self._lock:
+            depth = self._depth.get(name, 0)
+            self._depth[name] = depth + 1
+        return time.perf_counter() if depth == 0 else None
+
+    def stop(self, name: str, started: Optional[float]):
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        with self._lock:
+            self._depth[name] -= 1
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def header(self) -> str:
+        """Server-Timing header value, durations in milliseconds."""
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.durations.items())
+
+
+current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "current_timings", default=None
+)
+
+
+@contextmanager
+def measure(name: str):
+    """Add the time spent in the block to the current request's phase name."""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = timings.start(name)
+    try:
+        yield
+    finally:
+        timings.stop(name, started)
@@ -0,0 +1,230 @@
+"""
+Pattern-based categorization rules.
+
+Substring and prefix rules are literals, so they are indexed by their first few
+characters (a poor man's Aho-Corasick): scanning a value costs one dict lookup
+per position and key length, independent of the number of rules. Regex rules
+are compiled into one anchored alternation ordered by priority. Values are
+factorized first, so a column with millions of rows but a few thousand distinct
+payees only costs a few thousand scans.
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from re import _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+
+from tools.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+RULE_FIELDS = ("description", "payee")
+RULE_MATCH_TYPES = ("substring", "prefix", "regex")
+
+# Literal patterns are bucketed by up to this many leading characters
+_KEY_LENGTH = 3
+
+
+def validate_rule(field: str, match_type: str, pattern: str):
+    """Raise ValueError if a rule definition cannot be compiled."""
+    if field not in RULE_FIELDS:
+        raise ValueError(f"Invalid rule field '{field}', expected one of: {', '.join(RULE_FIELDS)}")
+    if match_type not in RULE_MATCH_TYPES:
+        raise ValueError(
+            f"Invalid match type '{match_type}', expected one of: {', '.join(RULE_MATCH_TYPES)}"
+        )
+    if not pattern:
+        raise ValueError("Rule pattern must not be empty")
+    if match_type == "regex":
+        try:
+            # Compile the wrapped branch so patterns that only break inside
+            # the combined alternation (e.g. inline global flags) are rejected too
+            re.compile(_regex_branch(0, pattern))
+        except re.error as e:
+            raise ValueError(f"Invalid regex pattern: {e}")
+        if not _combinable(pattern):
+            raise ValueError(
+                "Regex rules can't use named groups or backreferences; use (?:...) or plain groups"
+            )
+
+
+def _regex_branch(rank: int, pattern: str) -> str:
+    """Alternation branch for one regex rule; the named group identifies the rule."""
+    return f".*?(?P<r{rank}>(?:{pattern}))"
+
+
+def _combinable(pattern: str) -> bool:
+    """Whether a regex means the same as a branch of the combined alternation.
+
+    Named groups clash between rules, and numbered backreferences would point
+    at another rule's groups once earlier branches add theirs.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except re.error:
+        return False
+    if parsed.state.groupdict:
+        return False
+
+    def has_backreference(items) -> bool:
+        for op, av in items:
+            if op in (_sre_parse.GROUPREF, _sre_parse.GROUPREF_EXISTS):
+                return True
+            for arg in av if isinstance(av, (tuple, list)) else (av,):
+                if isinstance(arg, _sre_parse.SubPattern) and has_backreference(arg):
+                    return True
+                if isinstance(arg, (tuple, list)) and any(
+                    isinstance(sub, _sre_parse.SubPattern) and has_backreference(sub) for sub in arg
+                ):
+                    return True
+        return False
+
+    return not has_backreference(parsed)
+
+
+class _LiteralIndex:
+    """Literal patterns bucketed by their leading characters, sorted by rank."""
+
+    def __init__(self):
+        self.buckets: Dict[str, List] = {}
+
+    def add(self, rank: int, pattern: str):
+        self.buckets.setdefault(pattern[:_KEY_LENGTH], []).append((rank, pattern))
+
+    def __bool__(self):
+        return bool(self.buckets)
+
+    def best_at(self, value: str, pos: int, best: int) -> int:
+        """Best rank among patterns that occur in value at pos."""
+        for k in range(1, _KEY_LENGTH + 1):
+            if pos + k > len(value):
+                break
+            for rank, pattern in self.buckets.get(value[pos:pos + k], ()):
+                if rank >= best:
+                    break
+                if value.startswith(pattern, pos):
+                    best = rank
+                    break
+        return best
+
+
+class RuleMatcher:
+    """Compiled set of categorization rules.
+
+    Rules are dicts with ``field``, ``match_type``, ``pattern``, ``category``
+    and ``priority``. Higher priority wins; ties go to the older rule (lower id).
+    Matching is case-insensitive.
+    """
+
+    def __init__(self, rules: List[Dict]):
+        ordered = sorted(rules, key=lambda r: (-int(r.get("priority", 0)), r.get("id", 0)))
+        self.categories = [r["category"] for r in ordered]
+        self._prefixes = {field: _LiteralIndex() for field in RULE_FIELDS}
+        self._substrings = {field: _LiteralIndex() for field in RULE_FIELDS}
+        self._regexes: Dict[str, re.Pattern] = {}
+        # Regex rules that can't join the alternation, searched one by one in rank order
+        self._separate: Dict[str, List[Tuple[int, re.Pattern]]] = {field: [] for field in RULE_FIELDS}
+
+        branches: Dict[str, List[str]] = {field: [] for field in RULE_FIELDS}
+        for rank, rule in enumerate(ordered):
+            field, match_type = rule["field"], rule["match_type"]
+            if match_type == "prefix":
+                self._prefixes[field].add(rank, rule["pattern"].lower())
+            elif match_type == "substring":
+                self._substrings[field].add(rank, rule["pattern"].lower())
+            elif _combinable(rule["pattern"]):
+                branches[field].append((rank, rule["pattern"]))
+            else:
+                # Saved before validation rejected such patterns
+                self._add_separate(field, rank, rule["pattern"])
+
+        for field, field_branches in branches.items():
+            if not field_branches:
+                continue
+            try:
+                # Alternatives are tried left to right at position 0, so the
+                # first branch that matches anywhere in the value is the
+                # highest-priority regex rule for this field.
+                self._regexes[field] = re.compile(
+                    "(?:" + "|".join(_regex_branch(rank, pattern) for rank, pattern in field_branches) + ")",
+                    re.IGNORECASE | re.DOTALL
+                )
+            except re.error:
+                # One bad rule must not stop the others from matching
+                for rank, pattern in field_branches:
+                    self._add_separate(field, rank, pattern)
+                self._separate[field].sort(key=lambda item: item[0])
+
+    def _add_separate(self, field: str, rank: int, pattern: str):
+        """Search a regex rule on its own; rules that don't compile are skipped."""
+        try:
+            self._separate[field].append((rank, re.compile(pattern, re.IGNORECASE | re.DOTALL)))
+        except re.error:
+            pass
+
+    def __len__(self):
+        return len(self.categories)
+
+    def _best_rank(self, field: str, value: str) -> int:
+        """Rank of the best matching rule for one value (len(rules) when none match)."""
+        best = len(self.categories)
+
+        regex = self._regexes.get(field)
+        if regex is not None:
+            match = regex.match(value)
+            if match:
+                best = int(match.lastgroup[1:])
+
+        for rank, compiled in self._separate[field]:
+            if rank >= best:
+                break
+            if compiled.search(value):
+                best = rank
+                break
+
+        lowered = value.lower()
+        prefixes = self._prefixes[field]
+        if prefixes:
+            best = prefixes.best_at(lowered, 0, best)
+
+        substrings = self._substrings[field]
+        if substrings:
+            for pos in range(len(lowered)):
+                best = substrings.best_at(lowered, pos, best)
+        return best
+
+    def _best_ranks(self, field: str, values: pd.Series) -> np.ndarray:
+        """Best rule rank for every row, scanning each distinct value once."""
+        codes, uniques = pd.factorize(values.fillna("").astype(str))
+        unique_ranks = np.fromiter(
+            (self._best_rank(field, value) for value in uniques),
+            dtype="int64",
+            count=len(uniques)
+        )
+        return unique_ranks[codes]
+
+    def match(self, df: pd.DataFrame) -> pd.Series:
+        """Return the matched category per row, or None where no rule applies."""
+        if df.empty or not self.categories:
+            return pd.Series([None] * len(df), index=df.index, dtype="object")
+
+        best = np.full(len(df), len(self.categories), dtype="int64")
+        for field in RULE_FIELDS:
+            has_rules = (field in self._regexes or self._separate[field]
+                         or self._prefixes[field] or self._substrings[field])
+            if has_rules and field in df.columns:
+                best = np.minimum(best, self._best_ranks(field, df[field]))
+
+        lookup = np.array(self.categories + [None], dtype="object")
+        return pd.Series(lookup[best], index=df.index, dtype="object")
+
+    def match_one(self, description: str, payee: str) -> Optional[str]:
+        """Return the matched category for a single transaction."""
+        result = self.match(pd.DataFrame({"description": [description or ""], "payee": [payee or ""]}))
+        return result.iloc[0]